@@ -0,0 +1,340 @@
+import argparse
+import dataclasses
+import gc
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from cevrp.cevrp_model import CONSTRUCTORS, CEVRPModel
+from cevrp.construction_cache import DEFAULT_CACHE_BYTES, CacheEntry, ConstructionCache
+from cevrp.cost_types import CostTypes
+from cevrp.distance_providers import DEFAULT_MEMORY_BUDGET, MatrixDistanceProvider, create_distance_provider, \
+    euclidean_distances
+from cevrp.instance_generator import generate_instance, instance_name
+from cevrp.instance_loader import InstanceData, InstanceLoader
+from cevrp.metrics import MetricsRegistry
+from cevrp.tour_plan import TourPlan
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.operator_selection import AdaptiveOperatorSelection
+from cevrp.vnd.parallel_pairs import ParallelPairSearch
+from cevrp.vnd.shadow_verification import ShadowVerifier
+
+logger = logging.getLogger(__name__)
+
+INSTANCE_EXTENSIONS = ('.vrp', '.evrp', '.csv')
+
+
+# Reference to a numpy array in a multiprocessing.shared_memory block. Only the name travels to the
+# worker, which maps the block into its address space instead of unpickling a copy.
+@dataclass(frozen=True)
+class SharedArray:
+    name: str
+    shape: tuple[int, ...]
+    dtype: str
+
+    @staticmethod
+    def allocate(shape: tuple[int, ...], dtype=np.float64) -> tuple['SharedArray', shared_memory.SharedMemory]:
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        return SharedArray(block.name, tuple(shape), dtype.str), block
+
+    @staticmethod
+    def copy_of(array: np.ndarray) -> tuple['SharedArray', shared_memory.SharedMemory]:
+        reference, block = SharedArray.allocate(array.shape, array.dtype)
+        reference.view(block)[...] = array
+        return reference, block
+
+    def view(self, block: shared_memory.SharedMemory) -> np.ndarray:
+        return np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=block.buf)
+
+    def attach(self) -> tuple[np.ndarray, shared_memory.SharedMemory]:
+        block = shared_memory.SharedMemory(name=self.name)
+        return self.view(block), block
+
+
+@dataclass
+class BatchSettings:
+    max_cluster_size: int = 30
+    # in vehicle capacities
+    max_cluster_loads: float = 3
+    max_interchange_iterations: int = 2
+    # initial solution constructor per cluster, one of CONSTRUCTORS
+    constructor: str = 'cws'
+    optimize: bool = True
+    # adaptive operator selection instead of the fixed neighborhood order
+    adaptive: bool = False
+    time_budget: float | None = None
+    # share of fast cost evaluations recomputed with the reference implementation (0 disables it)
+    shadow_rate: float = 0.0
+    # threads evaluating tour pairs of the exchange rounds (0: sequential rounds)
+    pair_threads: int = 0
+    memory_budget: int = DEFAULT_MEMORY_BUDGET
+    # directory of the persistent construction cache (None: construct every instance)
+    cache_dir: str | None = None
+    cache_bytes: int = DEFAULT_CACHE_BYTES
+    vehicle_parameters: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        # the constructor names a metrics phase and construction cache entries, reject it before either
+        if self.constructor not in CONSTRUCTORS:
+            raise ValueError(f'Unknown constructor {self.constructor}, expected one of {CONSTRUCTORS}.')
+
+
+@dataclass
+class BatchJob:
+    source: str
+    # the instance without its coordinates, which are shared separately
+    data: InstanceData
+    coordinates: SharedArray
+    matrix: SharedArray | None
+    settings: BatchSettings
+
+
+def discover_instances(source: str | os.PathLike) -> list[dict]:
+    # a directory is scanned for instance files, a manifest lists one instance per line or
+    # holds a JSON list of paths or of objects {"path": ..., "vehicle": {...}}. Instead of a path, an
+    # object may hold {"generate": {...}}, keyword arguments of generate_instance.
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        return [{'path': os.path.join(source, name)} for name in sorted(os.listdir(source))
+                if name.lower().endswith(INSTANCE_EXTENSIONS)]
+
+    with open(source, 'r') as file:
+        content = file.read()
+    base = os.path.dirname(os.path.abspath(source))
+    if source.lower().endswith('.json'):
+        entries = [e if isinstance(e, dict) else {'path': e} for e in json.loads(content)]
+    else:
+        entries = [{'path': line.strip()} for line in content.splitlines()
+                   if line.strip() and not line.lstrip().startswith('#')]
+    resolved = []
+    for entry in entries:
+        if 'generate' in entry:
+            # the path only names a generated instance in the results
+            spec = entry['generate']
+            name = instance_name(spec.get('distribution', 'uniform'), spec['num_customers'], spec.get('seed'))
+            resolved.append(dict(entry, path=entry.get('path', name)))
+        else:
+            resolved.append(dict(entry, path=os.path.join(base, entry['path'])))
+    return resolved
+
+
+def solve_model(model: CEVRPModel, settings: BatchSettings, metrics: MetricsRegistry,
+                cache_entry: CacheEntry | None = None) -> TourPlan:
+    # same pipeline as main.py: decomposition -> CWS (or sweep) per cluster -> VNS
+    max_demand = settings.max_cluster_loads * model.vehicles[0].commodity_capacity
+    with metrics.phase('clustering'):
+        if cache_entry is not None:
+            cache_entry.decompose_nodes(model, settings.max_cluster_size, max_demand)
+        else:
+            model.decompose_nodes(settings.max_cluster_size, max_demand)
+    with metrics.phase(settings.constructor):
+        if cache_entry is not None:
+            tour_plans = cache_entry.generate_initial_solutions(model, settings.max_cluster_size, max_demand,
+                                                                settings.constructor)
+        else:
+            tour_plans = {label: model.generate_initial_solution(nodes, settings.constructor)
+                          for label, nodes in model.node_clusters.items()}
+    if not settings.optimize:
+        return TourPlan([t for plan in tour_plans.values() for t in plan])
+    pair_search = ParallelPairSearch(settings.pair_threads) if settings.pair_threads > 0 else None
+    try:
+        return cevrp_optimizer.optimize_tours(
+            tour_plans,
+            model,
+            None,
+            settings.max_interchange_iterations,
+            metrics=metrics,
+            visualize=False,
+            selection=AdaptiveOperatorSelection() if settings.adaptive else None,
+            time_budget=settings.time_budget,
+            shadow=ShadowVerifier(settings.shadow_rate) if settings.shadow_rate > 0 else None,
+            pair_search=pair_search,
+        )
+    finally:
+        if pair_search is not None:
+            pair_search.close()
+
+
+def _solve(data: InstanceData, distance_provider, settings: BatchSettings) -> dict:
+    metrics = MetricsRegistry()
+    nodes = data.create_nodes(distance_provider)
+    vehicles = data.create_vehicles(**settings.vehicle_parameters)
+    cache_entry = None
+    if settings.cache_dir is not None:
+        cache = ConstructionCache(settings.cache_dir, settings.cache_bytes)
+        cache_entry = cache.entry(data, vehicles[0])
+        with metrics.phase('feasibility'):
+            model = cache_entry.create_model(nodes, vehicles)
+    else:
+        model = CEVRPModel(nodes, vehicles)
+    tour_plan = solve_model(model, settings, metrics, cache_entry)
+    if cache_entry is not None:
+        metrics.increment('construction_cache_hits', cache.hits)
+        metrics.increment('construction_cache_misses', cache.misses)
+
+    vehicle = model.vehicles[0]
+    original_ids = data.original_ids.tolist()
+    return {
+        'tours': [[original_ids[n.node_id] for n in tour] for tour in tour_plan],
+        'num_tours': len(tour_plan),
+        'total_cost': sum(t.get_costs_of_tour(vehicle, model.battery_threshold)[CostTypes.TOTAL] for t in tour_plan),
+        'metrics': metrics.to_dict(),
+    }
+
+
+def solve_shared_instance(job: BatchJob) -> dict:
+    start = time.perf_counter()
+    blocks = []
+    try:
+        coordinates, block = job.coordinates.attach()
+        blocks.append(block)
+        data = dataclasses.replace(job.data, coordinates=coordinates)
+        if job.matrix is not None:
+            matrix, block = job.matrix.attach()
+            blocks.append(block)
+            provider = MatrixDistanceProvider(matrix)
+        else:
+            provider = create_distance_provider(coordinates, memory_budget=0)
+        result = _solve(data, provider, job.settings)
+    finally:
+        # the views into the blocks have to be gone before the blocks can be closed. If a traceback
+        # still references them, the mapping is released when the worker process exits.
+        data = provider = coordinates = matrix = None
+        gc.collect()
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass
+
+    result.update({'instance': job.data.name, 'source': job.source, 'status': 'completed',
+                   'nodes': job.coordinates.shape[0], 'seconds': time.perf_counter() - start})
+    return result
+
+
+# Solves many instances on a process pool. Each instance is loaded in the parent, its coordinates
+# and (if within the memory budget) its dense distance matrix are written to shared memory once,
+# and the worker maps them. At most 2 * workers instances are held in shared memory at a time.
+# Every finished job is appended to one JSON-lines output file right away.
+class BatchRunner:
+    def __init__(self, output_path: str | os.PathLike, workers: int | None = None,
+                 settings: BatchSettings | None = None):
+        self.output_path = output_path
+        self.workers = workers or os.cpu_count() or 1
+        self.settings = settings or BatchSettings()
+
+    def _share(self, data: InstanceData) -> tuple[SharedArray, SharedArray | None, list]:
+        coordinates, coordinates_block = SharedArray.copy_of(np.ascontiguousarray(data.coordinates))
+        blocks = [coordinates_block]
+        n = len(data)
+        if n * n * 8 > self.settings.memory_budget:
+            return coordinates, None, blocks
+
+        matrix, matrix_block = SharedArray.allocate((n, n))
+        blocks.append(matrix_block)
+        euclidean_distances(data.coordinates, data.coordinates, out=matrix.view(matrix_block))
+        return coordinates, matrix, blocks
+
+    def _submit(self, executor, entry: dict):
+        if 'generate' in entry:
+            data = generate_instance(**entry['generate'])
+        else:
+            data = InstanceLoader.load(entry['path'])
+        coordinates, matrix, blocks = self._share(data)
+        settings = self.settings
+        if 'vehicle' in entry:
+            settings = dataclasses.replace(settings, vehicle_parameters={**settings.vehicle_parameters,
+                                                                         **entry['vehicle']})
+        job = BatchJob(entry['path'], dataclasses.replace(data, coordinates=np.empty((0, 2))),
+                       coordinates, matrix, settings)
+        return executor.submit(solve_shared_instance, job), blocks
+
+    def run(self, source: str | os.PathLike | list[dict]) -> dict:
+        entries = discover_instances(source) if not isinstance(source, list) else source
+        summary = {'instances': len(entries), 'completed': 0, 'failed': 0, 'total_cost': 0.0}
+        start = time.perf_counter()
+
+        with open(self.output_path, 'w') as output, ProcessPoolExecutor(self.workers) as executor:
+            def write(record):
+                output.write(json.dumps(record) + '\n')
+                output.flush()
+                summary[record['status']] += 1
+                summary['total_cost'] += record.get('total_cost', 0.0)
+
+            pending = {}
+            queue = list(entries)
+            while queue or pending:
+                while queue and len(pending) < 2 * self.workers:
+                    entry = queue.pop(0)
+                    try:
+                        future, blocks = self._submit(executor, entry)
+                        pending[future] = (entry, blocks)
+                    except Exception as e:
+                        write({'source': entry['path'], 'status': 'failed', 'error': f'{type(e).__name__}: {e}'})
+                if not pending:
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    entry, blocks = pending.pop(future)
+                    for block in blocks:
+                        block.close()
+                        block.unlink()
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        record = {'source': entry['path'], 'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+                    logger.info("%s %s", record['status'].upper(), entry['path'])
+                    write(record)
+
+        summary['seconds'] = time.perf_counter() - start
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a directory or manifest of CEVRP instances.')
+    parser.add_argument('source', help='instance directory or manifest (.json or one path per line)')
+    parser.add_argument('--output', default='results.jsonl')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-cluster-size', type=int, default=30)
+    parser.add_argument('--max-interchange-iterations', type=int, default=2)
+    parser.add_argument('--constructor', choices=CONSTRUCTORS, default='cws', help='initial solution per cluster')
+    parser.add_argument('--no-optimize', action='store_true', help='stop after the construction')
+    parser.add_argument('--adaptive', action='store_true', help='adaptive operator selection')
+    parser.add_argument('--time-budget', type=float, default=None, help='VNS seconds per instance')
+    parser.add_argument('--shadow-rate', type=float, default=0.0,
+                        help='share of fast cost evaluations verified against the reference implementation')
+    parser.add_argument('--pair-threads', type=int, default=0,
+                        help='threads evaluating tour pairs of the exchange rounds per instance')
+    parser.add_argument('--cache-dir', default=None,
+                        help='persistent cache of clusters and CWS solutions, shared between runs')
+    parser.add_argument('--cache-bytes', type=int, default=DEFAULT_CACHE_BYTES)
+    arguments = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    settings = BatchSettings(
+        max_cluster_size=arguments.max_cluster_size,
+        max_interchange_iterations=arguments.max_interchange_iterations,
+        constructor=arguments.constructor,
+        optimize=not arguments.no_optimize,
+        adaptive=arguments.adaptive,
+        time_budget=arguments.time_budget,
+        shadow_rate=arguments.shadow_rate,
+        pair_threads=arguments.pair_threads,
+        cache_dir=arguments.cache_dir,
+        cache_bytes=arguments.cache_bytes,
+    )
+    summary = BatchRunner(arguments.output, arguments.workers, settings).run(arguments.source)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,41 @@
-import random
+import io
+import os
 
 import numpy as np
 from matplotlib import pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 from sklearn.cluster import DBSCAN
 
 from cevrp.constraints import *
 from cevrp.savings_calculator import SavingsCalculator
 from cevrp.cost_types import CostTypes
+from cevrp.distance_providers import DistanceProvider, max_euclidean_distance
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.geometry import max_pairwise_distance
 from cevrp.tour_plan import TourPlan
 from cevrp.tour import Tour
 from cevrp.vehicle import *
 
+# initial solution constructors, see CEVRPModel.generate_initial_solution
+CONSTRUCTORS = ('cws', 'sweep')
+
 
 class CEVRPModel:
-    def __init__(self, nodes: list[Node], vehicles: list[Vehicle]):
-        depot = Node.create_depot()
+    # battery_threshold skips the pairwise scan if it is already known for these nodes and vehicles
+    def __init__(self, nodes: list[Node], vehicles: list[Vehicle], battery_threshold: float | None = None):
+        depot = Node.create_depot(nodes[0].distance_calculator if len(nodes) > 0 else None)
         if depot not in nodes:
             nodes.insert(0, depot)
+        self.depot = nodes[nodes.index(depot)]
         self.nodes = nodes
         self.vehicles = vehicles
-        self.battery_threshold = self.calculate_battery_threshold()
+        if battery_threshold is None:
+            battery_threshold = self.calculate_battery_threshold()
+        self.battery_threshold = battery_threshold
         self.node_clusters = {}
+        self._feasible_edges = None
 
     def get_node_by_id(self, id: int):
         nodes = [node for node in self.nodes if node.node_id == id]
@@ -29,6 +44,20 @@ class CEVRPModel:
         else:
             return nodes[0]
 
+    # built on first use and rebuilt once nodes or the battery threshold changed
+    @property
+    def feasible_edges(self) -> FeasibleEdges:
+        edges = self._feasible_edges
+        if edges is None or edges.battery_threshold != self.battery_threshold \
+                or len(edges.positions) != len(self.nodes):
+            consumption_rate = self.vehicles[0].battery.consumption_rate
+            edges = self._feasible_edges = FeasibleEdges.build(self.nodes, self.battery_threshold, consumption_rate)
+        return edges
+
+    @feasible_edges.setter
+    def feasible_edges(self, edges: FeasibleEdges):
+        self._feasible_edges = edges
+
     def add_node(self, node: Node):
         self.nodes.append(node)
 
@@ -36,6 +65,16 @@ class CEVRPModel:
         self.vehicles.append(vehicle)
 
     def calculate_battery_threshold(self):
+        consumption_rate = self.vehicles[0].battery.consumption_rate
+        if all(node.distance_calculator == Node.calculate_distance for node in self.nodes):
+            # euclidean distances: the longest edge is the diameter of the customer locations
+            coordinates = np.array([(node.x, node.y) for node in self.nodes[1:]], dtype=np.float64)
+            return max_pairwise_distance(coordinates) * consumption_rate
+
+        provider = self.depot.distance_calculator
+        if isinstance(provider, DistanceProvider) and all(node.distance_calculator is provider for node in self.nodes):
+            return provider.max_distance([node.node_id for node in self.nodes[1:]]) * consumption_rate
+
         max_distance = 0
         for i in range(1, len(self.nodes)):
             for j in range(i + 1, len(self.nodes)):
@@ -46,6 +85,29 @@ class CEVRPModel:
 
         return max_distance * self.vehicles[0].battery.consumption_rate
 
+    # Adding customers can only widen the customer locations, so only distances from the new customers
+    # have to be checked. The threshold is never lowered on removal, which keeps existing plans feasible.
+    def add_customers(self, nodes: list[Node]):
+        known = set(self.nodes)
+        nodes = [node for node in nodes if node not in known]
+        if len(nodes) == 0:
+            return
+
+        customers = self.nodes[1:]
+        self.nodes.extend(nodes)
+        consumption_rate = self.vehicles[0].battery.consumption_rate
+        if all(node.distance_calculator == Node.calculate_distance for node in self.nodes):
+            coordinates = np.array([(node.x, node.y) for node in nodes], dtype=np.float64)
+            others = np.array([(node.x, node.y) for node in self.nodes[1:]], dtype=np.float64)
+            max_distance = max_euclidean_distance(coordinates, others)
+        else:
+            max_distance = max(a - b for a in nodes for b in customers + nodes)
+        self.battery_threshold = max(self.battery_threshold, max_distance * consumption_rate)
+
+    def remove_customers(self, node_ids):
+        node_ids = set(node_ids) - {self.depot.node_id}
+        self.nodes = [node for node in self.nodes if node.node_id not in node_ids]
+
     def cluster_nodes(self, eps, min_samples):
         coordinates = np.array([(node.x, node.y) for node in self.nodes if (node.x, node.y) != (0, 0)])
         clustering = DBSCAN(eps=eps, min_samples=min_samples).fit(coordinates)
@@ -60,9 +122,45 @@ class CEVRPModel:
 
         self.node_clusters = clusters
 
+    # Recursive coordinate bisection: a group of customers is split along the wider side of its
+    # bounding box until it holds at most max_size customers and at most max_demand total demand.
+    # Unlike DBSCAN there are no outliers and no subproblem exceeds the predictable solve-time envelope.
+    def decompose_nodes(self, max_size: int, max_demand: float | None = None):
+        customers = [node for node in self.nodes if node != self.depot]
+        coordinates = np.array([(node.x, node.y) for node in customers], dtype=np.float64).reshape(-1, 2)
+        demands = np.array([node.demand for node in customers], dtype=np.float64)
+        if max_demand is not None and len(demands) > 0 and demands.max() > max_demand:
+            raise ValueError(f'A single customer demand of {demands.max()} exceeds max_demand {max_demand}.')
+
+        groups = []
+        pending = [np.arange(len(customers))]
+        while pending:
+            group = pending.pop()
+            parts = int(np.ceil(len(group) / max_size))
+            if max_demand is not None:
+                parts = max(parts, int(np.ceil(demands[group].sum() / max_demand)))
+            if parts <= 1:
+                groups.append(group)
+                continue
+
+            group_coordinates = coordinates[group]
+            extent = group_coordinates.max(axis=0) - group_coordinates.min(axis=0)
+            order = group[np.argsort(group_coordinates[:, int(extent[1] > extent[0])], kind='stable')]
+
+            # split proportionally to the number of parts each side will end up with
+            split = max(1, min(len(order) - 1, round(len(order) * (parts // 2) / parts)))
+            if max_demand is not None and demands[group].sum() / max_demand >= len(group) / max_size:
+                cumulative_demand = np.cumsum(demands[order])
+                split = int(np.searchsorted(cumulative_demand, cumulative_demand[-1] * (parts // 2) / parts))
+                split = max(1, min(len(order) - 1, split))
+            pending.append(order[split:])
+            pending.append(order[:split])
+
+        self.node_clusters = {label: [customers[i] for i in group.tolist()] for label, group in enumerate(groups)}
+
     def generate_cws_solution(self, nodes=None) -> TourPlan:
         # Step 1: Construct n tours: v0 → vi → v0
-        depot = Node.create_depot()
+        depot = self.depot
         if nodes is None:
             tour_plan = TourPlan([Tour([depot, node, depot]) for node in self.nodes])
         else:
@@ -116,88 +214,154 @@ class CEVRPModel:
 
         return tour_plan
 
+    # Sweep construction in O(n log n): customers are sorted by polar angle around the depot (ties by
+    # distance) and appended to the current tour in that order until the next one would break one of
+    # the Constraints; then a new tour is started. All constraints are additive or per edge, so every
+    # step is checked in O(1): the load and the distance so far are carried along, the return leg to
+    # the depot is added for the distance check and both new edges are looked up in the feasible edges.
+    # The sweep starts after the widest angular gap between customers, so no tour straddles it.
+    def generate_sweep_solution(self, nodes=None) -> TourPlan:
+        depot = self.depot
+        customers = [node for node in (self.nodes if nodes is None else nodes) if node != depot]
+        if len(customers) == 0:
+            return TourPlan([])
+
+        coordinates = np.array([(node.x - depot.x, node.y - depot.y) for node in customers], dtype=np.float64)
+        angles = np.arctan2(coordinates[:, 1], coordinates[:, 0])
+        order = np.lexsort((np.hypot(coordinates[:, 0], coordinates[:, 1]), angles))
+        gaps = np.diff(angles[order], append=angles[order[0]] + 2 * np.pi)
+        order = np.roll(order, -(int(gaps.argmax()) + 1))
+
+        vehicle = self.vehicles[0]
+        feasible_edges = self.feasible_edges
+        tours = []
+        route, load, distance = [depot], 0, 0.0
+        for node in (customers[i] for i in order.tolist()):
+            last = route[-1]
+            leg = last - node
+            if len(route) > 1 and not (
+                    load + node.demand <= vehicle.commodity_capacity
+                    and distance + leg + (node - depot) <= vehicle.distance_threshold
+                    and feasible_edges.is_feasible(last, node)
+                    and feasible_edges.is_feasible(node, depot)):
+                tours.append(Tour(route + [depot]))
+                route, load, distance = [depot], 0, 0.0
+                leg = depot - node
+            route.append(node)
+            load += node.demand
+            distance += leg
+        tours.append(Tour(route + [depot]))
+        return TourPlan(tours)
+
+    # initial tour plan of the constructor, one of CONSTRUCTORS
+    def generate_initial_solution(self, nodes=None, constructor: str = 'cws') -> TourPlan:
+        if constructor == 'cws':
+            return self.generate_cws_solution(nodes)
+        if constructor == 'sweep':
+            return self.generate_sweep_solution(nodes)
+        raise ValueError(f'Unknown constructor {constructor}, expected one of {CONSTRUCTORS}.')
+
     def check_merge_constraints(self, tour1: Tour, tour2: Tour):
+        # the only new edge joins the last customer of tour1 and the first customer of tour2
+        feasible_edges = self.feasible_edges
+        if not feasible_edges.is_feasible(tour1[-2], tour2[1]):
+            return False
+
         # Check capacity constraint
         merged = tour1 + tour2
 
-        return all(ConstraintValidationStrategy(
+        return feasible_edges.all_feasible(merged.nodes) and all(ConstraintValidationStrategy(
                 constraint.value,
                 merged,
                 self.vehicles[0],
                 self.battery_threshold
-            ).is_valid() for constraint in Constraints)
+            ).is_valid() for constraint in Constraints if constraint != Constraints.BATTERY_CAPACITY)
 
 
+# Draws all nodes with one scatter and all tours (or clusters) with one collection, so drawing time does
+# not grow with one matplotlib artist per node or edge. visualize_* show the plot interactively,
+# render_* draw on a figure of their own with the Agg canvas and write PNG/SVG to a path or buffer,
+# which works without a display and leaves pyplot's global state alone.
 class CEVRPVisualizer:
+    ANNOTATED_COSTS = (CostTypes.TOTAL, CostTypes.DISTANCE, CostTypes.BATTERY_RECHARGING, CostTypes.DEMAND)
+
     def __init__(self, model: CEVRPModel):
         self.model = model
 
+    def _node_coordinates(self) -> np.ndarray:
+        return np.array([(node.x, node.y) for node in self.model.nodes], dtype=np.float64).reshape(-1, 2)
+
+    def draw_clusters(self, ax, labels: bool = False):
+        ax.scatter(*self._node_coordinates().T, color='black', s=8)
+        clustered = [(node.x, node.y, cluster_id) for cluster_id, nodes in self.model.node_clusters.items()
+                     for node in nodes]
+        if clustered:
+            x, y, cluster_ids = np.array(clustered, dtype=np.float64).T
+            colors = plt.get_cmap('tab10')(cluster_ids.astype(int) % 10)
+            ax.scatter(x, y, color=colors, s=12)
+        if labels:
+            for node in self.model.nodes:
+                ax.text(node.x, node.y, str(node.node_id), fontsize=8, ha='center', va='bottom')
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_title('Clustered Nodes')
+
+    # tour_costs: per tour a dict of CostTypes (e.g. from the solve result) or a total, annotated at the
+    # first customer of the tour. Without costs no annotations are drawn.
+    def draw_tour_plan(self, ax, tour_plan: TourPlan, tour_costs=None):
+        ax.scatter(*self._node_coordinates().T, color='black', s=8)
+        tours = [t for t in tour_plan if len(t) > 1]
+        segments = [np.array([(n.x, n.y) for n in tour], dtype=np.float64) for tour in tours]
+        colors = plt.get_cmap('tab20')(np.arange(len(segments)) % 20)
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=1))
+        ax.autoscale_view()
+
+        if tour_costs is not None:
+            for tour, costs in zip(tours, tour_costs):
+                if not isinstance(costs, dict):
+                    costs = {CostTypes.TOTAL: costs}
+                lines = [f"{cost_type.printable}: {round(costs[cost_type], 1)}"
+                         for cost_type in CEVRPVisualizer.ANNOTATED_COSTS if cost_type in costs]
+                ax.text(tour[1].x + 1.5, tour[1].y + 1.5, '\n'.join(lines), fontsize=7)
+        ax.set_xlabel('X')
+        ax.set_ylabel('Y')
+        ax.set_title('Tour Visualization')
+
+    def tour_costs(self, tour_plan: TourPlan) -> list[dict]:
+        vehicle = +self.model.vehicles[0]
+        return [t.get_costs_of_tour(vehicle, self.model.battery_threshold) for t in tour_plan if len(t) > 1]
+
     def visualize_clusters(self):
-        node_clusters = self.model.node_clusters
-        nodes = self.model.nodes
-
-        # Create a list of colors for each cluster
-        colors = ['r', 'g', 'b', 'c', 'm', 'y', 'k']
-
-        # Plot the nodes
-        for node in nodes:
-            plt.scatter(node.x, node.y, color='black')
-            plt.text(node.x, node.y, str(node.node_id), fontsize=8, ha='center', va='bottom')
-
-        # Plot the clusters
-        for cluster_id, nodes in node_clusters.items():
-            color = colors[cluster_id % len(colors)]
-            for node in nodes:
-                plt.scatter(node.x, node.y, color=color)
-
-        plt.xlabel('X')
-        plt.ylabel('Y')
-        plt.title('Clustered Nodes')
+        self.draw_clusters(plt.gca(), labels=True)
         plt.show()
 
-    def visualize_tour_plan(self, tour_plan: TourPlan):
-        model = self.model
-
-        # Plot the nodes
-        for node in model.nodes:
-            plt.scatter(node.x, node.y, color='black')
-
-        reference_vehicle = model.vehicles[0]
-
-        # Plot the tour
-        for tour in [t for t in tour_plan if len(t) > 1]:
-            color = (
-                random.uniform(0, 1),
-                random.uniform(0, 1),
-                random.uniform(0, 1),
-            )
-
-            annotated = False
-            for node in tour:
-                node1 = model.get_node_by_id(node.node_id)
-                node2 = model.get_node_by_id(tour.get_next_node(node).node_id)
-                # plt.plot([node1.x, node2.x], [node1.y, node2.y], color=color)
-                plt.arrow(node1.x, node1.y, node2.x - node1.x, node2.y - node1.y, color=color,
-                          length_includes_head=True, head_width=0.4, head_length=0.6)
-                if not annotated:
-                    reference_vehicle = +reference_vehicle
-                    costs = tour.get_costs_of_tour(reference_vehicle, model.battery_threshold)
-                    plt.text(node2.x + 1.5, node2.y + 1.5,
-                             f"{CostTypes.TOTAL.printable}: {round(costs[CostTypes.TOTAL], 1)}")
-                    plt.text(node2.x + 1.5, node2.y + 11.5,
-                             f"{CostTypes.DISTANCE.printable}: {round(costs[CostTypes.DISTANCE], 1)}")
-                    plt.text(node2.x + 1.5, node2.y + 21.5,
-                             f"{CostTypes.BATTERY_RECHARGING.printable}: {round(costs[CostTypes.BATTERY_RECHARGING], 1)}")
-                    plt.text(node2.x + 1.5, node2.y + 31.5,
-                             f"{CostTypes.DEMAND.printable}: {round(costs[CostTypes.DEMAND], 1)}")
-                    annotated = True
-
-            # Connect the last node to the first node to complete the tour
-            first_node = tour[0]
-            last_node = tour[-1]
-            plt.plot([last_node.x, first_node.x], [last_node.y, first_node.y], color=color)
-
-        plt.xlabel('X')
-        plt.ylabel('Y')
-        plt.title('Tour Visualization')
+    def visualize_tour_plan(self, tour_plan: TourPlan, tour_costs=None):
+        if tour_costs is None:
+            tour_costs = self.tour_costs(tour_plan)
+        self.draw_tour_plan(plt.gca(), tour_plan, tour_costs)
         plt.show()
+
+    @staticmethod
+    def _render(draw, target, format: str | None, size: tuple[float, float], dpi: int) -> bytes | None:
+        figure = Figure(figsize=size, dpi=dpi)
+        FigureCanvasAgg(figure)
+        draw(figure.add_subplot())
+        if target is None:
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format=format or 'png')
+            return buffer.getvalue()
+        if format is None and not isinstance(target, (str, os.PathLike)):
+            format = 'png'
+        figure.savefig(target, format=format)
+        return None
+
+    # target is a path (format from its extension unless given) or a binary buffer; without a target
+    # the image is returned as bytes
+    def render_tour_plan(self, tour_plan: TourPlan, target=None, format: str | None = None, tour_costs=None,
+                         size: tuple[float, float] = (10, 10), dpi: int = 100) -> bytes | None:
+        return CEVRPVisualizer._render(lambda ax: self.draw_tour_plan(ax, tour_plan, tour_costs),
+                                       target, format, size, dpi)
+
+    def render_clusters(self, target=None, format: str | None = None,
+                        size: tuple[float, float] = (10, 10), dpi: int = 100) -> bytes | None:
+        return CEVRPVisualizer._render(self.draw_clusters, target, format, size, dpi)
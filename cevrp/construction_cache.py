@@ -0,0 +1,266 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.distance_providers import DEFAULT_MEMORY_BUDGET, DistanceProvider, MatrixDistanceProvider, \
+    create_distance_provider
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.instance_loader import InstanceData
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.tour_plan import TourPlan
+from cevrp.vehicle import Vehicle
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_BYTES = 4 * 1024 ** 3
+
+_META = 'meta.json'
+
+
+# Content address of everything derived from a node table and the vehicle parameters. Node ids are
+# part of the key because the stored clusters and tours refer to them. The format version is hashed
+# too, entries of other versions are never looked up again and age out by eviction.
+def construction_key(node_ids: np.ndarray, coordinates: np.ndarray, demands: np.ndarray,
+                     service_times: np.ndarray, vehicle: Vehicle) -> str:
+    digest = hashlib.sha256(f'cevrp-construction-v{CACHE_FORMAT_VERSION}'.encode())
+    digest.update(np.ascontiguousarray(node_ids, dtype=np.int64).tobytes())
+    for array in (coordinates, demands, service_times):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    battery = vehicle.battery
+    parameters = (vehicle.commodity_capacity, vehicle.distance_threshold, battery.capacity,
+                  battery.consumption_rate, battery.charging_rate)
+    digest.update(np.array(parameters, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _load_array(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # empty arrays cannot be mapped
+        return np.load(path)
+
+
+# Artifacts of one node table and vehicle, one directory each under the entry's directory:
+#   feasibility          battery threshold and FeasibleEdges of the model
+#   distances            dense distance matrix (only if it fits the memory budget)
+#   clusters-<size>-<demand>  decompose_nodes result for these bounds
+#   <constructor>-<size>-<demand>  initial tour plans of these clusters (cws or sweep)
+# Every array is a .npy file and is memory-mapped on load. An artifact is written to a temporary
+# directory and renamed into place, so concurrent processes never see a partial artifact; if two of
+# them build the same artifact, the first rename wins.
+class CacheEntry:
+    def __init__(self, cache: 'ConstructionCache', key: str):
+        self.cache = cache
+        self.key = key
+        self.path = os.path.join(cache.root, key)
+
+    def load(self, name: str) -> tuple[dict[str, np.ndarray], dict] | None:
+        path = os.path.join(self.path, name)
+        try:
+            with open(os.path.join(path, _META), 'r') as file:
+                meta = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.cache.misses += 1
+            return None
+        if meta.get('version') != CACHE_FORMAT_VERSION:
+            logger.info("Discarding %s of %s, format version %s", name, self.key, meta.get('version'))
+            shutil.rmtree(path, ignore_errors=True)
+            self.cache.misses += 1
+            return None
+
+        arrays = {file[:-len('.npy')]: _load_array(os.path.join(path, file))
+                  for file in os.listdir(path) if file.endswith('.npy')}
+        self.cache.hits += 1
+        self.cache.touch(self.key)
+        return arrays, meta
+
+    def store(self, name: str, arrays: dict[str, np.ndarray], **meta):
+        os.makedirs(self.path, exist_ok=True)
+        temporary_path = os.path.join(self.path, f'.{name}.{uuid.uuid4().hex}.tmp')
+        os.makedirs(temporary_path)
+        for array_name, array in arrays.items():
+            np.save(os.path.join(temporary_path, f'{array_name}.npy'), np.ascontiguousarray(array))
+        with open(os.path.join(temporary_path, _META), 'w') as file:
+            json.dump(dict(meta, version=CACHE_FORMAT_VERSION), file)
+        try:
+            os.rename(temporary_path, os.path.join(self.path, name))
+        except OSError:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+        self.cache.touch(self.key)
+        self.cache.evict(keep=self.key)
+
+    # the model with the stored battery threshold and feasible edges, both are stored on a miss
+    def create_model(self, nodes: list[Node], vehicles: list[Vehicle]) -> CEVRPModel:
+        stored = self.load('feasibility')
+        if stored is not None:
+            arrays, meta = stored
+            node_ids = arrays['node_ids'].tolist()
+            if node_ids == [node.node_id for node in nodes]:
+                model = CEVRPModel(nodes, vehicles, meta['battery_threshold'])
+                model.feasible_edges = FeasibleEdges(node_ids, meta['depot_position'], arrays['depot_feasible'],
+                                                     arrays.get('matrix'), meta['packed'], meta['battery_threshold'],
+                                                     meta['consumption_rate'])
+                return model
+
+        model = CEVRPModel(nodes, vehicles)
+        edges = model.feasible_edges
+        arrays = {'node_ids': np.fromiter(edges.positions, dtype=np.int64, count=len(edges.positions)),
+                  'depot_feasible': edges.depot_feasible}
+        if edges.matrix is not None:
+            arrays['matrix'] = edges.matrix
+        self.store('feasibility', arrays, battery_threshold=model.battery_threshold,
+                   depot_position=edges.positions[edges.depot_id], packed=edges.packed,
+                   consumption_rate=edges.consumption_rate)
+        return model
+
+    # a memory-mapped dense matrix if one was stored or fits the memory budget, otherwise the
+    # sparse provider of create_distance_provider (which is not stored)
+    def distance_provider(self, coordinates: np.ndarray, memory_budget: int = DEFAULT_MEMORY_BUDGET,
+                          node_ids=None, **kwargs) -> DistanceProvider:
+        path = os.path.join(self.path, 'distances', 'matrix.npy')
+        stored = self.load('distances')
+        if stored is None:
+            provider = create_distance_provider(coordinates, memory_budget, node_ids, **kwargs)
+            if not isinstance(provider, MatrixDistanceProvider):
+                return provider
+            self.store('distances', {'matrix': provider.matrix})
+            if not os.path.exists(path):
+                return provider
+        return MatrixDistanceProvider.open(path, node_ids=node_ids)
+
+    def decompose_nodes(self, model: CEVRPModel, max_size: int, max_demand: float | None = None):
+        name = f'clusters-{max_size}-{max_demand}'
+        stored = self.load(name)
+        nodes_by_id = {node.node_id: node for node in model.nodes}
+        if stored is not None:
+            clusters = _split(stored[0]['nodes'], stored[0]['offsets'], nodes_by_id)
+            if clusters is not None:
+                model.node_clusters = dict(zip(stored[0]['labels'].tolist(), clusters))
+                return
+
+        model.decompose_nodes(max_size, max_demand)
+        clusters = list(model.node_clusters.values())
+        self.store(name, {'labels': np.array(list(model.node_clusters), dtype=np.int64), **_flatten(clusters)})
+
+    # initial tour plans of the model's clusters, which have to come from decompose_nodes with the same bounds
+    def generate_initial_solutions(self, model: CEVRPModel, max_size: int, max_demand: float | None = None,
+                                   constructor: str = 'cws') -> dict[int, TourPlan]:
+        name = f'{constructor}-{max_size}-{max_demand}'
+        stored = self.load(name)
+        nodes_by_id = {node.node_id: node for node in model.nodes}
+        if stored is not None:
+            arrays = stored[0]
+            tours = _split(arrays['nodes'], arrays['offsets'], nodes_by_id)
+            if tours is not None:
+                plan_offsets = arrays['plan_offsets'].tolist()
+                return {label: TourPlan([Tour(nodes) for nodes in tours[start:end]])
+                        for label, start, end in zip(arrays['labels'].tolist(), plan_offsets[:-1], plan_offsets[1:])}
+
+        tour_plans = {label: model.generate_initial_solution(nodes, constructor)
+                      for label, nodes in model.node_clusters.items()}
+        plan_lengths = [len(plan) for plan in tour_plans.values()]
+        self.store(name, {'labels': np.array(list(tour_plans), dtype=np.int64),
+                          'plan_offsets': np.cumsum([0] + plan_lengths, dtype=np.int64),
+                          **_flatten([tour.nodes for plan in tour_plans.values() for tour in plan])})
+        return tour_plans
+
+
+def _flatten(groups: list[list[Node]]) -> dict[str, np.ndarray]:
+    lengths = [len(group) for group in groups]
+    return {'nodes': np.fromiter((node.node_id for group in groups for node in group), dtype=np.int64,
+                                 count=sum(lengths)),
+            'offsets': np.cumsum([0] + lengths, dtype=np.int64)}
+
+
+# None if a stored id is not part of the model
+def _split(node_ids: np.ndarray, offsets: np.ndarray, nodes_by_id: dict[int, Node]) -> list[list[Node]] | None:
+    try:
+        nodes = [nodes_by_id[node_id] for node_id in node_ids.tolist()]
+    except KeyError:
+        return None
+    offsets = offsets.tolist()
+    return [nodes[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+# Persistent, content-addressed cache of the construction phase: battery threshold, feasible edges,
+# distance matrix, clusters and initial solutions of a node table are stored under construction_key, so
+# solving the same customers with the same vehicles again skips construction. The cache is bounded by
+# the bytes on disk; entries are evicted least recently used first (by the modification time of their
+# directory, which every load and store updates), the entry just written is always kept.
+# Several processes may share one root.
+class ConstructionCache:
+    def __init__(self, root: str | os.PathLike, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.root = os.fspath(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def entry(self, data: InstanceData, vehicle: Vehicle) -> CacheEntry:
+        return CacheEntry(self, construction_key(np.arange(len(data)), data.coordinates, data.demands,
+                                                 data.service_times, vehicle))
+
+    def entry_for_nodes(self, nodes: list[Node], vehicle: Vehicle) -> CacheEntry:
+        node_ids = np.fromiter((node.node_id for node in nodes), dtype=np.int64, count=len(nodes))
+        coordinates = np.array([(node.x, node.y) for node in nodes], dtype=np.float64).reshape(-1, 2)
+        demands = np.array([node.demand for node in nodes], dtype=np.float64)
+        service_times = np.array([node.service_time for node in nodes], dtype=np.float64)
+        return CacheEntry(self, construction_key(node_ids, coordinates, demands, service_times, vehicle))
+
+    def touch(self, key: str):
+        try:
+            os.utime(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _size(path: str) -> int:
+        size = 0
+        for directory, _, files in os.walk(path):
+            for file in files:
+                try:
+                    size += os.path.getsize(os.path.join(directory, file))
+                except FileNotFoundError:
+                    pass
+        return size
+
+    @property
+    def nbytes(self) -> int:
+        return self._size(self.root)
+
+    def evict(self, keep: str | None = None):
+        entries = []
+        for key in os.listdir(self.root):
+            path = os.path.join(self.root, key)
+            try:
+                entries.append((os.path.getmtime(path), key, self._size(path)))
+            except FileNotFoundError:
+                continue
+        total = sum(size for _, _, size in entries)
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def info(self) -> dict[str, int]:
+        return {
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
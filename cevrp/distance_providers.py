@@ -0,0 +1,311 @@
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable
+
+import numpy as np
+from sklearn.neighbors import NearestNeighbors
+
+from cevrp.geometry import max_pairwise_distance
+from cevrp.node import Node
+
+
+# A distance provider is a Node distance_calculator backed by precomputed data. Nodes are mapped to
+# matrix rows by their position in node_ids (by default node_id == position, as produced by the
+# InstanceLoader). Besides the per-pair call used by Node.__sub__, providers answer bulk queries.
+class DistanceProvider(ABC):
+    def __init__(self, node_ids: Iterable[int] | None = None):
+        self.node_ids = None if node_ids is None else np.asarray(node_ids, dtype=np.int64)
+        self._positions = None
+        if self.node_ids is not None:
+            self._positions = np.full(self.node_ids.max() + 1, -1, dtype=np.int64)
+            self._positions[self.node_ids] = np.arange(len(self.node_ids))
+
+    @abstractmethod
+    def __call__(self, node1: Node, node2: Node) -> float:
+        pass
+
+    def position_of(self, node_id: int) -> int:
+        if self._positions is None:
+            return node_id
+        position = self._positions[node_id] if node_id < len(self._positions) else -1
+        if position < 0:
+            raise KeyError(f'Node {node_id} is not covered by the distance provider.')
+        return int(position)
+
+    def positions_of(self, node_ids) -> np.ndarray:
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if self._positions is None:
+            return node_ids
+        positions = self._positions[node_ids]
+        if np.any(positions < 0):
+            raise KeyError(f'Nodes {node_ids[positions < 0].tolist()} are not covered by the distance provider.')
+        return positions
+
+    @abstractmethod
+    def pairwise(self, node_ids_1, node_ids_2) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def max_distance(self, node_ids) -> float:
+        pass
+
+    def attach(self, nodes: Iterable[Node]):
+        for node in nodes:
+            node.distance_calculator = self
+
+    # resident memory held by the provider, used for size-bounded caching
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._positions is None else self._positions.nbytes
+
+
+class MatrixDistanceProvider(DistanceProvider):
+    def __init__(self, matrix: np.ndarray, node_ids: Iterable[int] | None = None, path: str | None = None):
+        super().__init__(node_ids)
+        if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError(f'Distance matrix must be square, got shape {matrix.shape}.')
+        self.matrix = matrix
+        self.path = path
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        # memory-mapped pages belong to the page cache and can be dropped by the OS at any time
+        matrix_bytes = 0 if isinstance(self.matrix, np.memmap) else self.matrix.nbytes
+        return super().nbytes + matrix_bytes
+
+    # .npy files are memory-mapped with their stored dtype and shape, any other file is read as a
+    # raw row-major square matrix of the given dtype. Pages are shared read-only between processes.
+    @classmethod
+    def open(
+            cls,
+            path: str | os.PathLike,
+            dtype=np.float32,
+            num_nodes: int | None = None,
+            node_ids: Iterable[int] | None = None,
+    ) -> 'MatrixDistanceProvider':
+        path = os.fspath(path)
+        if path.endswith('.npy'):
+            matrix = np.load(path, mmap_mode='r')
+        else:
+            if num_nodes is None:
+                num_nodes = int(round((os.path.getsize(path) / np.dtype(dtype).itemsize) ** 0.5))
+            matrix = np.memmap(path, dtype=dtype, mode='r', shape=(num_nodes, num_nodes))
+        provider = cls(matrix, node_ids)
+        provider.path = path
+        return provider
+
+    @staticmethod
+    def write(path: str | os.PathLike, matrix: np.ndarray, dtype=np.float32):
+        path = os.fspath(path)
+        matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        if path.endswith('.npy'):
+            np.save(path, matrix)
+        else:
+            matrix.tofile(path)
+
+    # memory-mapped providers travel to worker processes as file references and are re-mapped there
+    def __reduce__(self):
+        if self.path is not None:
+            if isinstance(self.matrix, np.memmap):
+                return _reopen_raw, (self.path, self.matrix.dtype.str, self.matrix.shape[0], self.node_ids)
+            return _reopen_npy, (self.path, self.node_ids)
+        return MatrixDistanceProvider, (np.asarray(self.matrix), self.node_ids)
+
+    def __call__(self, node1: Node, node2: Node) -> float:
+        if self._positions is None:
+            return float(self.matrix[node1.node_id, node2.node_id])
+        return float(self.matrix[self.position_of(node1.node_id), self.position_of(node2.node_id)])
+
+    def pairwise(self, node_ids_1, node_ids_2) -> np.ndarray:
+        rows = self.positions_of(node_ids_1)
+        columns = self.positions_of(node_ids_2)
+        return np.asarray(self.matrix[rows][:, columns], dtype=np.float64)
+
+    def max_distance(self, node_ids, chunk_size: int = 1024) -> float:
+        positions = self.positions_of(node_ids)
+        max_distance = 0.0
+        for start in range(0, len(positions), chunk_size):
+            rows = self.matrix[positions[start:start + chunk_size]]
+            max_distance = max(max_distance, float(rows[:, positions].max(initial=0)))
+        return max_distance
+
+
+def _reopen_raw(path, dtype, num_nodes, node_ids):
+    return MatrixDistanceProvider.open(path, np.dtype(dtype), num_nodes, node_ids)
+
+
+def _reopen_npy(path, node_ids):
+    return MatrixDistanceProvider.open(path, node_ids=node_ids)
+
+
+# Keeps the distances to the k nearest neighbors of every node and to the depot. Any other pair is
+# computed on demand by the fallback (euclidean from the coordinates unless given) and kept in a
+# bounded LRU cache. Memory grows with n * k instead of n^2.
+# With a custom fallback, max_distance calls it for every pair of the given nodes (bypassing the cache),
+# which is quadratic in their number.
+class SparseDistanceProvider(DistanceProvider):
+    def __init__(
+            self,
+            coordinates: np.ndarray,
+            k: int = 16,
+            cache_size: int = 1 << 16,
+            node_ids: Iterable[int] | None = None,
+            depot_position: int = 0,
+            fallback=None,
+    ):
+        super().__init__(node_ids)
+        self.coordinates = np.asarray(coordinates, dtype=np.float64)
+        self.depot_position = depot_position
+        self.fallback = fallback if fallback is not None else self._euclidean
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        k = min(k, len(self.coordinates) - 1)
+        distances, neighbors = NearestNeighbors(n_neighbors=k + 1).fit(self.coordinates).kneighbors(self.coordinates)
+        order = np.argsort(neighbors, axis=1)
+        self.neighbors = np.take_along_axis(neighbors, order, axis=1)
+        self.neighbor_distances = np.take_along_axis(distances, order, axis=1)
+        self.depot_distances = np.sqrt(((self.coordinates - self.coordinates[depot_position]) ** 2).sum(axis=1))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.coordinates, self.neighbors, self.neighbor_distances, self.depot_distances)
+        # an OrderedDict entry with a tuple key and a float value takes roughly 200 bytes
+        return super().nbytes + sum(a.nbytes for a in arrays) + 200 * len(self._cache)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_cache_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    def _euclidean(self, i: int, j: int) -> float:
+        (x1, y1), (x2, y2) = self.coordinates[i], self.coordinates[j]
+        return math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+
+    def distance(self, i: int, j: int) -> float:
+        if i == j:
+            return 0.0
+        if i == self.depot_position:
+            return float(self.depot_distances[j])
+        if j == self.depot_position:
+            return float(self.depot_distances[i])
+
+        row = self.neighbors[i]
+        column = row.searchsorted(j)
+        if column < len(row) and row[column] == j:
+            return float(self.neighbor_distances[i, column])
+
+        key = (i, j) if i < j else (j, i)
+        with self._cache_lock:
+            distance = self._cache.get(key)
+            if distance is not None:
+                self.hits += 1
+                self._cache.move_to_end(key)
+                return distance
+            self.misses += 1
+
+        distance = self.fallback(i, j)
+        with self._cache_lock:
+            self._cache[key] = distance
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return distance
+
+    def __call__(self, node1: Node, node2: Node) -> float:
+        return self.distance(self.position_of(node1.node_id), self.position_of(node2.node_id))
+
+    def cache_info(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache), 'max_size': self.cache_size}
+
+    def pairwise(self, node_ids_1, node_ids_2) -> np.ndarray:
+        rows = self.coordinates[self.positions_of(node_ids_1)]
+        columns = self.coordinates[self.positions_of(node_ids_2)]
+        if self.fallback != self._euclidean:
+            return np.array([[self.distance(i, j) for j in self.positions_of(node_ids_2)]
+                             for i in self.positions_of(node_ids_1)])
+        return np.sqrt(((rows[:, None, :] - columns[None, :, :]) ** 2).sum(axis=2))
+
+    def max_distance(self, node_ids) -> float:
+        positions = self.positions_of(node_ids)
+        max_distance = max_pairwise_distance(self.coordinates[positions])
+        if self.fallback != self._euclidean:
+            # neighbor and depot distances are euclidean, all other pairs come from the fallback
+            positions = positions.tolist()
+            max_distance = max([max_distance] + [self.fallback(i, j) for k, i in enumerate(positions)
+                                                 for j in positions[k + 1:] if i != j])
+        return max_distance
+
+
+DEFAULT_MEMORY_BUDGET = 512 * 1024 ** 2
+
+
+# Euclidean distances between two coordinate sets, written row block by row block into out (a fresh
+# matrix, a memmap or shared memory). The temporaries of a block hold about chunk_elements entries, so
+# the peak memory stays close to the size of out.
+def euclidean_distances(coordinates_1: np.ndarray, coordinates_2: np.ndarray, out: np.ndarray | None = None,
+                        chunk_elements: int = 1 << 22) -> np.ndarray:
+    coordinates_1 = np.asarray(coordinates_1, dtype=np.float64).reshape(-1, 2)
+    coordinates_2 = np.asarray(coordinates_2, dtype=np.float64).reshape(-1, 2)
+    if out is None:
+        out = np.empty((len(coordinates_1), len(coordinates_2)))
+    rows = max(1, chunk_elements // max(len(coordinates_2), 1))
+    for start in range(0, len(coordinates_1), rows):
+        block = coordinates_1[start:start + rows]
+        np.hypot(block[:, None, 0] - coordinates_2[None, :, 0], block[:, None, 1] - coordinates_2[None, :, 1],
+                 out=out[start:start + rows])
+    return out
+
+
+def max_euclidean_distance(coordinates_1: np.ndarray, coordinates_2: np.ndarray,
+                           chunk_elements: int = 1 << 22) -> float:
+    coordinates_1 = np.asarray(coordinates_1, dtype=np.float64).reshape(-1, 2)
+    coordinates_2 = np.asarray(coordinates_2, dtype=np.float64).reshape(-1, 2)
+    rows = max(1, chunk_elements // max(len(coordinates_2), 1))
+    max_distance = 0.0
+    for start in range(0, len(coordinates_1), rows):
+        distances = euclidean_distances(coordinates_1[start:start + rows], coordinates_2, None, chunk_elements)
+        max_distance = max(max_distance, float(distances.max(initial=0)))
+    return max_distance
+
+
+def create_distance_provider(
+        coordinates: np.ndarray,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        node_ids: Iterable[int] | None = None,
+        k: int = 16,
+        cache_size: int = 1 << 16,
+) -> DistanceProvider:
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    n = len(coordinates)
+    if n * n * np.dtype(np.float64).itemsize <= memory_budget:
+        return MatrixDistanceProvider(euclidean_distances(coordinates, coordinates), node_ids)
+    return SparseDistanceProvider(coordinates, k, cache_size, node_ids)
+
+
+def pairwise_distances(nodes_1: list[Node], nodes_2: list[Node]) -> np.ndarray:
+    if len(nodes_1) == 0 or len(nodes_2) == 0:
+        return np.zeros((len(nodes_1), len(nodes_2)))
+    calculator = nodes_1[0].distance_calculator
+    if isinstance(calculator, DistanceProvider):
+        return calculator.pairwise([n.node_id for n in nodes_1], [n.node_id for n in nodes_2])
+    if calculator == Node.calculate_distance:
+        coordinates_1 = np.array([(n.x, n.y) for n in nodes_1], dtype=np.float64)
+        coordinates_2 = np.array([(n.x, n.y) for n in nodes_2], dtype=np.float64)
+        return np.sqrt(((coordinates_1[:, None, :] - coordinates_2[None, :, :]) ** 2).sum(axis=2))
+    return np.array([[n1 - n2 for n2 in nodes_2] for n1 in nodes_1], dtype=np.float64)
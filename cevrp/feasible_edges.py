@@ -0,0 +1,90 @@
+import numpy as np
+
+from cevrp.distance_providers import DistanceProvider, pairwise_distances
+from cevrp.geometry import max_pairwise_distance
+from cevrp.node import Node
+
+# above this many nodes the matrix is stored as a packed bitset (n * n / 8 bytes)
+DENSE_LIMIT = 4096
+
+
+# Battery feasibility of single edges: an edge (a, b) is feasible iff (a - b) * consumption_rate stays
+# within the battery threshold, which depends on the endpoints only and can be looked up instead of
+# being recomputed for every candidate tour.
+# The battery threshold is derived from the largest customer distance, so usually every edge between
+# customers is feasible and only the depot row has to be stored. The full matrix (boolean, or packed
+# bitset for large n) is only built if some customer pair exceeds the threshold.
+class FeasibleEdges:
+    def __init__(
+            self,
+            node_ids: list[int],
+            depot_position: int,
+            depot_feasible: np.ndarray,
+            matrix: np.ndarray | None,
+            packed: bool,
+            battery_threshold: float,
+            consumption_rate: float,
+    ):
+        self.positions = {node_id: position for position, node_id in enumerate(node_ids)}
+        self.depot_id = node_ids[depot_position]
+        self.depot_feasible = depot_feasible
+        self.matrix = matrix
+        self.packed = packed
+        self.battery_threshold = battery_threshold
+        self.consumption_rate = consumption_rate
+
+    @staticmethod
+    def build(nodes: list[Node], battery_threshold: float, consumption_rate: float,
+              dense_limit: int = DENSE_LIMIT, chunk_size: int = 1024) -> 'FeasibleEdges':
+        depot_position = next(i for i, n in enumerate(nodes) if n.node_id == 0)
+        depot_distances = pairwise_distances([nodes[depot_position]], nodes)[0]
+        depot_feasible = depot_distances * consumption_rate <= battery_threshold
+
+        customers = [n for i, n in enumerate(nodes) if i != depot_position]
+        matrix, packed = None, False
+        if FeasibleEdges._max_distance(customers) * consumption_rate > battery_threshold:
+            packed = len(nodes) > dense_limit
+            rows = []
+            for start in range(0, len(nodes), chunk_size):
+                feasible = pairwise_distances(nodes[start:start + chunk_size], nodes) * consumption_rate \
+                    <= battery_threshold
+                rows.append(np.packbits(feasible, axis=1) if packed else feasible)
+            matrix = np.concatenate(rows)
+
+        return FeasibleEdges([n.node_id for n in nodes], depot_position, depot_feasible, matrix, packed,
+                             battery_threshold, consumption_rate)
+
+    @staticmethod
+    def _max_distance(nodes: list[Node]) -> float:
+        if len(nodes) < 2:
+            return 0.0
+        calculator = nodes[0].distance_calculator
+        if all(n.distance_calculator == Node.calculate_distance for n in nodes):
+            return max_pairwise_distance(np.array([(n.x, n.y) for n in nodes], dtype=np.float64))
+        if isinstance(calculator, DistanceProvider) and all(n.distance_calculator is calculator for n in nodes):
+            return calculator.max_distance([n.node_id for n in nodes])
+        # no cheap bound available, build the matrix
+        return np.inf
+
+    @property
+    def nbytes(self) -> int:
+        return self.depot_feasible.nbytes + (0 if self.matrix is None else self.matrix.nbytes)
+
+    def is_feasible(self, a: Node, b: Node) -> bool:
+        i = self.positions.get(a.node_id)
+        j = self.positions.get(b.node_id)
+        if i is None or j is None:
+            # node added after the matrix was built
+            return (a - b) * self.consumption_rate <= self.battery_threshold
+        if a.node_id == self.depot_id:
+            return bool(self.depot_feasible[j])
+        if b.node_id == self.depot_id:
+            return bool(self.depot_feasible[i])
+        if self.matrix is None:
+            return True
+        if self.packed:
+            return bool((self.matrix[i, j >> 3] >> (7 - (j & 7))) & 1)
+        return bool(self.matrix[i, j])
+
+    def all_feasible(self, nodes: list[Node]) -> bool:
+        return all(self.is_feasible(a, b) for a, b in zip(nodes, nodes[1:]))
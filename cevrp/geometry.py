@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def _cross(o: np.ndarray, a: np.ndarray, b: np.ndarray) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points: np.ndarray) -> np.ndarray:
+    points = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 2), axis=0)
+    if len(points) <= 3:
+        return points
+
+    # Akl-Toussaint heuristic: points strictly inside the quadrilateral spanned by the
+    # four extreme points can never be part of the hull and are dropped in bulk.
+    extremes = points[[points[:, 0].argmin(), points[:, 1].argmin(), points[:, 0].argmax(), points[:, 1].argmax()]]
+    inside = np.ones(len(points), dtype=bool)
+    for k in range(4):
+        o, a = extremes[k], extremes[(k + 1) % 4]
+        inside &= (a[0] - o[0]) * (points[:, 1] - o[1]) - (a[1] - o[1]) * (points[:, 0] - o[0]) > 0
+    candidates = points[~inside]
+
+    # Andrew's monotone chain (candidates are already sorted lexicographically by np.unique)
+    lower, upper = [], []
+    for p in candidates:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in candidates[::-1]:
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    return np.array(lower[:-1] + upper[:-1])
+
+
+def max_pairwise_distance(points: np.ndarray, chunk_size: int = 2048) -> float:
+    hull = convex_hull(points)
+    if len(hull) < 2:
+        return 0.0
+
+    # the diameter of a point set is always attained between two hull vertices
+    max_distance = 0.0
+    for start in range(0, len(hull), chunk_size):
+        block = hull[start:start + chunk_size]
+        distances = np.sqrt(((block[:, None, :] - hull[None, :, :]) ** 2).sum(axis=2))
+        max_distance = max(max_distance, float(distances.max()))
+    return max_distance
@@ -0,0 +1,98 @@
+import math
+
+import numpy as np
+
+from cevrp.instance_loader import InstanceData
+
+DISTRIBUTIONS = ('uniform', 'clustered', 'mixed', 'depot_off_center')
+
+
+def instance_name(distribution: str, num_customers: int, seed: int | None) -> str:
+    return f'{distribution}-n{num_customers}-s{seed}'
+
+
+# Synthetic instance in the square [-extent, extent]², drawn from a numpy Generator seeded with seed,
+# so the same arguments always give the same instance. Customer locations follow the distribution:
+#   uniform           uniformly in the square
+#   clustered         normally around num_centers uniform centers (standard deviation cluster_spread
+#                     times the side length), clipped to the square
+#   mixed             a clustered_share of clustered customers, the others uniform
+#   depot_off_center  uniform, with the depot in the lower left corner
+# The depot lies in the center of the square unless depot names its location. Demands and service
+# times are integers drawn uniformly from [1, max_demand] and [1, max_service_time]. integral rounds
+# the locations to the integer grid. Everything is drawn in whole arrays, a million customers take
+# well under a second.
+def generate_instance(
+        num_customers: int,
+        distribution: str = 'uniform',
+        seed: int | None = None,
+        extent: float = 100,
+        max_demand: int = 10,
+        max_service_time: int = 10,
+        commodity_capacity: float = 100,
+        num_vehicles: int | None = None,
+        distance_threshold: float = math.inf,
+        num_centers: int | None = None,
+        cluster_spread: float = 0.05,
+        clustered_share: float = 0.5,
+        depot: tuple[float, float] | None = None,
+        integral: bool = False,
+) -> InstanceData:
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f'Unknown distribution {distribution}, expected one of {DISTRIBUTIONS}.')
+    if num_customers < 0:
+        raise ValueError(f'Expected a non-negative number of customers, got {num_customers}.')
+
+    rng = np.random.default_rng(seed)
+    if distribution == 'clustered':
+        num_clustered = num_customers
+    elif distribution == 'mixed':
+        num_clustered = int(round(clustered_share * num_customers))
+    else:
+        num_clustered = 0
+    if num_centers is None:
+        num_centers = max(1, round(math.sqrt(num_customers) / 2))
+
+    locations = np.empty((num_customers, 2))
+    if num_clustered > 0:
+        centers = rng.uniform(-extent, extent, size=(num_centers, 2))
+        members = rng.integers(num_centers, size=num_clustered)
+        offsets = rng.normal(0, cluster_spread * 2 * extent, size=(num_clustered, 2))
+        locations[:num_clustered] = np.clip(centers[members] + offsets, -extent, extent)
+    locations[num_clustered:] = rng.uniform(-extent, extent, size=(num_customers - num_clustered, 2))
+    if distribution == 'mixed':
+        # clustered and uniform customers interleaved, ids do not tell them apart
+        locations = locations[rng.permutation(num_customers)]
+    if integral:
+        locations = np.rint(locations)
+
+    if depot is None:
+        depot = (-extent, -extent) if distribution == 'depot_off_center' else (0, 0)
+    coordinates = np.vstack((np.asarray(depot, dtype=np.float64).reshape(1, 2), locations))
+    # like loaded instances, the depot lies in the origin
+    coordinates -= coordinates[0]
+
+    demands = np.zeros(num_customers + 1)
+    demands[1:] = rng.integers(1, max_demand, endpoint=True, size=num_customers)
+    service_times = np.zeros(num_customers + 1)
+    service_times[1:] = rng.integers(1, max_service_time, endpoint=True, size=num_customers)
+
+    header = {
+        'CAPACITY': str(commodity_capacity),
+        'DISTANCE': str(distance_threshold),
+        'DISTRIBUTION': distribution,
+        'SEED': str(seed),
+    }
+    if num_vehicles is not None:
+        header['VEHICLES'] = str(num_vehicles)
+    return InstanceData(
+        name=instance_name(distribution, num_customers, seed),
+        coordinates=coordinates,
+        demands=demands,
+        service_times=service_times,
+        original_ids=np.arange(num_customers + 1),
+        commodity_capacity=commodity_capacity,
+        num_vehicles=num_vehicles,
+        distance_threshold=distance_threshold,
+        header=header,
+    )
@@ -0,0 +1,265 @@
+import io
+import math
+import os
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.distance_providers import DEFAULT_MEMORY_BUDGET, DistanceProvider, create_distance_provider
+from cevrp.node import Node
+from cevrp.vehicle import Vehicle
+
+_KEYWORD_LINE = re.compile(r'^[ \t]*([A-Za-z][A-Za-z_]*)[ \t]*(?::[ \t]*(.*?))?[ \t]*\r?$', re.MULTILINE)
+
+
+@dataclass
+class InstanceData:
+    # node table: row 0 is the depot, coordinates are translated so that the depot lies in the origin
+    name: str
+    coordinates: np.ndarray
+    demands: np.ndarray
+    service_times: np.ndarray
+    original_ids: np.ndarray
+    commodity_capacity: float
+    num_vehicles: int | None = None
+    battery_capacity: float | None = None
+    battery_consumption_rate: float | None = None
+    distance_threshold: float = math.inf
+    header: dict[str, str] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def create_nodes(self, distance_calculator=None) -> list[Node]:
+        xs = self.coordinates[:, 0].tolist()
+        ys = self.coordinates[:, 1].tolist()
+        demands = _as_python_numbers(self.demands)
+        service_times = _as_python_numbers(self.service_times)
+        nodes = [
+            Node(node_id, demand, service_time, x, y, distance_calculator)
+            for node_id, demand, service_time, x, y
+            in zip(range(len(xs)), demands, service_times, xs, ys)
+        ]
+        Node.advance_creation_index(len(nodes))
+        return nodes
+
+    def create_vehicles(
+            self,
+            num_vehicles=None,
+            battery_capacity=3000,
+            battery_consumption_rate=10,
+            charging_rate=10,
+    ) -> list[Vehicle]:
+        if num_vehicles is None:
+            num_vehicles = self.num_vehicles
+        if num_vehicles is None:
+            num_vehicles = max(1, math.ceil(float(self.demands.sum()) / self.commodity_capacity))
+        if self.battery_capacity is not None:
+            battery_capacity = self.battery_capacity
+        if self.battery_consumption_rate is not None:
+            battery_consumption_rate = self.battery_consumption_rate
+
+        return [
+            Vehicle(i, self.commodity_capacity, battery_capacity, battery_consumption_rate, charging_rate,
+                    self.distance_threshold)
+            for i in range(1, num_vehicles + 1)
+        ]
+
+    def create_distance_provider(self, memory_budget: int = DEFAULT_MEMORY_BUDGET, **kwargs) -> DistanceProvider:
+        return create_distance_provider(self.coordinates, memory_budget, **kwargs)
+
+    def to_model(self, distance_calculator=None, **vehicle_parameters) -> CEVRPModel:
+        return CEVRPModel(self.create_nodes(distance_calculator), self.create_vehicles(**vehicle_parameters))
+
+
+class InstanceLoader:
+    @staticmethod
+    def load(path: str | os.PathLike, **kwargs) -> InstanceData:
+        path = os.fspath(path)
+        if path.lower().endswith('.csv'):
+            return InstanceLoader.load_csv(path, **kwargs)
+        return InstanceLoader.load_tsplib(path, **kwargs)
+
+    @staticmethod
+    def load_model(path: str | os.PathLike, distance_calculator=None, **vehicle_parameters) -> CEVRPModel:
+        return InstanceLoader.load(path).to_model(distance_calculator, **vehicle_parameters)
+
+    # CVRPLIB (TSPLIB-95 style) .vrp files and IEEE WCCI-2020 .evrp files share the same layout:
+    # "KEY : VALUE" header lines followed by whitespace separated numeric sections.
+    @staticmethod
+    def load_tsplib(path: str | os.PathLike, service_time: float | None = None) -> InstanceData:
+        with open(path, 'r') as file:
+            text = file.read()
+
+        header, sections = InstanceLoader._split_sections(text)
+        if 'NODE_COORD_SECTION' not in sections:
+            edge_weight_type = header.get('EDGE_WEIGHT_TYPE', 'UNKNOWN')
+            raise ValueError(f'Instance {path} has no NODE_COORD_SECTION (EDGE_WEIGHT_TYPE {edge_weight_type}).')
+
+        dimension = int(header['DIMENSION'])
+        coordinate_table = InstanceLoader._read_table(sections['NODE_COORD_SECTION'], 3)
+        demand_table = InstanceLoader._read_table(sections['DEMAND_SECTION'], 2)
+
+        depot_ids = InstanceLoader._read_ids(sections.get('DEPOT_SECTION', '1\n-1'))
+        depot_id = int(depot_ids[0])
+
+        # EVRP instances list the charging stations after the customers. The model recharges
+        # at customer locations, hence the stations are not part of the node table.
+        station_ids = InstanceLoader._read_ids(sections.get('STATIONS_COORD_SECTION', ''))
+        coordinate_table = coordinate_table[~np.isin(coordinate_table[:, 0], station_ids)][:dimension]
+
+        ids = coordinate_table[:, 0].astype(np.int64)
+        demand_by_position = np.zeros(ids.max() + 1)
+        demand_by_position[demand_table[:, 0].astype(np.int64)] = demand_table[:, 1]
+        demands = demand_by_position[ids]
+
+        if service_time is None:
+            service_time = float(header.get('SERVICE_TIME', 0))
+
+        return InstanceLoader._create_instance_data(
+            header.get('NAME', os.path.basename(path)),
+            ids,
+            coordinate_table[:, 1:3],
+            demands,
+            np.full(len(ids), service_time),
+            depot_id,
+            header,
+        )
+
+    # one record per line: id, x, y, demand, service time. The first record is the depot.
+    @staticmethod
+    def load_csv(
+            path: str | os.PathLike,
+            commodity_capacity: float = 100,
+            num_vehicles: int | None = None,
+            distance_threshold: float = math.inf,
+            delimiter: str = ',',
+    ) -> InstanceData:
+        with open(path, 'r') as file:
+            first_line = file.readline()
+            has_header = not re.match(r'^\s*[-+.\d]', first_line)
+            file.seek(0)
+            table = np.loadtxt(file, delimiter=delimiter, skiprows=int(has_header), ndmin=2)
+
+        if table.shape[1] != 5:
+            raise ValueError(f'Expected 5 columns (id, x, y, demand, service time) in {path}, got {table.shape[1]}.')
+
+        header = {
+            'CAPACITY': str(commodity_capacity),
+            'DISTANCE': str(distance_threshold),
+        }
+        if num_vehicles is not None:
+            header['VEHICLES'] = str(num_vehicles)
+
+        ids = table[:, 0].astype(np.int64)
+        return InstanceLoader._create_instance_data(
+            os.path.splitext(os.path.basename(path))[0],
+            ids,
+            table[:, 1:3],
+            table[:, 3],
+            table[:, 4],
+            int(ids[0]),
+            header,
+        )
+
+    # JSON-style record, e.g. a request body: coordinates, demands and service times are mandatory,
+    # ids default to the positions and the first record is the depot unless 'depot' names another id.
+    @staticmethod
+    def load_dict(record: dict) -> InstanceData:
+        coordinates = np.asarray(record['coordinates'], dtype=np.float64).reshape(-1, 2)
+        ids = np.asarray(record.get('ids', range(len(coordinates))), dtype=np.int64)
+        demands = np.asarray(record['demands'], dtype=np.float64)
+        service_times = np.asarray(record.get('service_times', np.zeros(len(coordinates))), dtype=np.float64)
+        if not len(ids) == len(demands) == len(service_times) == len(coordinates):
+            raise ValueError('coordinates, demands, service_times and ids must have the same length.')
+
+        keys = {
+            'capacity': 'CAPACITY',
+            'vehicles': 'VEHICLES',
+            'distance_threshold': 'DISTANCE',
+            'energy_capacity': 'ENERGY_CAPACITY',
+            'energy_consumption': 'ENERGY_CONSUMPTION',
+        }
+        header = {keys[key]: str(value) for key, value in record.items() if key in keys and value is not None}
+        header.setdefault('CAPACITY', '100')
+        return InstanceLoader._create_instance_data(
+            record.get('name', 'instance'),
+            ids,
+            coordinates,
+            demands,
+            service_times,
+            int(record.get('depot', ids[0])),
+            header,
+        )
+
+    @staticmethod
+    def _create_instance_data(name, ids, coordinates, demands, service_times, depot_id, header) -> InstanceData:
+        depot_position = np.flatnonzero(ids == depot_id)
+        if len(depot_position) == 0:
+            raise ValueError(f'Depot {depot_id} is not part of instance {name}.')
+        order = np.concatenate((depot_position[:1], np.flatnonzero(ids != depot_id)))
+
+        coordinates = coordinates[order] - coordinates[order[0]]
+        demands = demands[order]
+        demands[0] = 0
+        service_times = service_times[order]
+        service_times[0] = 0
+
+        def get_float(*keys):
+            for key in keys:
+                if key in header:
+                    return float(header[key])
+            return None
+
+        num_vehicles = get_float('VEHICLES')
+        distance_threshold = get_float('DISTANCE')
+        return InstanceData(
+            name=name,
+            coordinates=coordinates,
+            demands=demands,
+            service_times=service_times,
+            original_ids=ids[order],
+            commodity_capacity=get_float('CAPACITY'),
+            num_vehicles=None if num_vehicles is None else int(num_vehicles),
+            battery_capacity=get_float('ENERGY_CAPACITY'),
+            battery_consumption_rate=get_float('ENERGY_CONSUMPTION'),
+            distance_threshold=math.inf if distance_threshold is None else distance_threshold,
+            header=header,
+        )
+
+    @staticmethod
+    def _split_sections(text: str) -> tuple[dict[str, str], dict[str, str]]:
+        header = {}
+        sections = {}
+        matches = list(_KEYWORD_LINE.finditer(text))
+        for index, match in enumerate(matches):
+            key, value = match.group(1).upper(), match.group(2)
+            if key.endswith('_SECTION'):
+                end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+                sections[key] = text[match.end():end]
+            elif key != 'EOF':
+                header[key] = (value or '').strip()
+        return header, sections
+
+    @staticmethod
+    def _read_table(body: str, columns: int) -> np.ndarray:
+        table = np.loadtxt(io.StringIO(body), ndmin=2)
+        if table.shape[1] < columns:
+            raise ValueError(f'Expected {columns} columns per record, got {table.shape[1]}.')
+        return table[:, :columns]
+
+    @staticmethod
+    def _read_ids(body: str) -> np.ndarray:
+        if not body.strip():
+            return np.empty(0)
+        ids = np.loadtxt(io.StringIO(body), ndmin=1).ravel()
+        terminator = np.flatnonzero(ids == -1)
+        return ids[:terminator[0]] if len(terminator) else ids
+
+
+def _as_python_numbers(values: np.ndarray) -> list:
+    if np.all(np.mod(values, 1) == 0):
+        return values.astype(np.int64).tolist()
+    return values.tolist()
@@ -1,9 +1,10 @@
 import cProfile
 import pstats
-import random
 import timeit
 
-from cevrp.cevrp_model import CEVRPModel, CEVRPVisualizer
+from cevrp.cevrp_model import CEVRPVisualizer
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
 from cevrp.tour import Tour
 from cevrp.vnd import cevrp_optimizer
 from cevrp.vehicle import *
@@ -34,26 +35,14 @@ def generate_data_set(
         max_battery_capacity,
         battery_consumption_rate,
         charging_rate,
+        distribution='uniform',
+        seed=None,
 ):
-    nodes = []
-    vehicles = []
-
-    depot = Node.create_depot()
-    nodes.append(depot)
-
-    # Create customers
-    demands = [random.randint(1, max_demand) for _ in range(num_customers)]
-    service_times = [random.randint(1, max_service_time) for _ in range(num_customers)]
-    x_y = [(random.randint(-100, 100), random.randint(-100, 100)) for _ in range(num_customers)]
-    nodes.extend(Node.list_create(x_y, demands, service_times))
-
-    # Create vehicles
-    for i in range(1, num_vehicles + 1):
-        vehicle = Vehicle(i, commodity_capacity, max_battery_capacity, battery_consumption_rate, charging_rate,
-                          max_distance)
-        vehicles.append(vehicle)
-
-    return CEVRPModel(nodes, vehicles)
+    data = generate_instance(num_customers, distribution, seed, max_demand=max_demand,
+                             max_service_time=max_service_time, commodity_capacity=commodity_capacity,
+                             distance_threshold=max_distance, integral=True)
+    return data.to_model(num_vehicles=num_vehicles, battery_capacity=max_battery_capacity,
+                         battery_consumption_rate=battery_consumption_rate, charging_rate=charging_rate)
 
 
 # Example usage
@@ -78,14 +67,18 @@ data = generate_data_set(
     max_battery_consumption,
     max_charging_rate,
 )
+metrics = MetricsRegistry()
 clustered_tour_plans = {}
-data.cluster_nodes(27, 5)
+with metrics.phase('clustering'):
+    # spatially compact subproblems of at most 30 customers / three vehicle loads, no DBSCAN outliers
+    data.decompose_nodes(30, 3 * max_capacity)
 visualizer = CEVRPVisualizer(data)
 visualizer.visualize_clusters()
-for cluster_key in data.node_clusters.keys():
-    if cluster_key == -1:
-        continue
-    clustered_tour_plans[cluster_key] = data.generate_cws_solution(data.node_clusters[cluster_key])
+with metrics.phase('cws'):
+    for cluster_key in data.node_clusters.keys():
+        if cluster_key == -1:
+            continue
+        clustered_tour_plans[cluster_key] = data.generate_cws_solution(data.node_clusters[cluster_key])
 
 
 #
@@ -102,12 +95,16 @@ cevrp_optimizer.optimize_tours(
     clustered_tour_plans,
     data,
     data.node_clusters[-1] if -1 in data.node_clusters.keys() else None,
-    {i}
+    {i},
+    metrics=metrics,
 )""", f'restats_{i}')
 
     p = pstats.Stats(f'restats_{i}')
     p.strip_dirs().sort_stats(pstats.SortKey.TIME).print_stats()
 
+metrics.to_json('metrics.json')
+metrics.to_prometheus('metrics.prom')
+
 # def test_costs_of_tour():
 #     nodes = Node.list_create(
 #         [(1, 1), (2, 1), (3, 1), (5, 10), (-3, -5), (5, 8)],
@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class OperatorMetrics:
+    attempts: int = 0
+    feasible: int = 0
+    # rejected by the lower bound of the move evaluator, neither counted feasible nor infeasible
+    pruned: int = 0
+    accepted: int = 0
+    improvement: float = 0.0
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+
+
+# Plain attribute increments and one perf_counter pair per attempt keep the collection
+# overhead negligible compared to a single tour evaluation, so the registry stays switched on.
+class MetricsRegistry:
+    PREFIX = 'cevrp'
+
+    def __init__(self):
+        self.operators: dict[str, OperatorMetrics] = {}
+        self.phases: dict[str, float] = {}
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, float] = {}
+
+    def operator(self, name: str) -> OperatorMetrics:
+        metrics = self.operators.get(name)
+        if metrics is None:
+            metrics = self.operators[name] = OperatorMetrics()
+        return metrics
+
+    def increment(self, name: str, amount: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def merge(self, other: 'MetricsRegistry'):
+        for name, metrics in other.operators.items():
+            own = self.operator(name)
+            for key, value in asdict(metrics).items():
+                setattr(own, key, getattr(own, key) + value)
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for name, value in other.counters.items():
+            self.increment(name, value)
+        # gauges are current values, the merged registry wins
+        self.gauges.update(other.gauges)
+
+    def to_dict(self) -> dict:
+        return {
+            'operators': {name: asdict(metrics) for name, metrics in self.operators.items()},
+            'phases': dict(self.phases),
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+
+    def to_json(self, path: str | os.PathLike | None = None) -> str:
+        content = json.dumps(self.to_dict(), indent=2)
+        if path is not None:
+            _write_atomically(path, content)
+        return content
+
+    def to_prometheus(self, path: str | os.PathLike | None = None) -> str:
+        p = MetricsRegistry.PREFIX
+        lines = []
+
+        def add_family(name, metric_type, help_text, samples):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {metric_type}')
+            lines.extend(f'{p}_{name}{{{label}}} {_format_value(value)}' for label, value in samples)
+
+        operator_fields = [
+            ('attempts', 'operator_attempts_total',
+             'Candidate moves generated per neighborhood operator (runner clients for sequential insertion).'),
+            ('feasible', 'operator_feasible_total',
+             'Candidates satisfying all constraints (runner clients inserted for sequential insertion).'),
+            ('pruned', 'operator_pruned_total',
+             'Candidates rejected by the lower bound on the cost change, without checking the constraints.'),
+            ('accepted', 'operator_accepted_total',
+             'Candidates accepted as improvement (runner clients inserted for sequential insertion).'),
+            ('improvement', 'operator_improvement_total', 'Cumulative cost reduction of accepted candidates.'),
+            ('seconds', 'operator_seconds_total', 'Wall-clock time spent in the operator.'),
+            ('cpu_seconds', 'operator_cpu_seconds_total', 'CPU time spent in the operator.'),
+        ]
+        for field, name, help_text in operator_fields:
+            add_family(name, 'counter', help_text, [
+                (f'operator="{operator}"', getattr(metrics, field))
+                for operator, metrics in sorted(self.operators.items())
+            ])
+        add_family('phase_seconds', 'gauge', 'Wall-clock time per solver phase.', [
+            (f'phase="{phase}"', seconds) for phase, seconds in sorted(self.phases.items())
+        ])
+        add_family('events_total', 'counter', 'Solver event counters.', [
+            (f'event="{event}"', value) for event, value in sorted(self.counters.items())
+        ])
+        add_family('gauge', 'gauge', 'Solver state values.', [
+            (f'name="{name}"', value) for name, value in sorted(self.gauges.items())
+        ])
+
+        content = '\n'.join(lines) + '\n'
+        if path is not None:
+            _write_atomically(path, content)
+        return content
+
+
+def _format_value(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _write_atomically(path: str | os.PathLike, content: str):
+    path = os.fspath(path)
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w') as file:
+        file.write(content)
+    os.replace(temporary_path, path)
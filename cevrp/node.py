@@ -1,4 +1,5 @@
 import math
+import threading
 from typing import Self
 
 import numpy as np
@@ -53,10 +54,25 @@ class Node:
         return Node
 
     @staticmethod
-    def create_depot() -> 'Node':
-        return Node(0, 0, 0, 0, 0)
+    def create_depot(distance_calculator=None) -> 'Node':
+        return Node(0, 0, 0, 0, 0, distance_calculator)
 
     creation_index = 1
+    _creation_lock = threading.Lock()
+
+    # reserves count consecutive node ids, thread-safe
+    @staticmethod
+    def reserve_ids(count: int) -> range:
+        with Node._creation_lock:
+            start = Node.creation_index
+            Node.creation_index += count
+        return range(start, start + count)
+
+    # ids below index are taken
+    @staticmethod
+    def advance_creation_index(index: int):
+        with Node._creation_lock:
+            Node.creation_index = max(Node.creation_index, index)
 
     @staticmethod
     def list_create(
@@ -70,10 +86,9 @@ class Node:
 
         nodes = []
         if isinstance(x_y_locations, list) and all(isinstance(loc, tuple) for loc in x_y_locations):
-            for index, each in enumerate(x_y_locations):
-                x, y = each
+            for index, node_id in enumerate(Node.reserve_ids(len(x_y_locations))):
+                x, y = x_y_locations[index]
                 demand, service_time = demands[index], service_times[index]
-                nodes.append(Node(Node.creation_index, demand, service_time, x, y, distance_calculator))
-                Node.creation_index += 1
+                nodes.append(Node(node_id, demand, service_time, x, y, distance_calculator))
 
         return nodes
@@ -13,7 +13,7 @@ class SavingsCalculator:
     def calculate_savings(i: Node, j: Node, vehicle: Vehicle):
         node_i = i
         node_j = j
-        depot = Node.create_depot()
+        depot = Node.create_depot(node_j.distance_calculator)
         distance_i0 = node_i - depot
         distance_0j = depot - node_j
         distance_ij = node_i - node_j
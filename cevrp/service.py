@@ -0,0 +1,436 @@
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from cevrp.cevrp_model import CONSTRUCTORS, CEVRPModel
+from cevrp.construction_cache import ConstructionCache
+from cevrp.cost_types import CostTypes
+from cevrp.distance_providers import DistanceProvider
+from cevrp.instance_generator import generate_instance
+from cevrp.instance_loader import InstanceData, InstanceLoader
+from cevrp.metrics import MetricsRegistry
+from cevrp.tour_plan import TourPlan
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.operator_selection import AdaptiveOperatorSelection
+from cevrp.vnd.run_history import IterationRecord, RunHistory
+from cevrp.vnd.shadow_verification import ShadowVerifier
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_BYTES = 1024 ** 3
+
+_TERMINAL_EVENTS = ('completed', 'failed')
+_REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            500: 'Internal Server Error'}
+
+
+def instance_hash(data: InstanceData) -> str:
+    digest = hashlib.sha256()
+    for array in (data.coordinates, data.demands, data.service_times):
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+# Everything derived from the node table alone. Vehicle parameters differ between jobs on the same
+# instance, so they are not part of the hash; clusters are stored per decomposition parameters.
+@dataclass
+class CachedInstance:
+    data: InstanceData
+    distance_provider: DistanceProvider
+    clusters: dict[tuple, list[list[int]]] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.data.coordinates, self.data.demands, self.data.service_times, self.data.original_ids)
+        cluster_bytes = sum(8 * len(ids) for clusters in self.clusters.values() for ids in clusters)
+        return sum(a.nbytes for a in arrays) + self.distance_provider.nbytes + cluster_bytes
+
+
+# LRU cache of instance-derived structures, bounded by their estimated memory. The most recently
+# used entry is always kept, even if it exceeds the budget on its own.
+class InstanceCache:
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, CachedInstance] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: str):
+        return key in self.entries
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self.entries.values())
+
+    def get_or_create(self, key: str, factory: Callable[[], CachedInstance]) -> tuple[CachedInstance, bool]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry, True
+
+            self.misses += 1
+            entry = self.entries[key] = factory()
+            self.evict()
+            return entry, False
+
+    def evict(self):
+        while len(self.entries) > 1 and self.nbytes > self.max_bytes:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def info(self) -> dict[str, int]:
+        return {
+            'entries': len(self.entries),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+@dataclass
+class SolveJob:
+    job_id: str
+    payload: dict
+    status: str = 'queued'
+    events: list[dict] = field(default_factory=list)
+    result: dict | None = None
+    subscribers: list[asyncio.Queue] = field(default_factory=list)
+
+    def publish(self, event: dict):
+        self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(event)
+
+    def subscribe(self) -> tuple[list[dict], asyncio.Queue]:
+        queue = asyncio.Queue()
+        self.subscribers.append(queue)
+        return list(self.events), queue
+
+    def summary(self) -> dict:
+        return {'job_id': self.job_id, 'status': self.status, 'result': self.result}
+
+
+# Long-running solve service. Jobs are queued and solved on a thread pool next to the event loop,
+# so that instance-derived structures are shared through one InstanceCache across all jobs.
+# Progress of a job is published as events, which clients receive as newline-delimited JSON.
+# With the GIL the solver threads do not run in parallel: concurrent jobs interleave and share one
+# core, the workers only keep a long job from blocking short ones. For throughput on several cores
+# run the batch runner (separate processes) or several services. Every job draws from its own
+# random.Random, so the seed of a job reproduces its result whatever else runs (unless a tour runs
+# into the wall-clock limits of the operators or the time budget ends the search).
+#
+#   POST /jobs                 submit a job, returns its id
+#   POST /solve                submit a job and stream its events until it finished
+#   GET  /jobs/<id>            status and result
+#   GET  /jobs/<id>/events     stream of all events of the job, from the first one
+#   GET  /cache                instance cache statistics (and construction cache statistics)
+#
+# A job is a JSON object:
+#   instance                   InstanceLoader.load_dict record, {"path": <instance file>} or
+#                              {"generate": <keyword arguments of generate_instance>}
+#   vehicle                    keyword arguments of InstanceData.create_vehicles
+#   max_cluster_size           decompose_nodes bound (30)
+#   max_cluster_demand         decompose_nodes bound (3 vehicle capacities)
+#   constructor                initial solution per cluster, "cws" or "sweep" ("cws")
+#   optimize                   run optimize_tours on the CWS solution (true)
+#   max_interchange_iterations optimize_tours parameter (2)
+#   adaptive                   adaptive operator selection (false)
+#   seed                       seed of the job's random draws and of the adaptive selection (none)
+#   time_budget                VNS time budget in seconds (none)
+#   shadow_rate                share of fast cost evaluations verified against the reference (0)
+# With a construction cache, the distance matrix, feasible edges, clusters and CWS solutions also
+# outlive the process, below the in-memory instance cache.
+class SolveService:
+    def __init__(self, workers: int = 2, cache_bytes: int = DEFAULT_CACHE_BYTES, max_finished_jobs: int = 1000,
+                 construction_cache: ConstructionCache | None = None):
+        self.workers = workers
+        self.cache = InstanceCache(cache_bytes)
+        self.construction_cache = construction_cache
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs: OrderedDict[str, SolveJob] = OrderedDict()
+        self.queue: asyncio.Queue | None = None
+        self._job_ids = itertools.count(1)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='cevrp-solver')
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, payload: dict) -> SolveJob:
+        if not isinstance(payload, dict) or 'instance' not in payload:
+            raise ValueError('A job needs an "instance".')
+        _check_constructor(payload)
+        job = SolveJob(str(next(self._job_ids)), payload)
+        self.jobs[job.job_id] = job
+        job.publish({'event': 'queued', 'job_id': job.job_id})
+        self.queue.put_nowait(job)
+        self._forget_finished_jobs()
+        return job
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in _TERMINAL_EVENTS]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            job.publish({'event': 'started', 'job_id': job.job_id})
+
+            def progress(event, job=job):
+                loop.call_soon_threadsafe(job.publish, event)
+
+            try:
+                job.result = await loop.run_in_executor(self._executor, self.solve, job.payload, progress)
+                job.status = 'completed'
+                job.publish({'event': 'completed', 'job_id': job.job_id, 'result': job.result})
+            except Exception as e:
+                logger.exception("JOB %s FAILED", job.job_id)
+                job.status = 'failed'
+                job.publish({'event': 'failed', 'job_id': job.job_id, 'error': f'{type(e).__name__}: {e}'})
+            finally:
+                self.queue.task_done()
+
+    def solve(self, payload: dict, progress: Callable[[dict], None] = lambda event: None) -> dict:
+        _check_constructor(payload)
+        start = time.perf_counter()
+        instance = payload['instance']
+        if 'path' in instance:
+            data = InstanceLoader.load(instance['path'])
+        elif 'generate' in instance:
+            data = generate_instance(**instance['generate'])
+        else:
+            data = InstanceLoader.load_dict(instance)
+
+        vehicles = data.create_vehicles(**payload.get('vehicle', {}))
+        stored = None if self.construction_cache is None else self.construction_cache.entry(data, vehicles[0])
+
+        def create_entry():
+            if stored is None:
+                return CachedInstance(data, data.create_distance_provider())
+            return CachedInstance(data, stored.distance_provider(data.coordinates))
+
+        key = instance_hash(data)
+        entry, cache_hit = self.cache.get_or_create(key, create_entry)
+        data = entry.data
+        progress({'event': 'instance', 'hash': key, 'cache_hit': cache_hit, 'nodes': len(data)})
+
+        metrics = MetricsRegistry()
+        nodes = data.create_nodes(entry.distance_provider)
+        model = CEVRPModel(nodes, vehicles) if stored is None else stored.create_model(nodes, vehicles)
+
+        max_size = payload.get('max_cluster_size', 30)
+        max_demand = payload.get('max_cluster_demand', 3 * model.vehicles[0].commodity_capacity)
+        with metrics.phase('clustering'):
+            # node ids are positions in the node table, see InstanceData.create_nodes
+            clusters = entry.clusters.get((max_size, max_demand))
+            if clusters is None:
+                if stored is None:
+                    model.decompose_nodes(max_size, max_demand)
+                else:
+                    stored.decompose_nodes(model, max_size, max_demand)
+                clusters = [[n.node_id for n in nodes] for nodes in model.node_clusters.values()]
+                entry.clusters[(max_size, max_demand)] = clusters
+            else:
+                model.node_clusters = {label: [model.nodes[i] for i in ids] for label, ids in enumerate(clusters)}
+        progress({'event': 'phase', 'phase': 'clustering', 'clusters': len(clusters)})
+
+        constructor = payload.get('constructor', 'cws')
+        with metrics.phase(constructor):
+            if stored is None:
+                tour_plans = {label: model.generate_initial_solution(nodes, constructor)
+                              for label, nodes in model.node_clusters.items()}
+            else:
+                tour_plans = stored.generate_initial_solutions(model, max_size, max_demand, constructor)
+        progress({'event': 'phase', 'phase': constructor, 'tours': sum(len(plan) for plan in tour_plans.values())})
+
+        if payload.get('optimize', True):
+            def on_record(record: IterationRecord):
+                progress({'event': 'iteration', 'iteration': record.iteration, 'total_cost': record.total_cost,
+                          'tours': record.num_tours})
+
+            tour_plan = cevrp_optimizer.optimize_tours(
+                tour_plans,
+                model,
+                None,
+                payload.get('max_interchange_iterations', 2),
+                history=RunHistory(len(model.nodes), on_record=on_record),
+                metrics=metrics,
+                visualize=False,
+                selection=AdaptiveOperatorSelection(seed=payload.get('seed')) if payload.get('adaptive') else None,
+                time_budget=payload.get('time_budget'),
+                shadow=ShadowVerifier(payload['shadow_rate']) if payload.get('shadow_rate') else None,
+                rng=random.Random(payload.get('seed')),
+            )
+        else:
+            tour_plan = TourPlan([t for plan in tour_plans.values() for t in plan])
+
+        vehicle = model.vehicles[0]
+        original_ids = data.original_ids.tolist()
+        return {
+            'instance': data.name,
+            'hash': key,
+            'cache_hit': cache_hit,
+            'tours': [[original_ids[n.node_id] for n in tour] for tour in tour_plan],
+            'total_cost': sum(t.get_costs_of_tour(vehicle, model.battery_threshold)[CostTypes.TOTAL]
+                              for t in tour_plan),
+            'seconds': time.perf_counter() - start,
+            'metrics': metrics.to_dict(),
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+            method, path = request_line[0], request_line[1].split('?')[0].rstrip('/')
+            try:
+                length = int(headers.get('content-length', 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                return await _send_json(writer, 400, {'error': 'Invalid Content-Length.'})
+            body = await reader.readexactly(length)
+            await self._route(method, path, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = path.strip('/').split('/')
+        if parts[0] in ('jobs', 'solve') and method == 'POST' and len(parts) == 1:
+            try:
+                job = self.submit(json.loads(body or b'{}'))
+            except ValueError as e:
+                return await _send_json(writer, 400, {'error': str(e)})
+            if parts[0] == 'jobs':
+                return await _send_json(writer, 202, job.summary())
+            return await self._stream_events(job, writer)
+
+        if parts[0] == 'jobs' and len(parts) in (2, 3) and method == 'GET':
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await _send_json(writer, 404, {'error': f'Unknown job {parts[1]}.'})
+            if len(parts) == 2:
+                return await _send_json(writer, 200, job.summary())
+            if parts[2] == 'events':
+                return await self._stream_events(job, writer)
+
+        if parts == ['cache'] and method == 'GET':
+            info = self.cache.info()
+            if self.construction_cache is not None:
+                info['construction'] = self.construction_cache.info()
+            return await _send_json(writer, 200, info)
+        if parts == ['health'] and method == 'GET':
+            return await _send_json(writer, 200, {'status': 'ok', 'queued': self.queue.qsize()})
+        await _send_json(writer, 404, {'error': f'No route for {method} {path}.'})
+
+    async def _stream_events(self, job: SolveJob, writer: asyncio.StreamWriter):
+        writer.write(_response_head(200, 'application/x-ndjson'))
+        past_events, queue = job.subscribe()
+        try:
+            for event in past_events:
+                writer.write(json.dumps(event).encode() + b'\n')
+            await writer.drain()
+            event = past_events[-1] if past_events else {}
+            while event.get('event') not in _TERMINAL_EVENTS:
+                event = await queue.get()
+                writer.write(json.dumps(event).encode() + b'\n')
+                await writer.drain()
+        finally:
+            job.subscribers.remove(queue)
+
+
+# The constructor names a metrics phase and construction cache entries, so it is checked before either
+# is touched. Submitted jobs are rejected with a 400.
+def _check_constructor(payload: dict):
+    constructor = payload.get('constructor', 'cws')
+    if constructor not in CONSTRUCTORS:
+        raise ValueError(f'Unknown constructor {constructor!r}, expected one of {CONSTRUCTORS}.')
+
+
+def _response_head(status: int, content_type: str, length: int | None = None) -> bytes:
+    lines = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}', f'Content-Type: {content_type}', 'Connection: close']
+    if length is not None:
+        lines.append(f'Content-Length: {length}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, content: dict):
+    body = json.dumps(content).encode()
+    writer.write(_response_head(status, 'application/json', len(body)) + body)
+    await writer.drain()
+
+
+async def serve(service: SolveService, host: str = '127.0.0.1', port: int = 8080,
+                path: str | None = None) -> asyncio.AbstractServer:
+    await service.start()
+    if path is not None:
+        return await asyncio.start_unix_server(service.handle, path=path)
+    return await asyncio.start_server(service.handle, host, port)
+
+
+async def _run(arguments):
+    construction_cache = None if arguments.cache_dir is None else ConstructionCache(arguments.cache_dir)
+    service = SolveService(arguments.workers, arguments.cache_megabytes * 1024 ** 2,
+                           construction_cache=construction_cache)
+    server = await serve(service, arguments.host, arguments.port, arguments.unix_socket)
+    logger.info("SERVING ON %s", arguments.unix_socket or f'{arguments.host}:{arguments.port}')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local CEVRP solve service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix-socket', default=None, help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--cache-megabytes', type=int, default=DEFAULT_CACHE_BYTES // 1024 ** 2)
+    parser.add_argument('--cache-dir', default=None, help='persistent construction cache')
+    arguments = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run(arguments))
+
+
+if __name__ == '__main__':
+    main()
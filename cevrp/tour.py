@@ -1,4 +1,6 @@
+import itertools
 import random
+import threading
 from copy import deepcopy
 from typing import Iterable
 
@@ -11,11 +13,14 @@ def is_collection_instance(collection: Iterable, collection_type, element_type)
     return isinstance(collection, collection_type) and any(isinstance(el, element_type) for el in collection)
 
 
+# Tours hash by id, ids are drawn under a lock so that tours created in different threads never share one.
 class Tour(Iterable):
-    id = 1
+    _ids = itertools.count(1)
+    _ids_lock = threading.Lock()
 
     def __init__(self, nodes: list[Node] | tuple[Node, Node]):
-        self.id = Tour.id
+        with Tour._ids_lock:
+            self.id = next(Tour._ids)
 
         if is_collection_instance(nodes, list, Node):
             self.nodes = nodes
@@ -28,8 +33,6 @@ class Tour(Iterable):
 
         self.total_demand = self.get_total_demand()
 
-        Tour.id += 1
-
     def __iter__(self):
         yield from self.nodes
 
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cevrp.batch import BatchRunner, BatchSettings, SharedArray, discover_instances
+
+
+def write_csv_instance(path, seed, num_customers=20):
+    rng = np.random.default_rng(seed)
+    coordinates = rng.integers(-40, 40, size=(num_customers, 2))
+    with open(path, 'w') as file:
+        file.write('id,x,y,demand,service_time\n')
+        file.write('1,5,5,0,0\n')
+        for i, (x, y) in enumerate(coordinates.tolist()):
+            file.write(f'{i + 2},{x},{y},{int(rng.integers(1, 10))},1\n')
+
+
+class BatchRunnerTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.instances = os.path.join(self.directory.name, 'instances')
+        os.mkdir(self.instances)
+        for seed in range(3):
+            write_csv_instance(os.path.join(self.instances, f'day-{seed}.csv'), seed)
+        with open(os.path.join(self.instances, 'notes.txt'), 'w') as file:
+            file.write('not an instance')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shared_array_round_trip(self):
+        array = np.arange(12, dtype=np.float64).reshape(4, 3)
+        reference, block = SharedArray.copy_of(array)
+        try:
+            view, attached = reference.attach()
+            np.testing.assert_array_equal(view, array)
+            del view
+            attached.close()
+        finally:
+            block.close()
+            block.unlink()
+
+    def test_discovers_directory_and_manifest(self):
+        self.assertEqual([os.path.basename(e['path']) for e in discover_instances(self.instances)],
+                         ['day-0.csv', 'day-1.csv', 'day-2.csv'])
+
+        manifest = os.path.join(self.directory.name, 'manifest.json')
+        with open(manifest, 'w') as file:
+            json.dump(['instances/day-1.csv', {'path': 'instances/day-2.csv', 'vehicle': {'charging_rate': 5}}], file)
+        entries = discover_instances(manifest)
+        self.assertEqual(entries[0]['path'], os.path.join(self.instances, 'day-1.csv'))
+        self.assertEqual(entries[1]['vehicle'], {'charging_rate': 5})
+
+    def test_rejects_unknown_constructor(self):
+        self.assertRaises(ValueError, BatchSettings, constructor='../savings')
+
+    def test_writes_one_record_per_instance(self):
+        output = os.path.join(self.directory.name, 'results.jsonl')
+        with open(os.path.join(self.instances, 'broken.csv'), 'w') as file:
+            file.write('1,2\n')
+
+        summary = BatchRunner(output, workers=2, settings=BatchSettings(optimize=False)).run(self.instances)
+        self.assertEqual((summary['completed'], summary['failed']), (3, 1))
+
+        with open(output) as file:
+            records = {os.path.basename(r['source']): r for r in map(json.loads, file)}
+        self.assertEqual(records['broken.csv']['status'], 'failed')
+        for name in ('day-0.csv', 'day-1.csv', 'day-2.csv'):
+            record = records[name]
+            customers = sorted(node_id for tour in record['tours'] for node_id in tour[1:-1])
+            self.assertEqual(customers, list(range(2, 22)))
+            self.assertTrue(all(tour[0] == tour[-1] == 1 for tour in record['tours']))
+            self.assertEqual(record['nodes'], 21)
+            self.assertIn('cws', record['metrics']['phases'])
@@ -0,0 +1,91 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from cevrp.cevrp_model import CONSTRUCTORS, CEVRPVisualizer
+from cevrp.constraints import Constraints, ConstraintValidationStrategy
+from cevrp.cost_types import CostTypes
+from cevrp.instance_generator import generate_instance
+
+
+class CEVRPModelTests(unittest.TestCase):
+    def setUp(self):
+        data = generate_instance(120, seed=5, max_demand=9, max_service_time=1, commodity_capacity=100,
+                                 distance_threshold=300, integral=True)
+        self.model = data.to_model(num_vehicles=1)
+
+    def test_decompose_nodes_respects_bounds(self):
+        for max_size, max_demand in [(25, None), (40, 60), (200, 30)]:
+            with self.subTest(max_size=max_size, max_demand=max_demand):
+                self.model.decompose_nodes(max_size, max_demand)
+                clusters = self.model.node_clusters
+                self.assertNotIn(-1, clusters)
+                for nodes in clusters.values():
+                    self.assertLessEqual(len(nodes), max_size)
+                    if max_demand is not None:
+                        self.assertLessEqual(sum(n.demand for n in nodes), max_demand)
+
+                assigned = sorted(n.node_id for nodes in clusters.values() for n in nodes)
+                self.assertEqual(assigned, list(range(1, 121)))
+
+    def test_decompose_nodes_rejects_oversized_customer(self):
+        self.assertRaises(ValueError, self.model.decompose_nodes, 10, 5)
+
+    def test_sweep_solution_satisfies_constraints(self):
+        for constructor in CONSTRUCTORS:
+            with self.subTest(constructor=constructor):
+                customers = self.model.nodes[1:41]
+                tour_plan = self.model.generate_initial_solution(customers, constructor)
+                self.assertEqual(sorted(n.node_id for t in tour_plan for n in t if n != self.model.depot),
+                                 sorted(n.node_id for n in customers))
+                for tour in tour_plan:
+                    self.assertEqual((tour[0], tour[-1]), (self.model.depot, self.model.depot))
+                    for constraint in Constraints:
+                        self.assertTrue(ConstraintValidationStrategy(
+                            constraint.value, tour, self.model.vehicles[0], self.model.battery_threshold).is_valid())
+
+    def test_sweep_tours_are_angular_sectors(self):
+        tour_plan = self.model.generate_sweep_solution()
+        self.assertGreater(len(tour_plan), 1)
+        self.assertEqual(sum(len(t) - 2 for t in tour_plan), 120)
+        angles = [np.unwrap([np.arctan2(n.y, n.x) for n in tour[1:-1]]) for tour in tour_plan]
+        for tour_angles in angles:
+            self.assertTrue(np.all(np.diff(tour_angles) >= 0))
+
+    def test_rejects_unknown_constructor(self):
+        self.assertRaises(ValueError, self.model.generate_initial_solution, None, 'savings')
+
+
+class CEVRPVisualizerTests(unittest.TestCase):
+    def setUp(self):
+        data = generate_instance(40, seed=3, max_demand=1, max_service_time=1, commodity_capacity=100,
+                                 distance_threshold=300, integral=True)
+        self.model = data.to_model(num_vehicles=1)
+        self.model.decompose_nodes(10)
+        self.tour_plan = self.model.generate_cws_solution()
+        self.visualizer = CEVRPVisualizer(self.model)
+
+    def test_render_formats(self):
+        png = self.visualizer.render_tour_plan(self.tour_plan)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+
+        buffer = io.BytesIO()
+        self.visualizer.render_clusters(buffer, format='svg')
+        self.assertIn(b'<svg', buffer.getvalue())
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'plan.svg')
+            self.visualizer.render_tour_plan(self.tour_plan, path)
+            with open(path, 'rb') as file:
+                self.assertIn(b'<svg', file.read())
+
+    def test_render_uses_given_costs(self):
+        tours = [t for t in self.tour_plan if len(t) > 1]
+        with mock.patch.object(type(tours[0]), 'get_costs_of_tour') as get_costs:
+            self.visualizer.render_tour_plan(self.tour_plan, tour_costs=[{CostTypes.TOTAL: 1.0}] * len(tours))
+            self.visualizer.render_tour_plan(self.tour_plan, tour_costs=[2.0] * len(tours))
+        get_costs.assert_not_called()
@@ -0,0 +1,59 @@
+import os
+import random
+import tempfile
+import unittest
+
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vnd.checkpoint import CheckpointPolicy, Checkpointer, OptimizerState
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'run.ckpt')
+        d = Node.create_depot()
+        self.nodes = [d] + [Node(i, i, 1, i, -i) for i in range(1, 7)]
+        n = self.nodes
+        self.state = OptimizerState(
+            tours=[Tour([d, n[1], n[2], d]), Tour([d, n[3], n[4], n[5], d])],
+            runner_clients=[n[6]],
+            previous_solutions={1: 120.5, 2: 118.25},
+            iteration=2,
+            random_state=random.getstate(),
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load_round_trip(self):
+        Checkpointer.save(self.path, self.state)
+        loaded = Checkpointer.load(self.path, self.nodes)
+
+        self.assertEqual(loaded.iteration, 2)
+        self.assertEqual(loaded.tours, self.state.tours)
+        self.assertEqual(loaded.runner_clients, [self.nodes[6]])
+        self.assertEqual(loaded.previous_solutions, {1: 120.5, 2: 118.25})
+
+        expected = [random.random() for _ in range(3)]
+        random.setstate(loaded.random_state)
+        self.assertEqual([random.random() for _ in range(3)], expected)
+
+    def test_load_rejects_unknown_nodes(self):
+        Checkpointer.save(self.path, self.state)
+        self.assertRaises(ValueError, Checkpointer.load, self.path, self.nodes[:4])
+
+    def test_policy_intervals(self):
+        self.assertTrue(CheckpointPolicy(self.path).is_due(1, 0))
+        self.assertFalse(CheckpointPolicy(self.path, every_iterations=3).is_due(2, 1000))
+        self.assertTrue(CheckpointPolicy(self.path, every_iterations=3).is_due(3, 0))
+        self.assertTrue(CheckpointPolicy(self.path, every_seconds=10).is_due(1, 11))
+        self.assertFalse(CheckpointPolicy(self.path, every_seconds=10).is_due(5, 9))
+
+    def test_maybe_save_respects_policy(self):
+        checkpointer = Checkpointer(CheckpointPolicy(self.path, every_iterations=2), start_iteration=1)
+        self.assertFalse(checkpointer.maybe_save(self.state))
+        self.assertFalse(os.path.exists(self.path))
+        self.state.iteration = 3
+        self.assertTrue(checkpointer.maybe_save(self.state))
+        self.assertEqual(Checkpointer.load(self.path, self.nodes).iteration, 3)
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cevrp.batch import BatchRunner, BatchSettings
+from cevrp.construction_cache import ConstructionCache
+from cevrp.instance_generator import generate_instance
+
+
+def node_ids(tour_plans):
+    return {label: [[n.node_id for n in tour] for tour in plan] for label, plan in tour_plans.items()}
+
+
+class ConstructionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.directory.name, 'cache')
+        self.data = generate_instance(60, 'clustered', seed=8, commodity_capacity=40)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def construct(self, cache, data=None):
+        data = data or self.data
+        vehicles = data.create_vehicles()
+        entry = cache.entry(data, vehicles[0])
+        model = entry.create_model(data.create_nodes(entry.distance_provider(data.coordinates)), vehicles)
+        entry.decompose_nodes(model, 10, 80)
+        return model, entry.generate_initial_solutions(model, 10, 80)
+
+    def test_second_construction_is_loaded(self):
+        cache = ConstructionCache(self.root)
+        model, tour_plans = self.construct(cache)
+        self.assertEqual(cache.hits, 0)
+
+        reference = self.data.to_model()
+        reference.decompose_nodes(10, 80)
+        expected = {label: reference.generate_cws_solution(nodes) for label, nodes in reference.node_clusters.items()}
+        self.assertEqual(node_ids(tour_plans), node_ids(expected))
+
+        cache = ConstructionCache(self.root)
+        cached_model, cached_plans = self.construct(cache)
+        self.assertEqual((cache.hits, cache.misses), (4, 0))
+        self.assertEqual(node_ids(cached_plans), node_ids(tour_plans))
+        self.assertEqual(cached_model.battery_threshold, model.battery_threshold)
+        self.assertIsInstance(cached_model.depot.distance_calculator.matrix, np.memmap)
+        np.testing.assert_array_equal(cached_model.feasible_edges.depot_feasible, model.feasible_edges.depot_feasible)
+        self.assertEqual({label: [n.node_id for n in nodes] for label, nodes in cached_model.node_clusters.items()},
+                         {label: [n.node_id for n in nodes] for label, nodes in model.node_clusters.items()})
+
+    def test_other_vehicle_parameters_miss(self):
+        cache = ConstructionCache(self.root)
+        vehicles = self.data.create_vehicles()
+        other = self.data.create_vehicles(charging_rate=5)
+        self.assertNotEqual(cache.entry(self.data, vehicles[0]).key, cache.entry(self.data, other[0]).key)
+        nodes = self.data.create_nodes()
+        self.assertEqual(cache.entry(self.data, vehicles[0]).key, cache.entry_for_nodes(nodes, vehicles[0]).key)
+
+    def test_other_format_version_is_discarded(self):
+        cache = ConstructionCache(self.root)
+        self.construct(cache)
+        entry = cache.entry(self.data, self.data.create_vehicles()[0])
+        meta_path = os.path.join(entry.path, 'clusters-10-80', 'meta.json')
+        with open(meta_path) as file:
+            meta = json.load(file)
+        with open(meta_path, 'w') as file:
+            json.dump(dict(meta, version=0), file)
+
+        cache = ConstructionCache(self.root)
+        self.construct(cache)
+        self.assertEqual(cache.misses, 1)
+        with open(meta_path) as file:
+            self.assertEqual(json.load(file)['version'], meta['version'])
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = ConstructionCache(self.root)
+        self.construct(cache)
+        size = cache.nbytes
+        cache.max_bytes = int(size * 1.5)
+        first = os.listdir(self.root)
+        os.utime(os.path.join(self.root, first[0]), (0, 0))
+        self.construct(cache, generate_instance(60, 'uniform', seed=9, commodity_capacity=40))
+        self.assertEqual(cache.evictions, 1)
+        self.assertNotIn(first[0], os.listdir(self.root))
+        self.assertEqual(len(os.listdir(self.root)), 1)
+
+    def test_batch_runs_share_the_cache(self):
+        manifest = os.path.join(self.directory.name, 'manifest.json')
+        with open(manifest, 'w') as file:
+            json.dump([{'generate': {'num_customers': 40, 'seed': 2, 'commodity_capacity': 40}}], file)
+        settings = BatchSettings(optimize=False, cache_dir=self.root)
+        records = []
+        for run in range(2):
+            output = os.path.join(self.directory.name, f'results-{run}.jsonl')
+            BatchRunner(output, workers=1, settings=settings).run(manifest)
+            with open(output) as file:
+                records.append(json.loads(file.readline()))
+        self.assertEqual(records[0]['tours'], records[1]['tours'])
+        self.assertEqual(records[0]['metrics']['counters']['construction_cache_hits'], 0)
+        self.assertEqual(records[1]['metrics']['counters']['construction_cache_hits'], 3)
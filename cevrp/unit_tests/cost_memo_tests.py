@@ -0,0 +1,63 @@
+import unittest
+
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cost_memo import CostMemo, RouteCosts, SequenceHasher
+from cevrp.vnd.moves import CrossExchangeMove, MoveEvaluator, SwapMove, TwoLambdaMove
+
+
+class SequenceHasherTests(unittest.TestCase):
+    def setUp(self):
+        self.hasher = SequenceHasher(seed=7)
+        self.depot = Node.create_depot()
+        self.nodes = [Node(i, 1, 1, i, -i) for i in range(1, 21)]
+
+    def full_hash(self, nodes):
+        return self.hasher.prefix_hashes(nodes)[-1], len(nodes)
+
+    def test_pieces_hash_like_the_materialized_sequence(self):
+        tours = [Tour([self.depot] + self.nodes[:9] + [self.depot]),
+                 Tour([self.depot] + self.nodes[9:] + [self.depot])]
+        for move in (SwapMove(0, 2, 7), CrossExchangeMove(0, 1, 4, 1, 3, 9), TwoLambdaMove(0, 5, 1, 2)):
+            with self.subTest(move=move):
+                for route, pieces in move.pieces(tours):
+                    prefixes = [self.hasher.prefix_hashes(t.nodes) for t in tours]
+                    combined = self.hasher.combine((self.hasher.piece_hash(prefixes[r], a, b), b - a)
+                                                   for r, a, b in pieces)
+                    sequence = list(dict(move.sequences(tours))[route])
+                    self.assertEqual(combined, self.full_hash(sequence))
+
+    def test_order_sensitive(self):
+        self.assertNotEqual(self.full_hash(self.nodes), self.full_hash(self.nodes[::-1]))
+
+
+class CostMemoTests(unittest.TestCase):
+    def test_lru_eviction_and_statistics(self):
+        memo = CostMemo(max_entries=2)
+        costs = RouteCosts(1, 2, 3, 4, 10, True)
+        memo.put((1, 3), costs)
+        memo.put((2, 3), costs)
+        self.assertIs(memo.get((1, 3)), costs)
+        memo.put((3, 3), costs)
+        self.assertIsNone(memo.get((2, 3)))
+        self.assertEqual((memo.hits, memo.misses, memo.evictions, len(memo)), (1, 1, 1, 2))
+        self.assertEqual(memo.hit_rate, 0.5)
+        self.assertGreater(memo.nbytes, 0)
+
+    def test_evaluator_results_do_not_change(self):
+        depot = Node.create_depot()
+        nodes = [Node(i, i % 7 + 1, 2, (i * 37) % 100, (i * 61) % 100) for i in range(1, 25)]
+        tours = [Tour([depot] + nodes[:12] + [depot]), Tour([depot] + nodes[12:] + [depot])]
+        vehicle = Vehicle(1, 60, 600, 1, 10, 500)
+        plain = MoveEvaluator(vehicle, 150)
+        memoized = MoveEvaluator(vehicle, 150, memo=CostMemo())
+        moves = [SwapMove(0, 1, 9), CrossExchangeMove(0, 2, 5, 1, 4, 6), TwoLambdaMove(1, 3, 0, 8)]
+        for move in moves + moves:
+            self.assertEqual(memoized.evaluate(move, tours), plain.evaluate(move, tours))
+        self.assertEqual(memoized.memo.hits, 5)
+
+        memoized.apply(moves[1], tours)
+        plain.apply(moves[1], tours)
+        for move in moves:
+            self.assertEqual(memoized.evaluate(move, tours), plain.evaluate(move, tours))
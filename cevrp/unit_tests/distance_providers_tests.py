@@ -0,0 +1,144 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.cost_types import CostTypes
+from cevrp.distance_providers import DistanceProvider, MatrixDistanceProvider, SparseDistanceProvider, \
+    create_distance_provider, euclidean_distances, max_euclidean_distance
+from cevrp.instance_generator import generate_instance
+from cevrp.node import Node
+from cevrp.savings_calculator import SavingsCalculator
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+
+
+class MatrixDistanceProviderTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.coordinates = generate_instance(30, seed=7, extent=50, integral=True).coordinates
+        difference = self.coordinates[:, None, :] - self.coordinates[None, :, :]
+        self.matrix = np.sqrt((difference ** 2).sum(axis=2))
+        self.vehicle = Vehicle(1, 100, 3000, 2, 10, 1000)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_nodes(self, distance_calculator=None):
+        return [Node(i, 1 if i else 0, 1 if i else 0, float(x), float(y), distance_calculator)
+                for i, (x, y) in enumerate(self.coordinates.tolist())]
+
+    def test_matches_euclidean_costs(self):
+        for file_name in ('matrix.bin', 'matrix.npy'):
+            with self.subTest(file=file_name):
+                path = os.path.join(self.directory.name, file_name)
+                MatrixDistanceProvider.write(path, self.matrix)
+                provider = MatrixDistanceProvider.open(path)
+
+                euclidean = CEVRPModel(self.create_nodes(), [self.vehicle])
+                mapped = CEVRPModel(self.create_nodes(provider), [self.vehicle])
+                self.assertAlmostEqual(mapped.battery_threshold, euclidean.battery_threshold, places=3)
+
+                tour_1 = Tour(euclidean.nodes[:8] + [euclidean.depot])
+                tour_2 = Tour(mapped.nodes[:8] + [mapped.depot])
+                costs_1 = tour_1.get_costs_of_tour(self.vehicle, euclidean.battery_threshold)
+                costs_2 = tour_2.get_costs_of_tour(self.vehicle, mapped.battery_threshold)
+                self.assertAlmostEqual(costs_1[CostTypes.TOTAL], costs_2[CostTypes.TOTAL], places=2)
+
+                savings_1 = SavingsCalculator.calculate_savings(euclidean.nodes[3], euclidean.nodes[4], self.vehicle)
+                savings_2 = SavingsCalculator.calculate_savings(mapped.nodes[3], mapped.nodes[4], self.vehicle)
+                self.assertAlmostEqual(savings_1, savings_2, places=3)
+
+    def test_depot_uses_matrix_distances(self):
+        matrix = self.matrix.copy()
+        matrix[0, 5] = matrix[5, 0] = 1234
+        provider = MatrixDistanceProvider(matrix)
+        model = CEVRPModel(self.create_nodes(provider)[1:], [self.vehicle])
+        self.assertEqual(model.depot - model.nodes[5], 1234)
+        self.assertEqual(model.generate_cws_solution([model.nodes[5]])[0].get_total_distance(), 2468)
+
+    def test_custom_node_ids_and_bulk_queries(self):
+        provider = MatrixDistanceProvider(self.matrix[:4, :4], node_ids=[0, 10, 20, 30])
+        a, b = Node(10, 1, 1, 0, 0, provider), Node(30, 1, 1, 0, 0, provider)
+        self.assertAlmostEqual(a - b, self.matrix[1, 3])
+        np.testing.assert_allclose(provider.pairwise([10, 20], [0, 30]), self.matrix[[1, 2]][:, [0, 3]])
+        self.assertAlmostEqual(provider.max_distance([10, 20, 30]), self.matrix[1:4, 1:4].max())
+        self.assertRaises(KeyError, provider.position_of, 11)
+
+    def test_distances_in_row_blocks(self):
+        # blocks of a few rows each, the last one shorter
+        np.testing.assert_allclose(euclidean_distances(self.coordinates, self.coordinates, chunk_elements=70),
+                                   self.matrix)
+        out = np.empty((5, len(self.coordinates)), dtype=np.float32)
+        euclidean_distances(self.coordinates[:5], self.coordinates, out=out, chunk_elements=31)
+        np.testing.assert_allclose(out, self.matrix[:5], rtol=1e-6)
+        self.assertAlmostEqual(max_euclidean_distance(self.coordinates[:3], self.coordinates, chunk_elements=31),
+                               self.matrix[:3].max())
+
+    def test_pickles_as_file_reference(self):
+        path = os.path.join(self.directory.name, 'matrix.bin')
+        MatrixDistanceProvider.write(path, self.matrix)
+        provider = MatrixDistanceProvider.open(path)
+        payload = pickle.dumps(provider)
+        self.assertLess(len(payload), 1024)
+        restored = pickle.loads(payload)
+        self.assertIsInstance(restored.matrix, np.memmap)
+        np.testing.assert_allclose(restored.matrix, self.matrix.astype(np.float32))
+
+
+class SparseDistanceProviderTests(unittest.TestCase):
+    def setUp(self):
+        self.coordinates = generate_instance(300, seed=11).coordinates
+        self.provider = SparseDistanceProvider(self.coordinates, k=8, cache_size=4)
+        self.nodes = [Node(i, 1, 1, x, y, self.provider) for i, (x, y) in enumerate(self.coordinates.tolist())]
+
+    def test_matches_euclidean_distances(self):
+        for a, b in [(0, 5), (7, 0), (3, 3), (10, 250), (250, 10)]:
+            with self.subTest(pair=(a, b)):
+                expected = Node.calculate_distance(self.nodes[a], self.nodes[b])
+                self.assertAlmostEqual(self.nodes[a] - self.nodes[b], expected)
+
+    def test_neighbors_do_not_touch_the_cache(self):
+        i = 17
+        for j in self.provider.neighbors[i].tolist():
+            self.assertAlmostEqual(self.nodes[i] - self.nodes[j],
+                                   Node.calculate_distance(self.nodes[i], self.nodes[j]))
+        self.assertEqual(self.provider.cache_info()['misses'], 0)
+
+    def test_lru_cache_counters_and_bound(self):
+        far_pairs = [(i, j) for i in range(1, 40) for j in range(41, 80)
+                     if j not in self.provider.neighbors[i]][:6]
+        for i, j in far_pairs:
+            _ = self.nodes[i] - self.nodes[j]
+        i, j = far_pairs[-1]
+        _ = self.nodes[j] - self.nodes[i]
+        info = self.provider.cache_info()
+        self.assertEqual(info['misses'], 6)
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['size'], 4)
+
+    def test_battery_threshold_unchanged(self):
+        vehicle = Vehicle(1, 100, 3000, 2, 10, 1000)
+        euclidean_nodes = [Node(i, 1, 1, x, y) for i, (x, y) in enumerate(self.coordinates.tolist())]
+        self.assertAlmostEqual(CEVRPModel(self.nodes, [vehicle]).battery_threshold,
+                               CEVRPModel(euclidean_nodes, [vehicle]).battery_threshold)
+
+    def test_max_distance_uses_custom_fallback(self):
+        road = SparseDistanceProvider(self.coordinates, k=8, fallback=lambda i, j: 1.5 * self.provider.distance(i, j))
+        node_ids = list(range(0, 300, 7))
+        self.assertAlmostEqual(road.max_distance(node_ids), road.pairwise(node_ids, node_ids).max())
+        self.assertGreater(road.max_distance(node_ids), self.provider.max_distance(node_ids))
+
+    def test_automatic_selection(self):
+        self.assertIsInstance(create_distance_provider(self.coordinates), MatrixDistanceProvider)
+        self.assertIsInstance(create_distance_provider(self.coordinates, memory_budget=1024), SparseDistanceProvider)
+
+    def test_incomplete_provider_cannot_be_created(self):
+        class PairOnly(DistanceProvider):
+            def __call__(self, node1, node2):
+                return 0.0
+
+        self.assertRaises(TypeError, PairOnly)
@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.instance_generator import generate_instance
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cevrp_optimizer import is_invalid
+
+
+class FeasibleEdgesTests(unittest.TestCase):
+    def setUp(self):
+        # customers in [50, 150]²
+        self.nodes = generate_instance(60, seed=9, extent=50, max_demand=1, max_service_time=1,
+                                       depot=(-100, -100)).create_nodes()
+        self.rate = 10
+
+    def brute_force(self, threshold):
+        return [[(a - b) * self.rate <= threshold for b in self.nodes] for a in self.nodes]
+
+    def lookup(self, edges):
+        return [[edges.is_feasible(a, b) for b in self.nodes] for a in self.nodes]
+
+    def test_only_depot_row_for_model_threshold(self):
+        model = CEVRPModel(self.nodes, [Vehicle(1, 100, 3000, self.rate, 10, 1000)])
+        edges = model.feasible_edges
+        self.assertIsNone(edges.matrix)
+        self.assertFalse(edges.depot_feasible.all())
+        self.assertEqual(self.lookup(edges), self.brute_force(model.battery_threshold))
+
+    def test_dense_and_packed_matrices(self):
+        threshold = 60 * self.rate
+        expected = self.brute_force(threshold)
+        for dense_limit in (1000, 0):
+            with self.subTest(dense_limit=dense_limit):
+                edges = FeasibleEdges.build(self.nodes, threshold, self.rate, dense_limit=dense_limit, chunk_size=7)
+                self.assertEqual(edges.packed, dense_limit == 0)
+                self.assertEqual(self.lookup(edges), expected)
+
+    def test_unknown_nodes_are_computed(self):
+        edges = FeasibleEdges.build(self.nodes, 60 * self.rate, self.rate)
+        new_node = Node(100, 1, 1, 100, 100)
+        for node in self.nodes[:10]:
+            self.assertEqual(edges.is_feasible(new_node, node), (new_node - node) * self.rate <= 60 * self.rate)
+
+    def test_validation_matches_constraints(self):
+        vehicle = Vehicle(1, 20, 3000, self.rate, 10, 600)
+        threshold = 70 * self.rate
+        edges = FeasibleEdges.build(self.nodes, threshold, self.rate)
+        rng = np.random.default_rng(1)
+        depot = self.nodes[0]
+        for _ in range(50):
+            customers = [self.nodes[i] for i in rng.choice(np.arange(1, 61), size=int(rng.integers(1, 12)), replace=False)]
+            tour = Tour([depot] + customers + [depot])
+            self.assertEqual(is_invalid(tour, vehicle, threshold, edges), is_invalid(tour, vehicle, threshold))
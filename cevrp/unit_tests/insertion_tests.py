@@ -0,0 +1,55 @@
+import unittest
+
+from cevrp.constraints import Constraints, ConstraintValidationStrategy
+from cevrp.instance_generator import generate_instance
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.insertion import RegretInsertion
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+
+
+def is_valid(tour, vehicle, battery_threshold):
+    return all(ConstraintValidationStrategy(c.value, tour, vehicle, battery_threshold).is_valid() for c in Constraints)
+
+
+class RegretInsertionTests(unittest.TestCase):
+    def setUp(self):
+        nodes = generate_instance(40, seed=2, extent=50, max_demand=3, max_service_time=1, integral=True).create_nodes()
+        self.depot, self.nodes = nodes[0], nodes[1:]
+        self.vehicle = Vehicle(1, 30, 3000, 10, 10, 400)
+        self.battery_threshold = 1500
+        d = self.depot
+        self.tours = [Tour([d] + self.nodes[i:i + 5] + [d]) for i in range(0, 20, 5)]
+
+    def test_inserts_feasibly_into_routes(self):
+        runners = self.nodes[20:]
+        remaining, tour_plan = NeighborhoodOperators.SEQUENTIAL_INSERTION(
+            list(runners), self.tours, self.vehicle, self.battery_threshold)
+
+        routed = [n for t in tour_plan for n in t[1:-1]]
+        self.assertEqual(sorted(n.node_id for n in routed + remaining), list(range(1, 41)))
+        self.assertLess(len(remaining), len(runners))
+        for tour in tour_plan:
+            self.assertTrue(is_valid(tour, self.vehicle, self.battery_threshold))
+            self.assertEqual(tour[0], self.depot)
+            self.assertEqual(tour[-1], self.depot)
+
+    def test_keeps_customers_without_feasible_position(self):
+        far_away = Node(99, 1, 1, 1000, 1000)
+        heavy = Node(98, 100, 1, 1, 1)
+        engine = RegretInsertion(self.tours, self.vehicle, self.battery_threshold)
+        self.assertEqual(engine.insert([far_away, heavy]), [far_away, heavy])
+        self.assertEqual(engine.modified, set())
+
+    def test_inserts_at_cheapest_position(self):
+        d = self.depot
+        a, b, c = Node(1, 1, 1, 10, 0), Node(2, 1, 1, 20, 0), Node(3, 1, 1, 30, 0)
+        engine = RegretInsertion([Tour([d, a, c, d])], self.vehicle, self.battery_threshold)
+        self.assertEqual(engine.insert([b]), [])
+        self.assertEqual(engine.tours[0], [d, a, b, c, d])
+
+    def test_leaves_input_tours_untouched(self):
+        before = [list(t.nodes) for t in self.tours]
+        RegretInsertion(self.tours, self.vehicle, self.battery_threshold).insert(self.nodes[20:25])
+        self.assertEqual([t.nodes for t in self.tours], before)
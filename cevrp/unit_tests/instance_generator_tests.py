@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from cevrp.batch import BatchRunner, BatchSettings, discover_instances
+from cevrp.instance_generator import DISTRIBUTIONS, generate_instance
+
+
+class InstanceGeneratorTests(unittest.TestCase):
+    def test_reproducible_from_seed(self):
+        for distribution in DISTRIBUTIONS:
+            with self.subTest(distribution=distribution):
+                data = generate_instance(500, distribution, seed=3)
+                again = generate_instance(500, distribution, seed=3)
+                other = generate_instance(500, distribution, seed=4)
+                for name in ('coordinates', 'demands', 'service_times'):
+                    np.testing.assert_array_equal(getattr(data, name), getattr(again, name))
+                self.assertFalse(np.array_equal(data.coordinates, other.coordinates))
+
+    def test_instance_layout(self):
+        data = generate_instance(200, 'depot_off_center', seed=1, max_demand=5, num_vehicles=4)
+        self.assertEqual(len(data), 201)
+        np.testing.assert_array_equal(data.coordinates[0], [0, 0])
+        # the square lies to the upper right of the depot
+        self.assertTrue(np.all(data.coordinates >= 0) and np.all(data.coordinates <= 200))
+        self.assertEqual((data.demands[0], data.service_times[0]), (0, 0))
+        self.assertTrue(np.all((data.demands[1:] >= 1) & (data.demands[1:] <= 5)))
+        np.testing.assert_array_equal(data.original_ids, np.arange(201))
+
+        model = data.to_model()
+        self.assertEqual(len(model.nodes), 201)
+        self.assertEqual(len(model.vehicles), 4)
+
+    def test_clustered_customers_are_denser(self):
+        def mean_nearest_distance(coordinates):
+            sample = coordinates[1:201]
+            distances = np.sqrt(((sample[:, None] - coordinates[None, 1:]) ** 2).sum(axis=2))
+            distances[distances == 0] = np.inf
+            return distances.min(axis=1).mean()
+
+        uniform = generate_instance(2000, 'uniform', seed=2).coordinates
+        clustered = generate_instance(2000, 'clustered', seed=2, num_centers=5).coordinates
+        self.assertLess(mean_nearest_distance(clustered), mean_nearest_distance(uniform) / 1.5)
+
+    def test_generates_millions_of_customers_in_seconds(self):
+        start = time.perf_counter()
+        data = generate_instance(1_000_000, 'mixed', seed=0)
+        self.assertEqual(len(data), 1_000_001)
+        self.assertLess(time.perf_counter() - start, 5)
+
+    def test_rejects_unknown_distribution(self):
+        self.assertRaises(ValueError, generate_instance, 10, 'gaussian')
+
+    def test_feeds_batch_runner(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = os.path.join(directory, 'manifest.json')
+            with open(manifest, 'w') as file:
+                json.dump([{'generate': {'num_customers': 30, 'distribution': 'clustered', 'seed': 5}}], file)
+            entries = discover_instances(manifest)
+            self.assertEqual(entries[0]['path'], 'clustered-n30-s5')
+
+            output = os.path.join(directory, 'results.jsonl')
+            summary = BatchRunner(output, workers=1, settings=BatchSettings(optimize=False)).run(manifest)
+            self.assertEqual(summary['completed'], 1)
+            with open(output) as file:
+                record = json.loads(file.readline())
+            self.assertEqual(sorted(i for tour in record['tours'] for i in tour[1:-1]), list(range(1, 31)))
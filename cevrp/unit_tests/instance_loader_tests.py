@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from math import sqrt
+
+import numpy as np
+
+from cevrp.instance_loader import InstanceLoader
+from cevrp.node import Node
+
+CVRP_INSTANCE = """NAME : tiny-n4-k2
+COMMENT : hand written
+TYPE : CVRP
+DIMENSION : 4
+EDGE_WEIGHT_TYPE : EUC_2D
+CAPACITY : 10
+NODE_COORD_SECTION
+ 1 10 10
+ 2 13 14
+ 3 10 20
+ 4 4 2
+DEMAND_SECTION
+1 0
+2 3
+3 4
+4 5
+DEPOT_SECTION
+ 1
+ -1
+EOF
+"""
+
+EVRP_INSTANCE = """Name: tiny-evrp
+COMMENT: hand written
+TYPE: EVRP
+OPTIMAL_VALUE: 0
+VEHICLES: 2
+DIMENSION: 3
+STATIONS: 1
+CAPACITY: 6
+ENERGY_CAPACITY: 94
+ENERGY_CONSUMPTION: 1.2
+EDGE_WEIGHT_FORMAT: EUC_2D
+NODE_COORD_SECTION
+1 5 5
+2 8 9
+3 2 1
+4 7 7
+DEMAND_SECTION
+1 0
+2 2
+3 3
+STATIONS_COORD_SECTION
+4
+DEPOT_SECTION
+1
+-1
+EOF
+"""
+
+
+class InstanceLoaderTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_load_cvrp(self):
+        instance = InstanceLoader.load(self.write('tiny.vrp', CVRP_INSTANCE))
+        self.assertEqual(instance.name, 'tiny-n4-k2')
+        self.assertEqual(len(instance), 4)
+        self.assertEqual(instance.commodity_capacity, 10)
+        np.testing.assert_array_equal(instance.coordinates, [[0, 0], [3, 4], [0, 10], [-6, -8]])
+        np.testing.assert_array_equal(instance.demands, [0, 3, 4, 5])
+
+        model = instance.to_model()
+        self.assertEqual(model.nodes[0], Node.create_depot())
+        self.assertEqual(len(model.nodes), 4)
+        self.assertEqual(len(model.vehicles), 2)
+        self.assertAlmostEqual(model.nodes[1] - model.nodes[3], 15)
+        self.assertAlmostEqual(model.battery_threshold, sqrt(360) * 10)
+
+    def test_load_evrp_ignores_stations(self):
+        instance = InstanceLoader.load(self.write('tiny.evrp', EVRP_INSTANCE))
+        self.assertEqual(len(instance), 3)
+        self.assertEqual(instance.name, 'tiny-evrp')
+        self.assertEqual(instance.num_vehicles, 2)
+        np.testing.assert_array_equal(instance.original_ids, [1, 2, 3])
+
+        vehicles = instance.create_vehicles()
+        self.assertEqual(vehicles[0].battery.capacity, 94)
+        self.assertEqual(vehicles[0].battery.consumption_rate, 1.2)
+
+    def test_load_csv_with_header(self):
+        path = self.write('tiny.csv', 'id,x,y,demand,service_time\n7,1,1,0,0\n8,4,5,2,3\n9,1,-2,1,1\n')
+        instance = InstanceLoader.load(path, commodity_capacity=5)
+        np.testing.assert_array_equal(instance.coordinates, [[0, 0], [3, 4], [0, -3]])
+        np.testing.assert_array_equal(instance.service_times, [0, 3, 1])
+        self.assertEqual(instance.create_vehicles()[0].commodity_capacity, 5)
+
+    def test_battery_threshold_matches_pairwise_scan(self):
+        rng = np.random.default_rng(3)
+        points = rng.integers(-100, 100, size=(200, 2))
+        nodes = Node.list_create([tuple(p) for p in points.tolist()], [1] * 200, [1] * 200)
+        max_distance = max(a - b for a in nodes for b in nodes)
+        instance_path = self.write('points.csv', '\n'.join(
+            ['0,0,0,0,0'] + [f'{n.node_id},{n.x},{n.y},1,1' for n in nodes]
+        ))
+        model = InstanceLoader.load_model(instance_path, battery_consumption_rate=1)
+        self.assertAlmostEqual(model.battery_threshold, max_distance)
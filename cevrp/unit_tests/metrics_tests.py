@@ -0,0 +1,47 @@
+import json
+import unittest
+
+from cevrp.metrics import MetricsRegistry
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+
+
+class MetricsRegistryTests(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        two_opt = self.metrics.operator(NeighborhoodOperators.TWO_OPT_MOVE.key)
+        two_opt.attempts += 3
+        two_opt.feasible += 2
+        two_opt.accepted += 1
+        two_opt.improvement += 4.5
+        with self.metrics.phase('vns'):
+            pass
+        self.metrics.increment('pruned_candidates', 7)
+        self.metrics.set_gauge('selection_weight_two_opt_move', 0.5)
+
+    def test_operators_are_enum_members(self):
+        self.assertEqual([op.key for op in NeighborhoodOperators],
+                         ['two_opt_move', 'cross_exchange', 'two_lambda_interchange', 'sequential_insertion'])
+
+    def test_to_json(self):
+        exported = json.loads(self.metrics.to_json())
+        self.assertEqual(exported['operators']['two_opt_move']['attempts'], 3)
+        self.assertEqual(exported['operators']['two_opt_move']['improvement'], 4.5)
+        self.assertIn('vns', exported['phases'])
+        self.assertEqual(exported['counters'], {'pruned_candidates': 7})
+        self.assertEqual(exported['gauges'], {'selection_weight_two_opt_move': 0.5})
+
+    def test_to_prometheus(self):
+        exported = self.metrics.to_prometheus()
+        self.assertIn('# TYPE cevrp_operator_attempts_total counter', exported)
+        self.assertIn('cevrp_operator_attempts_total{operator="two_opt_move"} 3', exported)
+        self.assertIn('cevrp_operator_improvement_total{operator="two_opt_move"} 4.5', exported)
+        self.assertIn('cevrp_events_total{event="pruned_candidates"} 7', exported)
+        self.assertIn('cevrp_gauge{name="selection_weight_two_opt_move"} 0.5', exported)
+
+    def test_merge(self):
+        other = MetricsRegistry()
+        other.operator('two_opt_move').attempts += 2
+        other.increment('pruned_candidates')
+        self.metrics.merge(other)
+        self.assertEqual(self.metrics.operators['two_opt_move'].attempts, 5)
+        self.assertEqual(self.metrics.counters['pruned_candidates'], 8)
@@ -0,0 +1,123 @@
+import unittest
+
+import numpy as np
+
+from cevrp.cost_types import CostTypes
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.instance_generator import generate_instance
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cevrp_optimizer import is_invalid
+from cevrp.vnd.moves import CrossExchangeMove, Move, MoveEvaluator, SwapMove, TwoLambdaMove, evaluate_route
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+
+
+class MovesTests(unittest.TestCase):
+    def setUp(self):
+        self.nodes = generate_instance(24, 'depot_off_center', seed=4, extent=50, max_demand=9,
+                                       max_service_time=2).create_nodes()
+        self.depot = self.nodes[0]
+        self.vehicle = Vehicle(1, 60, 600, 1, 10, 80)
+        self.threshold = 90
+
+    def tours(self):
+        customers = self.nodes[1:]
+        return [Tour([self.depot] + customers[:12] + [self.depot]),
+                Tour([self.depot] + customers[12:] + [self.depot])]
+
+    def materialized(self, move, tours):
+        copies = [Tour(list(t.nodes)) for t in tours]
+        move.apply(copies)
+        return copies
+
+    def cost(self, tour):
+        return tour.get_costs_of_tour(+self.vehicle, self.threshold)[CostTypes.TOTAL]
+
+    def moves(self):
+        yield SwapMove(0, 2, 3)
+        yield SwapMove(1, 1, 11)
+        yield CrossExchangeMove(0, 3, 6, 1, 2, 3)
+        yield CrossExchangeMove(0, 1, 13, 1, 5, 9)
+        yield TwoLambdaMove(0, 4, 1, 12)
+
+    def test_evaluate_route_matches_tour_costs(self):
+        for tour in self.tours():
+            cost, feasible = evaluate_route(tour.nodes, self.vehicle, self.threshold)
+            self.assertEqual(cost, self.cost(tour))
+            self.assertEqual(feasible, not is_invalid(tour, self.vehicle, self.threshold))
+
+    def test_evaluation_matches_materialized_tours(self):
+        edges = FeasibleEdges.build(self.nodes, self.threshold, 1)
+        for move in self.moves():
+            with self.subTest(move=move):
+                tours = self.tours()
+                expected = self.materialized(move, tours)
+                delta, feasible = MoveEvaluator(self.vehicle, self.threshold, prune=False).evaluate(move, tours)
+                self.assertAlmostEqual(delta, sum(map(self.cost, expected)) - sum(map(self.cost, tours)))
+                self.assertEqual(feasible, not any(is_invalid(t, self.vehicle, self.threshold) for t in expected))
+                self.assertTrue(all(edges.is_feasible(a, b) for a, b in move.new_edges(tours))
+                                or not feasible)
+
+    def test_lower_bound_never_exceeds_cost_change(self):
+        rng = np.random.default_rng(2)
+        for vehicle in (self.vehicle, Vehicle(1, 60, 100, 3, 10, 80)):
+            evaluator = MoveEvaluator(vehicle, self.threshold, prune=False)
+            tours = self.tours()
+            for _ in range(300):
+                i, j = sorted(rng.choice(np.arange(1, 13), size=2, replace=False).tolist())
+                start_1, start_2 = int(rng.integers(1, 12)), int(rng.integers(1, 12))
+                for move in (SwapMove(0, i, j), TwoLambdaMove(0, i, 1, j),
+                             CrossExchangeMove(0, start_1, int(rng.integers(start_1 + 1, 14)),
+                                               1, start_2, int(rng.integers(start_2 + 1, 14)))):
+                    delta, _ = evaluator.evaluate(move, tours)
+                    self.assertLessEqual(evaluator.lower_bound(move, tours), delta + 1e-9)
+
+    def test_pruned_moves_do_not_improve(self):
+        evaluator = MoveEvaluator(self.vehicle, self.threshold)
+        exact = MoveEvaluator(self.vehicle, self.threshold, prune=False)
+        tours = self.tours()
+        for i in range(1, 12):
+            for j in range(i + 1, 13):
+                move = SwapMove(0, i, j)
+                pruned = evaluator.pruned
+                _, feasible = evaluator.evaluate(move, tours)
+                if evaluator.pruned > pruned:
+                    # pruned moves are neither feasible nor infeasible
+                    self.assertIsNone(feasible)
+                    self.assertGreaterEqual(exact.evaluate(move, tours)[0], 0)
+                else:
+                    self.assertIsNotNone(feasible)
+        self.assertGreater(evaluator.pruned, 0)
+        self.assertEqual(evaluator.pruned + evaluator.evaluations, 66)
+
+    def test_incomplete_move_cannot_be_created(self):
+        class PiecesOnly(Move):
+            def pieces(self, tours):
+                yield from ()
+
+        with self.assertRaises(TypeError):
+            PiecesOnly()
+
+    def test_apply_in_place(self):
+        for move in self.moves():
+            with self.subTest(move=move):
+                tours = self.tours()
+                expected = self.materialized(move, tours)
+                evaluator = MoveEvaluator(self.vehicle, self.threshold)
+                evaluator.route_cost(tours[0])
+                evaluator.route_cost(tours[1])
+                evaluator.apply(move, tours)
+                for tour, expected_tour in zip(tours, expected):
+                    self.assertEqual(tour.nodes, expected_tour.nodes)
+                    self.assertEqual(tour.total_demand, expected_tour.get_total_demand())
+                    self.assertEqual(evaluator.route_cost(tour), self.cost(tour))
+
+    def test_two_opt_move_only_improves(self):
+        tour = self.tours()[0]
+        old_costs = self.cost(tour)
+        nodes = set(tour.nodes)
+        result = NeighborhoodOperators.TWO_OPT_MOVE(tour, self.vehicle, self.threshold, 20)
+        self.assertIs(result, tour)
+        self.assertEqual(set(result.nodes), nodes)
+        self.assertEqual((result[0], result[-1]), (self.depot, self.depot))
+        self.assertLessEqual(self.cost(result), old_costs)
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+from cevrp.vnd.operator_selection import AdaptiveOperatorSelection
+from cevrp.vnd.run_history import RunHistory
+
+TWO_OPT = NeighborhoodOperators.TWO_OPT_MOVE
+CROSS_EXCHANGE = NeighborhoodOperators.CROSS_EXCHANGE
+TWO_LAMBDA = NeighborhoodOperators.TWO_LAMBDA_INTERCHANGE
+
+
+class AdaptiveOperatorSelectionTests(unittest.TestCase):
+    def test_seeded_selection_is_reproducible(self):
+        first, second = AdaptiveOperatorSelection(seed=3), AdaptiveOperatorSelection(seed=3)
+        self.assertEqual([first.select() for _ in range(50)], [second.select() for _ in range(50)])
+
+    def test_weights_follow_improvement_per_cpu_second(self):
+        selection = AdaptiveOperatorSelection(segment_length=3, reaction=0.5, min_weight=0.1)
+        selection.update(TWO_OPT, 10.0, 1.0)
+        selection.update(CROSS_EXCHANGE, 10.0, 4.0)
+        selection.update(TWO_LAMBDA, 0.0, 1.0)
+        self.assertEqual(selection.weights[TWO_OPT], 1.0)
+        self.assertAlmostEqual(selection.weights[CROSS_EXCHANGE], 0.625)
+        self.assertAlmostEqual(selection.weights[TWO_LAMBDA], 0.5)
+
+        for _ in range(10):
+            for operator in (TWO_OPT, CROSS_EXCHANGE, TWO_LAMBDA):
+                selection.update(operator, 5.0 if operator == TWO_OPT else 0.0, 1.0)
+        self.assertEqual(selection.weights[TWO_LAMBDA], 0.1)
+        self.assertEqual(selection.to_dict()[TWO_OPT.key]['improvement_per_cpu_second'], 60.0 / 11.0)
+
+    def test_converges_after_idle_applications(self):
+        selection = AdaptiveOperatorSelection(max_idle=4)
+        for _ in range(3):
+            selection.update(TWO_OPT, 0.0, 0.1)
+        self.assertFalse(selection.converged)
+        selection.update(CROSS_EXCHANGE, 0.0, 0.1)
+        self.assertTrue(selection.converged)
+
+    def test_rejects_invalid_reaction(self):
+        self.assertRaises(ValueError, AdaptiveOperatorSelection, reaction=0)
+
+
+class AdaptiveOptimizationTests(unittest.TestCase):
+    def setUp(self):
+        data = generate_instance(40, seed=5, max_demand=9, max_service_time=1, commodity_capacity=100,
+                                 distance_threshold=2000)
+        self.model = data.to_model(num_vehicles=1, battery_consumption_rate=1)
+        self.model.decompose_nodes(20, 300)
+        self.tour_plans = {k: self.model.generate_cws_solution(v) for k, v in self.model.node_clusters.items()}
+
+    def test_adaptive_mode_reports_selection(self):
+        random.seed(0)
+        metrics = MetricsRegistry()
+        history = RunHistory(len(self.model.nodes))
+        selection = AdaptiveOperatorSelection(max_idle=6, seed=1)
+        initial = [[n.node_id for n in tour] for plan in self.tour_plans.values() for tour in plan]
+        tour_plan = cevrp_optimizer.optimize_tours(self.tour_plans, self.model, None, 1, history=history,
+                                                   metrics=metrics, visualize=False, selection=selection,
+                                                   time_budget=5)
+        self.assertEqual([[n.node_id for n in tour] for plan in self.tour_plans.values() for tour in plan], initial)
+
+        customers = sorted(n.node_id for tour in tour_plan for n in tour if n != self.model.depot)
+        self.assertEqual(customers, list(range(1, 41)))
+        # one history record per applied operator plus the initial plan
+        self.assertEqual(len(history), sum(selection.selections.values()) + 1)
+        self.assertEqual(metrics.gauges[f'selections_{TWO_OPT.key}'], selection.selections[TWO_OPT])
+        self.assertIn(f'selection_weight_{CROSS_EXCHANGE.key}', metrics.gauges)
+        self.assertGreater(sum(metrics.operators[o.key].cpu_seconds for o in selection.operators), 0)
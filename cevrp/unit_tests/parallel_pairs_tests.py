@@ -0,0 +1,89 @@
+import itertools
+import random
+import threading
+import unittest
+
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.cost_memo import CostMemo
+from cevrp.vnd.moves import MoveEvaluator, evaluate_route
+from cevrp.vnd.parallel_pairs import ParallelPairSearch, disjoint_batches
+
+
+class DisjointBatchesTests(unittest.TestCase):
+    def test_batches_cover_pairs_with_disjoint_routes(self):
+        pairs = list(itertools.permutations(range(7), 2))
+        batches = disjoint_batches(pairs)
+        self.assertEqual(sorted(p for batch in batches for p in batch), sorted(pairs))
+        for batch in batches:
+            routes = [r for pair in batch for r in pair]
+            self.assertEqual(len(routes), len(set(routes)))
+
+
+class ThreadSafetyTests(unittest.TestCase):
+    def test_tour_ids_are_unique_across_threads(self):
+        depot = Node.create_depot()
+        ids = []
+
+        def create():
+            ids.extend(Tour([depot, depot]).id for _ in range(2000))
+
+        threads = [threading.Thread(target=create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(ids)), 8000)
+
+    def test_recharging_returns_a_copy(self):
+        vehicle = Vehicle(1, 10, 50, 5, 5, 50)
+        tour = Tour([Node.create_depot(), Node(1, 1, 1, 3, 4), Node.create_depot()])
+        tour.get_costs_of_tour(vehicle, 10)
+        self.assertEqual(vehicle.current_battery_level, 50)
+        self.assertIsNot(+vehicle, vehicle)
+
+
+class ParallelPairSearchTests(unittest.TestCase):
+    def setUp(self):
+        self.nodes = generate_instance(60, seed=12, max_demand=4, max_service_time=1).create_nodes()
+        self.depot = self.nodes[0]
+        self.vehicle = Vehicle(1, 60, 3000, 1, 10, 2000)
+        self.threshold = 300
+
+    def run_rounds(self, workers):
+        random.seed(4)
+        customers = self.nodes[1:]
+        tours = [Tour([self.depot] + customers[k:k + 6] + [self.depot]) for k in range(0, len(customers), 6)]
+        edges = FeasibleEdges.build(self.nodes, self.threshold, 1)
+        evaluator = MoveEvaluator(self.vehicle, self.threshold, edges, CostMemo())
+        with ParallelPairSearch(workers, chunk_size=4) as pair_search:
+            context = cevrp_optimizer.SearchContext(self.vehicle, self.threshold, edges, evaluator, self.depot,
+                                                    MetricsRegistry(), pair_search=pair_search)
+            accepted = cevrp_optimizer.cross_exchange_round(tours, context, 3) \
+                + cevrp_optimizer.two_lambda_round(tours, context, 3)
+        return tours, evaluator, accepted, context.metrics
+
+    def test_reproducible_for_any_number_of_workers(self):
+        sequential, evaluator, accepted, metrics = self.run_rounds(1)
+        self.assertGreater(accepted, 0)
+        for tour in sequential:
+            self.assertEqual(evaluator.route_cost(tour), evaluate_route(tour.nodes, self.vehicle, self.threshold)[0])
+            self.assertTrue(evaluate_route(tour.nodes, self.vehicle, self.threshold)[1])
+        self.assertEqual(sorted(n.node_id for t in sequential for n in t if n.node_id != 0), list(range(1, 61)))
+
+        parallel, _, parallel_accepted, parallel_metrics = self.run_rounds(4)
+        self.assertEqual(parallel_accepted, accepted)
+        self.assertEqual([[n.node_id for n in t] for t in parallel], [[n.node_id for n in t] for t in sequential])
+        self.assertEqual(parallel_metrics.operator('cross_exchange').attempts,
+                         metrics.operator('cross_exchange').attempts)
+        for operator in ('cross_exchange', 'two_lambda_interchange'):
+            operator_metrics = metrics.operator(operator)
+            self.assertGreater(operator_metrics.pruned, 0)
+            self.assertGreaterEqual(operator_metrics.feasible, operator_metrics.accepted)
+            self.assertLessEqual(operator_metrics.feasible + operator_metrics.pruned, operator_metrics.attempts)
+            self.assertEqual(parallel_metrics.operator(operator).pruned, operator_metrics.pruned)
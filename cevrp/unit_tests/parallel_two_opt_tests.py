@@ -0,0 +1,97 @@
+import random
+import unittest
+
+import numpy as np
+
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.moves import MoveEvaluator, evaluate_route
+from cevrp.vnd.parallel_two_opt import ParallelTwoOpt, _improve_tours
+from cevrp.vnd.worker_state import decode_tour, encode_tour, initialize_worker, node_positions, worker_state
+
+
+class ParallelTwoOptTests(unittest.TestCase):
+    def setUp(self):
+        data = generate_instance(80, seed=6, max_demand=4, max_service_time=1, commodity_capacity=100,
+                                 distance_threshold=3000)
+        self.model = data.to_model(num_vehicles=1, battery_consumption_rate=1)
+        self.vehicle = self.model.vehicles[0]
+
+    def tours(self):
+        depot = self.model.depot
+        customers = [n for n in self.model.nodes if n.node_id != 0]
+        return [Tour([depot] + customers[k:k + 8] + [depot]) for k in range(0, len(customers), 8)]
+
+    def improve(self, workers, tours):
+        random.seed(9)
+        with ParallelTwoOpt(self.model, workers) as pool:
+            return pool.improve(tours, 20)
+
+    def test_improves_independently_of_workers(self):
+        tours = self.tours()
+        results = self.improve(1, tours)
+        self.assertTrue(any(nodes is not None for nodes, _ in results))
+        for tour, (nodes, tour_metrics) in zip(tours, results):
+            self.assertGreaterEqual(tour_metrics.cpu_seconds, 0)
+            self.assertGreaterEqual(tour_metrics.attempts, tour_metrics.feasible)
+            self.assertGreaterEqual(tour_metrics.feasible, tour_metrics.accepted)
+            if nodes is None:
+                self.assertEqual(tour_metrics.accepted, 0)
+                continue
+            self.assertEqual(sorted(n.node_id for n in nodes), sorted(n.node_id for n in tour))
+            self.assertIs(nodes[1], next(n for n in self.model.nodes if n == nodes[1]))
+            cost, feasible = evaluate_route(nodes, self.vehicle, self.model.battery_threshold)
+            self.assertTrue(feasible)
+            self.assertLess(cost, evaluate_route(tour.nodes, self.vehicle, self.model.battery_threshold)[0])
+
+        self.assertEqual([None if nodes is None else [n.node_id for n in nodes] for nodes, _ in self.improve(3, tours)],
+                         [None if nodes is None else [n.node_id for n in nodes] for nodes, _ in results])
+
+    def test_tours_travel_as_positions(self):
+        nodes = self.model.nodes
+        positions = node_positions(nodes)
+        tour = self.tours()[2]
+        sequence = encode_tour(tour.nodes, positions)
+        self.assertEqual(sequence.dtype, np.int32)
+        self.assertEqual([nodes[p].node_id for p in sequence.tolist()], [n.node_id for n in tour])
+        self.assertTrue(all(a is b for a, b in zip(decode_tour(sequence, nodes), tour.nodes)))
+        self.assertRaises(KeyError, encode_tour, [Node(500, 1, 1, 0, 0)], positions)
+
+    def test_workers_use_feasible_edges_and_memo(self):
+        # runs the worker function in this process
+        initialize_worker(self.model.nodes, self.vehicle, self.model.battery_threshold, self.model.feasible_edges,
+                          True, 1000)
+        positions = worker_state().positions
+        _improve_tours([(encode_tour(t.nodes, positions), 3) for t in self.tours()], 20)
+        self.assertIs(worker_state().feasible_edges, self.model.feasible_edges)
+        self.assertGreater(len(worker_state().memo), 0)
+
+    def test_unknown_nodes_are_improved_locally(self):
+        tours = self.tours()
+        depot = self.model.depot
+        tours.append(Tour([depot, Node(500, 1, 1, 50, 50), Node(501, 1, 1, -50, 50), Node(502, 1, 1, 50, 40),
+                           Node(503, 1, 1, -50, 40), depot]))
+        nodes, _ = self.improve(2, tours)[-1]
+        self.assertEqual(sorted(n.node_id for n in nodes), [0, 0, 500, 501, 502, 503])
+        self.assertTrue(all(any(n is m for m in tours[-1]) for n in nodes))
+        threshold = self.model.battery_threshold
+        self.assertLess(evaluate_route(nodes, self.vehicle, threshold)[0],
+                        evaluate_route(tours[-1].nodes, self.vehicle, threshold)[0])
+
+    def test_round_replaces_improved_tours(self):
+        tours = self.tours()
+        evaluator = MoveEvaluator(self.vehicle, self.model.battery_threshold)
+        before = sum(evaluator.route_cost(t) for t in tours)
+        with ParallelTwoOpt(self.model, 2) as pool:
+            context = cevrp_optimizer.SearchContext(self.vehicle, self.model.battery_threshold, None, evaluator,
+                                                    self.model.depot, MetricsRegistry(), two_opt_pool=pool)
+            accepted = cevrp_optimizer.two_opt_round(tours, context)
+        two_opt = context.metrics.operator('two_opt_move')
+        self.assertEqual(two_opt.accepted, accepted)
+        # sampled swaps, not tours
+        self.assertGreater(two_opt.attempts, len(tours))
+        self.assertAlmostEqual(before - sum(evaluator.route_cost(t) for t in tours), two_opt.improvement)
+        self.assertGreater(two_opt.cpu_seconds, 0)
@@ -0,0 +1,57 @@
+import unittest
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.instance_generator import generate_instance
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cevrp_optimizer import is_invalid
+from cevrp.vnd.replanning import replan_tours, repair_tour
+
+
+class ReplanningTests(unittest.TestCase):
+    def setUp(self):
+        nodes = generate_instance(66, seed=3, extent=60, max_demand=5, max_service_time=1, integral=True).create_nodes()
+        self.nodes = nodes[1:]
+        self.vehicle = Vehicle(1, 30, 3000, 10, 10, 500)
+        self.model = CEVRPModel(nodes[:61], [self.vehicle])
+        d = self.model.depot
+        self.tours = [Tour([d] + self.nodes[i:i + 6] + [d]) for i in range(0, 60, 6)]
+
+    def assert_plan(self, result, expected_ids):
+        routed = sorted(n.node_id for t in result.tour_plan for n in t[1:-1])
+        self.assertEqual(routed + sorted(n.node_id for n in result.unassigned), expected_ids)
+        for tour in result.tour_plan:
+            self.assertFalse(is_invalid(tour, self.vehicle, self.model.battery_threshold))
+
+    def test_adds_and_removes_customers(self):
+        result = replan_tours(self.tours, self.model, added=self.nodes[60:], removed=[1, self.nodes[30]],
+                              time_budget=0.05)
+        expected = [i for i in range(1, 67) if i not in (1, 31)]
+        self.assert_plan(result, expected)
+        self.assertEqual(result.unassigned, [])
+        self.assertGreater(result.affected_tours, 0)
+        self.assertNotIn(self.nodes[30], self.model.nodes)
+        self.assertIn(self.nodes[65], self.model.nodes)
+
+    def test_repairs_violated_capacity(self):
+        d = self.model.depot
+        overloaded = [Tour([d] + self.nodes[:18] + [d])] + self.tours[3:]
+        result = replan_tours(overloaded, self.model, time_budget=0.05)
+        self.assertGreater(len(result.ejected), 0)
+        self.assert_plan(result, list(range(1, 61)))
+
+    def test_rejects_planned_customer(self):
+        self.assertRaises(ValueError, replan_tours, self.tours, self.model, added=[self.nodes[0]])
+
+    def test_repair_tour_keeps_valid_tour(self):
+        tour, ejected = repair_tour(self.tours[0], self.vehicle, self.model.battery_threshold)
+        self.assertEqual(tour, self.tours[0])
+        self.assertEqual(ejected, [])
+
+    def test_battery_threshold_grows_with_far_customer(self):
+        threshold = self.model.battery_threshold
+        far_away = Node(100, 1, 1, 500, 500)
+        result = replan_tours(self.tours, self.model, added=[far_away], time_budget=0.0)
+        self.assertGreater(self.model.battery_threshold, threshold)
+        self.assert_plan(result, list(range(1, 61)) + [100])
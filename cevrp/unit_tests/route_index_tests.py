@@ -0,0 +1,65 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.insertion import RegretInsertion
+from cevrp.vnd.route_index import RouteIndex
+
+
+class RouteIndexTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.depot = Node.create_depot()
+        self.tours = []
+        node_id = 1
+        # 40 routes of 5 customers around centers on a coarse grid
+        for center in rng.uniform(-1000, 1000, size=(40, 2)):
+            customers = []
+            for x, y in center + rng.uniform(-30, 30, size=(5, 2)):
+                customers.append(Node(node_id, 1, 1, x, y))
+                node_id += 1
+            self.tours.append(Tour([self.depot] + customers + [self.depot]))
+
+    def brute_force_pairs(self, index):
+        return [(i, j) for i, j in itertools.permutations(range(len(self.tours)), 2) if index._close(i, j)]
+
+    def test_pairs_match_brute_force(self):
+        for margin in (0, 30, 200):
+            with self.subTest(margin=margin):
+                index = RouteIndex(self.tours, margin=margin)
+                self.assertEqual(index.pairs(), sorted(self.brute_force_pairs(index)))
+        self.assertLess(len(RouteIndex(self.tours, margin=30).pairs()), 40 * 39 / 4)
+
+    def test_update_moves_route(self):
+        index = RouteIndex(self.tours, margin=10)
+        far = Tour([self.depot, Node(999, 1, 1, 5000, 5000), self.depot])
+        self.tours[3] = far
+        index.update(3, far)
+        self.assertEqual(index.partners(3), [])
+        self.assertNotIn(3, [j for i, j in index.pairs()])
+
+        self.tours[3] = Tour([self.depot] + self.tours[4].nodes[1:-1] + [self.depot])
+        index.update(3, self.tours[3])
+        self.assertIn(4, index.partners(3))
+
+    def test_depot_only_routes_have_no_partners(self):
+        index = RouteIndex(self.tours + [Tour([self.depot, self.depot])])
+        self.assertEqual(index.partners(40), [])
+
+    def test_insertion_prefers_near_routes_and_falls_back(self):
+        vehicle = Vehicle(1, 100, 3000, 1, 10, 100000)
+        near_customer = Node(500, 1, 1, self.tours[7][1].x + 1, self.tours[7][1].y)
+        index = RouteIndex(self.tours, margin=30)
+        engine = RegretInsertion(self.tours, vehicle, 10 ** 9, route_index=index)
+        self.assertEqual(engine.insert([near_customer]), [])
+        self.assertIn(near_customer, engine.tours[7].nodes)
+        self.assertEqual(engine.modified, {7})
+
+        # no route is near, every route is considered
+        lonely = Node(501, 1, 1, 4000, -4000)
+        engine = RegretInsertion(self.tours, vehicle, 10 ** 9, route_index=RouteIndex(self.tours, margin=30))
+        self.assertEqual(engine.insert([lonely]), [])
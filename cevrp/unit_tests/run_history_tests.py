@@ -0,0 +1,51 @@
+import unittest
+
+from cevrp.cost_types import CostTypes
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.run_history import RunHistory, SnapshotMode
+
+
+class RunHistoryTests(unittest.TestCase):
+    def setUp(self):
+        d = Node.create_depot()
+        self.n = [d] + [Node(i, 1, 1, i, i % 3) for i in range(1, 7)]
+        n = self.n
+        self.vehicle = Vehicle(1, 100, 1000, 1, 1, 1000)
+        self.tours_0 = [Tour([d, n[1], n[2], d]), Tour([d, n[3], n[4], d])]
+        self.tours_1 = [Tour([d, n[2], n[1], d]), Tour([d, n[3], n[4], d]), Tour([d, n[5], d])]
+        self.tours_2 = [Tour([d, n[2], n[1], n[5], d]), Tour([d, n[3], n[4], d])]
+
+    def test_record_aggregates(self):
+        history = RunHistory(len(self.n))
+        record = history.record(0, self.tours_0, self.vehicle, 100, {'two_opt': 2})
+        expected = sum(t.get_costs_of_tour(self.vehicle, 100)[CostTypes.TOTAL] for t in self.tours_0)
+        self.assertAlmostEqual(record.total_cost, expected)
+        self.assertAlmostEqual(record.average_tour_cost, expected / 2)
+        self.assertAlmostEqual(record.visited_ratio, 5 / 7 * 100)
+        self.assertEqual(record.operator_outcomes, {'two_opt': 2})
+        self.assertEqual(history.snapshots, {})
+
+    def test_record_uses_given_tour_costs(self):
+        history = RunHistory(len(self.n))
+        record = history.record(0, self.tours_0, self.vehicle, 100, tour_costs=[3.0, 5.0])
+        self.assertEqual((record.total_cost, record.average_tour_cost), (8.0, 4.0))
+
+    def test_delta_snapshots_reconstruct_every_iteration(self):
+        history = RunHistory(len(self.n), SnapshotMode.DELTA)
+        for it, tours in enumerate([self.tours_0, self.tours_1, self.tours_2]):
+            history.record(it, tours, self.vehicle, 100)
+
+        self.assertEqual(sorted(history.snapshots[1].keys()), [0, 2])
+        self.assertEqual(sorted(history.snapshots[2].keys()), [0])
+        for it, tours in enumerate([self.tours_0, self.tours_1, self.tours_2]):
+            with self.subTest(iteration=it):
+                snapshot = history.get_snapshot(it)
+                self.assertEqual([ids.tolist() for ids in snapshot], [[n.node_id for n in t] for t in tours])
+
+    def test_on_record_callback(self):
+        received = []
+        history = RunHistory(len(self.n), on_record=received.append)
+        history.record(0, self.tours_0, self.vehicle, 100)
+        self.assertEqual(received, history.records)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cevrp.distance_providers import MatrixDistanceProvider
+from cevrp.instance_loader import InstanceLoader
+from cevrp.service import CachedInstance, InstanceCache, SolveService, instance_hash, serve
+
+
+def create_instance(seed, num_customers=24):
+    rng = np.random.default_rng(seed)
+    return {
+        'name': f'random-{seed}',
+        'coordinates': [[0, 0]] + rng.integers(-50, 50, size=(num_customers, 2)).tolist(),
+        'demands': [0] + rng.integers(1, 10, size=num_customers).tolist(),
+        'service_times': [0] + [1] * num_customers,
+        'capacity': 40,
+        'distance_threshold': 400,
+    }
+
+
+async def request(connect, method, path, content=None):
+    reader, writer = await connect()
+    body = b'' if content is None else json.dumps(content).encode()
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n'.encode()
+                 + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    if b'application/x-ndjson' in head:
+        return status, [json.loads(line) for line in body.splitlines() if line]
+    return status, json.loads(body)
+
+
+class SolveServiceTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.service = SolveService(workers=2)
+        self.server = await serve(self.service, port=0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.connect = lambda: asyncio.open_connection('127.0.0.1', port)
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.service.stop()
+
+    async def test_solve_streams_progress_and_result(self):
+        status, events = await request(self.connect, 'POST', '/solve',
+                                       {'instance': create_instance(1), 'optimize': False})
+        self.assertEqual(status, 200)
+        names = [event['event'] for event in events]
+        self.assertEqual(names[:2], ['queued', 'started'])
+        self.assertIn('instance', names)
+        self.assertEqual(names[-1], 'completed')
+
+        result = events[-1]['result']
+        self.assertFalse(result['cache_hit'])
+        customers = sorted(node_id for tour in result['tours'] for node_id in tour[1:-1])
+        self.assertEqual(customers, list(range(1, 25)))
+        self.assertTrue(all(tour[0] == tour[-1] == 0 for tour in result['tours']))
+
+    async def test_instance_structures_are_reused(self):
+        job = {'instance': create_instance(2), 'optimize': False}
+        _, first = await request(self.connect, 'POST', '/jobs', job)
+        _, second = await request(self.connect, 'POST', '/jobs', dict(job, vehicle={'charging_rate': 5}))
+        _, events = await request(self.connect, 'GET', f'/jobs/{second["job_id"]}/events')
+        self.assertEqual(events[-1]['event'], 'completed')
+        _, events = await request(self.connect, 'GET', f'/jobs/{first["job_id"]}/events')
+        self.assertEqual(events[-1]['event'], 'completed')
+
+        _, status = await request(self.connect, 'GET', f'/jobs/{second["job_id"]}')
+        self.assertEqual(status['status'], 'completed')
+        _, cache = await request(self.connect, 'GET', '/cache')
+        self.assertEqual((cache['entries'], cache['hits'], cache['misses']), (1, 1, 1))
+
+    async def test_reports_failures(self):
+        status, _ = await request(self.connect, 'POST', '/jobs', {'optimize': False})
+        self.assertEqual(status, 400)
+        status, _ = await request(self.connect, 'GET', '/jobs/unknown')
+        self.assertEqual(status, 404)
+        status, response = await request(self.connect, 'POST', '/jobs',
+                                         {'instance': create_instance(1), 'constructor': '../../tmp'})
+        self.assertEqual(status, 400)
+        self.assertIn('constructor', response['error'])
+        self.assertEqual(len(self.service.jobs), 0)
+
+        _, events = await request(self.connect, 'POST', '/solve', {'instance': {'path': '/nonexistent.vrp'}})
+        self.assertEqual(events[-1]['event'], 'failed')
+        self.assertIn('FileNotFoundError', events[-1]['error'])
+
+    async def test_rejects_malformed_content_length(self):
+        reader, writer = await self.connect()
+        writer.write(b'POST /jobs HTTP/1.1\r\nContent-Length: many\r\n\r\n{}')
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        self.assertEqual(int(response.split()[1]), 400)
+
+    async def test_seed_reproduces_concurrent_jobs(self):
+        job = {'instance': create_instance(4, 12), 'max_interchange_iterations': 1, 'seed': 5}
+        submitted = [(await request(self.connect, 'POST', '/jobs', job))[1] for _ in range(2)]
+        results = []
+        for summary in submitted:
+            _, events = await request(self.connect, 'GET', f'/jobs/{summary["job_id"]}/events')
+            self.assertEqual(events[-1]['event'], 'completed')
+            results.append(events[-1]['result'])
+        self.assertEqual(results[0]['tours'], results[1]['tours'])
+
+    async def test_unix_socket(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cevrp.sock')
+            service = SolveService(workers=1)
+            server = await serve(service, path=path)
+            try:
+                _, events = await request(lambda: asyncio.open_unix_connection(path), 'POST', '/solve',
+                                          {'instance': create_instance(3, 8), 'optimize': False})
+                self.assertEqual(events[-1]['event'], 'completed')
+            finally:
+                server.close()
+                await server.wait_closed()
+                await service.stop()
+
+
+class InstanceCacheTests(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        entries = {}
+        for seed in range(3):
+            data = InstanceLoader.load_dict(create_instance(seed, 99))
+            entries[instance_hash(data)] = CachedInstance(data, MatrixDistanceProvider(np.zeros((100, 100))))
+        first, second, third = entries
+        cache = InstanceCache(max_bytes=int(2.5 * entries[first].nbytes))
+
+        cache.get_or_create(first, lambda: entries[first])
+        cache.get_or_create(second, lambda: entries[second])
+        cache.get_or_create(first, lambda: entries[first])
+        cache.get_or_create(third, lambda: entries[third])
+
+        self.assertIn(first, cache)
+        self.assertNotIn(second, cache)
+        self.assertEqual(cache.info()['evictions'], 1)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
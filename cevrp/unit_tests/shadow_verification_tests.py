@@ -0,0 +1,81 @@
+import itertools
+import unittest
+
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cost_memo import CostMemo, RouteCosts
+from cevrp.vnd.moves import CrossExchangeMove, MoveEvaluator, SwapMove, TwoLambdaMove
+from cevrp.vnd.shadow_verification import ShadowVerifier
+
+
+class ShadowVerifierTests(unittest.TestCase):
+    def setUp(self):
+        self.nodes = generate_instance(24, 'depot_off_center', seed=8, extent=50, max_demand=9,
+                                       max_service_time=2).create_nodes()
+        self.depot = self.nodes[0]
+        self.vehicle = Vehicle(1, 60, 600, 1, 10, 80)
+        self.threshold = 90
+        customers = self.nodes[1:]
+        self.tours = [Tour([self.depot] + customers[:12] + [self.depot]),
+                      Tour([self.depot] + customers[12:] + [self.depot])]
+
+    def moves(self):
+        for i, j in itertools.combinations(range(1, 13), 2):
+            yield SwapMove(0, i, j)
+        for p1, p2 in itertools.product(range(1, 13), range(1, 13)):
+            yield TwoLambdaMove(0, p1, 1, p2)
+        for start in range(1, 10):
+            yield CrossExchangeMove(0, start, start + 3, 1, 13 - start, 13)
+
+    def evaluator(self, verifier):
+        edges = FeasibleEdges.build(self.nodes, self.threshold, 1)
+        return MoveEvaluator(self.vehicle, self.threshold, edges, CostMemo(), verifier=verifier)
+
+    def test_fast_paths_agree_with_reference(self):
+        verifier = ShadowVerifier(rate=1.0)
+        evaluator = self.evaluator(verifier)
+        plain = self.evaluator(None)
+        for move in itertools.chain(self.moves(), self.moves()):
+            self.assertEqual(evaluator.evaluate(move, self.tours), plain.evaluate(move, self.tours))
+
+        self.assertEqual(verifier.total_mismatches, 0, verifier.records)
+        for kind in ('route_cache', 'memo', 'delta', 'bound'):
+            self.assertGreater(verifier.checks[kind], 0, kind)
+
+        metrics = MetricsRegistry()
+        verifier.report(metrics)
+        self.assertEqual(metrics.counters['shadow_mismatches_delta'], 0)
+        self.assertEqual(metrics.gauges['shadow_mismatches'], 0)
+
+    def test_sampling_rate(self):
+        verifier = ShadowVerifier(rate=0.1, seed=3)
+        evaluator = self.evaluator(verifier)
+        for move in self.moves():
+            evaluator.evaluate(move, self.tours)
+        moves = sum(verifier.checks[kind] for kind in ('delta', 'bound', 'edges'))
+        self.assertGreater(moves, 0)
+        self.assertLess(moves, 0.25 * len(list(self.moves())))
+
+    def test_reports_stale_route_cache_and_memo(self):
+        verifier = ShadowVerifier(rate=1.0)
+        evaluator = self.evaluator(verifier)
+        evaluator.route_costs(self.tours[0])
+        # modified behind the evaluator's back
+        self.tours[0].nodes[1], self.tours[0].nodes[5] = self.tours[0].nodes[5], self.tours[0].nodes[1]
+        evaluator.route_costs(self.tours[0])
+        self.assertEqual(verifier.mismatches['route_cache'], 1)
+        record = verifier.records[0]
+        self.assertEqual(record.context['nodes'], [n.node_id for n in self.tours[0]])
+
+        evaluator = self.evaluator(verifier)
+        move = SwapMove(1, 2, 4)
+        evaluator.evaluate(move, self.tours)
+        for key in list(evaluator.memo._entries):
+            evaluator.memo.put(key, RouteCosts(0, 0, 0, 0, 0, True))
+        evaluator.evaluate(move, self.tours)
+        self.assertEqual(verifier.mismatches['memo'], 1)
+        self.assertEqual(verifier.mismatches['delta'], 1)
+        self.assertIn('SwapMove', verifier.to_dict()['records'][-1]['context']['move'])
@@ -0,0 +1,52 @@
+import random
+import unittest
+
+from cevrp.cost_types import CostTypes
+from cevrp.instance_generator import generate_instance
+from cevrp.metrics import MetricsRegistry
+from cevrp.vnd import cevrp_optimizer
+from cevrp.vnd.moves import evaluate_route
+from cevrp.vnd.shadow_verification import ShadowVerifier
+from cevrp.vnd.speculative import SpeculativeExploration
+
+
+class SpeculativeExplorationTests(unittest.TestCase):
+    def setUp(self):
+        data = generate_instance(40, seed=7, max_demand=9, max_service_time=1, commodity_capacity=100,
+                                 distance_threshold=2000)
+        self.model = data.to_model(num_vehicles=1, battery_consumption_rate=1)
+        self.model.decompose_nodes(20, 300)
+        self.vehicle = self.model.vehicles[0]
+
+    def optimize(self, policy):
+        random.seed(1)
+        tour_plans = {k: self.model.generate_cws_solution(v) for k, v in self.model.node_clusters.items()}
+        initial = sum(t.get_costs_of_tour(self.vehicle, self.model.battery_threshold)[CostTypes.TOTAL]
+                      for plan in tour_plans.values() for t in plan)
+        metrics = MetricsRegistry()
+        with SpeculativeExploration(self.model, workers=2, policy=policy) as speculation:
+            plan = cevrp_optimizer.optimize_tours(tour_plans, self.model, None, 2, metrics=metrics, visualize=False,
+                                                  speculation=speculation)
+            self.assertTrue(speculation.converged)
+        return initial, [[n.node_id for n in t] for t in plan], metrics
+
+    def test_reproducible_and_improving(self):
+        for policy in ('best', 'first'):
+            with self.subTest(policy=policy):
+                initial, tours, metrics = self.optimize(policy)
+                _, again, _ = self.optimize(policy)
+                self.assertEqual(again, tours)
+                self.assertEqual(sorted(i for t in tours for i in t if i != 0), list(range(1, 41)))
+                final = sum(evaluate_route(
+                    [self.model.get_node_by_id(i) for i in t], self.vehicle, self.model.battery_threshold)[0]
+                    for t in tours)
+                self.assertLess(final, initial)
+                self.assertGreater(metrics.operator('two_opt_move').attempts, 0)
+
+    def test_rejects_shadow_verifier(self):
+        with SpeculativeExploration(self.model, workers=1) as speculation:
+            self.assertRaises(ValueError, cevrp_optimizer.optimize_tours, {}, self.model, None, 2, visualize=False,
+                              shadow=ShadowVerifier(1.0), speculation=speculation)
+
+    def test_rejects_unknown_policy(self):
+        self.assertRaises(ValueError, SpeculativeExploration, self.model, policy='fastest')
@@ -1,3 +1,4 @@
+import copy
 from dataclasses import dataclass
 from typing import Self
 
@@ -37,10 +38,12 @@ class Vehicle:
         self.current_battery_level -= (other[0]-other[1]) * self.battery.consumption_rate
         return self
 
-    # recharges battery
+    # recharged copy of the vehicle. Cost evaluations start from +vehicle and only ever discharge
+    # their own copy, so a vehicle shared between threads is never modified.
     def __pos__(self) -> Self:
-        self.current_battery_level = self.battery.capacity
-        return self
+        recharged = copy.copy(self)
+        recharged.current_battery_level = self.battery.capacity
+        return recharged
 
     def __invert__(self) -> float:
         return self.battery.capacity - self.current_battery_level
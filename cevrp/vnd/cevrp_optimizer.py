@@ -1,7 +1,7 @@
 import logging
-import logging
 import random
 import time
+from dataclasses import dataclass
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -10,15 +10,28 @@ from numba import jit
 from cevrp.cevrp_model import CEVRPVisualizer, CEVRPModel
 from cevrp.constraints import Constraints, ConstraintValidationStrategy
 from cevrp.cost_types import CostTypes
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.metrics import MetricsRegistry
 from cevrp.node import Node
-from cevrp.savings_calculator import SavingsCalculator
 from cevrp.tour import Tour
 from cevrp.tour_plan import TourPlan
-from cevrp.vnd.neighborhood_operators import NeighborhoodOperators, NeighborhoodOperatorsImpl
-from cevrp.vnd.neighborhood_data import NeighborhoodData
+from cevrp.vnd.cost_memo import CostMemo
+from cevrp.vnd.moves import CrossExchangeMove, MoveEvaluator, TwoLambdaMove
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+from cevrp.vnd.operator_selection import AdaptiveOperatorSelection
+from cevrp.vnd.parallel_pairs import ParallelPairSearch
+from cevrp.vnd.parallel_two_opt import ParallelTwoOpt
+from cevrp.vnd.checkpoint import CheckpointPolicy, Checkpointer, OptimizerState
+from cevrp.vnd.route_index import RouteIndex
+from cevrp.vnd.run_history import RunHistory
+from cevrp.vnd.shadow_verification import ShadowVerifier
+from cevrp.vnd.speculative import SpeculativeExploration
+from cevrp.vehicle import Vehicle
 
 shaker = NeighborhoodOperators
 
+logger = logging.getLogger(__name__)
+
 
 def get_total_costs(tour1, tour2, vehicle, battery_threshold):
     return tour1.get_costs_of_tour(+vehicle, battery_threshold)[CostTypes.TOTAL] \
@@ -29,214 +42,498 @@ def get_total_costs2(tours, vehicle, battery_threshold):
     return sum(t.get_costs_of_tour(+vehicle, battery_threshold)[CostTypes.TOTAL] for t in tours)
 
 
-def is_invalid(tour, vehicle, battery_threshold):
+def is_invalid(tour, vehicle, battery_threshold, feasible_edges=None):
+    constraints = list(Constraints)
+    if feasible_edges is not None:
+        # per-edge battery feasibility is looked up instead of recomputed
+        if not feasible_edges.all_feasible(tour.nodes):
+            return True
+        constraints.remove(Constraints.BATTERY_CAPACITY)
     return not all(ConstraintValidationStrategy(
                     constraint.value,
                     tour,
                     vehicle,
                     battery_threshold,
-            ).is_valid() for constraint in Constraints)
-
-
-def optimize_tours(tourplan: dict[[any], TourPlan], model: CEVRPModel, outliers, max_interchange_iterations):
-    logging.getLogger().setLevel(logging.INFO)
-
-    all_tour_plans = []
-
-    previous_solutions = {}
-    it = 0
-    no_mutation = False
+            ).is_valid() for constraint in constraints)
+
+
+# Everything a neighborhood round needs besides the tours.
+@dataclass
+class SearchContext:
+    vehicle: Vehicle
+    battery_threshold: float
+    feasible_edges: FeasibleEdges
+    evaluator: MoveEvaluator
+    depot: Node
+    metrics: MetricsRegistry
+    # restricts tour pairs and insertion routes to spatially close routes
+    route_index: RouteIndex | None = None
+    # evaluates the tour pairs of cross exchange and two-lambda rounds on a thread pool
+    pair_search: ParallelPairSearch | None = None
+    # runs the two-opt round on a process pool
+    two_opt_pool: ParallelTwoOpt | None = None
+    # source of the random draws, the random module or a random.Random of the run
+    rng: random.Random = random
+
+    def partners(self, route: int, tours: list[Tour]):
+        if self.route_index is None:
+            return (other for other in range(len(tours)) if other != route)
+        return self.route_index.partners(route)
+
+    def routes_changed(self, tours: list[Tour], *routes: int):
+        if self.route_index is not None:
+            for route in routes:
+                self.route_index.update(route, tours[route])
+
+    def pairs(self, tours: list[Tour]) -> list[tuple[int, int]]:
+        return [(i, j) for i in range(len(tours)) for j in self.partners(i, tours)]
+
+
+# The neighborhood rounds return the number of accepted moves and update the operator metrics.
+def two_opt_round(tours: list[Tour], context: SearchContext) -> int:
+    if context.two_opt_pool is not None:
+        return parallel_two_opt_round(tours, context)
+    two_opt_metrics = context.metrics.operator(shaker.TWO_OPT_MOVE.key)
+    evaluator = context.evaluator
+    accepted_before = two_opt_metrics.accepted
+    for j in range(len(tours)):
+        t_move = time.perf_counter()
+        tour2 = tours[j]
+        old_costs = evaluator.route_cost(tour2)
+
+        # improving swaps are applied to tour2 in place, two_opt_move counts the sampled swaps
+        shaker.TWO_OPT_MOVE(tour2, context.vehicle, context.battery_threshold, 100, context.feasible_edges, evaluator,
+                            two_opt_metrics, context.rng)
+        new_costs = evaluator.route_cost(tour2)
+
+        if new_costs < old_costs:
+            logger.debug("LOCAL OPTIMUM FOUND VIA TWO OPT MOVE")
+            two_opt_metrics.improvement += old_costs - new_costs
+        two_opt_metrics.seconds += time.perf_counter() - t_move
+    return two_opt_metrics.accepted - accepted_before
+
+
+# Same as two_opt_round with the tours improved on the process pool. An improved tour replaces tours[j].
+# The swap counts and CPU time of the workers are added to the operator's metrics.
+def parallel_two_opt_round(tours: list[Tour], context: SearchContext) -> int:
+    two_opt_metrics = context.metrics.operator(shaker.TWO_OPT_MOVE.key)
+    evaluator = context.evaluator
+    accepted = 0
+    t_round = time.perf_counter()
+    results = context.two_opt_pool.improve(tours, 100, context.rng)
+    for j, (nodes, tour_metrics) in enumerate(results):
+        two_opt_metrics.attempts += tour_metrics.attempts
+        two_opt_metrics.feasible += tour_metrics.feasible
+        two_opt_metrics.pruned += tour_metrics.pruned
+        two_opt_metrics.accepted += tour_metrics.accepted
+        two_opt_metrics.cpu_seconds += tour_metrics.cpu_seconds
+        accepted += tour_metrics.accepted
+        if nodes is None:
+            continue
+        old_costs = evaluator.route_cost(tours[j])
+        evaluator.forget(tours[j])
+        tours[j] = Tour(nodes)
+        new_costs = evaluator.route_cost(tours[j])
+        if new_costs < old_costs:
+            logger.debug("LOCAL OPTIMUM FOUND VIA TWO OPT MOVE")
+            two_opt_metrics.improvement += old_costs - new_costs
+    two_opt_metrics.seconds += time.perf_counter() - t_round
+    return accepted
+
+
+# SEQUENTIAL INSERTION INCLUDES CHECKS FOR TOUR VALIDATION
+def insertion_round(tours: list[Tour], runner_clients: list[Node], context: SearchContext) \
+        -> tuple[list[Tour], list[Node], int]:
+    insertion_metrics = context.metrics.operator(shaker.SEQUENTIAL_INSERTION.key)
+    t_move = time.perf_counter()
+    copied_runner_clients = [rc for rc in runner_clients]
+    runner_clients, tp = NeighborhoodOperators.SEQUENTIAL_INSERTION(
+        copied_runner_clients,
+        TourPlan(tours),
+        context.vehicle,
+        context.battery_threshold,
+        route_index=context.route_index,
+    )
+    if context.route_index is not None:
+        context.route_index = context.route_index.rebuild(tp.tours)
+
+    inserted = len(copied_runner_clients) - len(runner_clients)
+    insertion_metrics.attempts += len(copied_runner_clients)
+    insertion_metrics.feasible += inserted
+    insertion_metrics.accepted += inserted
+    insertion_metrics.seconds += time.perf_counter() - t_move
+    return tp.tours, runner_clients, inserted
+
+
+# Random cross exchange of the tour pair (i, j), None if no valid pair of sections was found within 2 seconds.
+# rng is the random module or a random.Random of a worker thread.
+def draw_cross_exchange(tours: list[Tour], i: int, j: int, rng=random) -> CrossExchangeMove | None:
+    tour1 = tours[i]
+    tour2 = tours[j]
+    if len(tour1) == 3 and len(tour2) == 3:
+        # two single customers, every exchange has sections of length 1
+        return None
+    t_cross_exchange = time.time()
+    while time.time() - t_cross_exchange < 2:
+        # same draws as get_random_tour_section, but only the positions are kept
+        r1 = rng.randint(1, len(tour1)-2)
+        r2 = rng.randint(1, len(tour2)-2)
+        start_1 = rng.randint(1, len(tour1) - r1)
+        start_2 = rng.randint(1, len(tour2) - r2)
+        # sections must not contain the closing depot
+        if start_1 + r1 < len(tour1) and start_2 + r2 < len(tour2) and not (r1 == 1 and r2 == 1):
+            return CrossExchangeMove(i, start_1, start_1 + r1, j, start_2, start_2 + r2)
+    return None
+
+
+# Random two-lambda interchange of the tour pair (i, j), None if the drawn edges touch the depot.
+def draw_two_lambda(tours: list[Tour], i: int, j: int, rng=random) -> TwoLambdaMove | None:
+    tour1 = tours[i]
+    tour2 = tours[j]
+    # index of a random pair out of the |E1| x |E2| edge pairs, without building the pairs
+    edges_2 = len(tour2) - 1
+    r = rng.randint(0, (len(tour1) - 1) * edges_2 - 1)
+    e1, e2 = divmod(r, edges_2)
+    if tour1[e1].node_id == 0 or tour1[e1 + 1].node_id == 0 or tour2[e2].node_id == 0 or tour2[e2 + 1].node_id == 0:
+        return None
+    return TwoLambdaMove(i, e1 + 1, j, e2)
+
+
+def cross_exchange_round(tours: list[Tour], context: SearchContext, max_interchange_iterations: int) -> int:
+    cross_exchange_metrics = context.metrics.operator(shaker.CROSS_EXCHANGE.key)
+    evaluator = context.evaluator
+    accepted = 0
+    for n in range(max_interchange_iterations):
+        if context.pair_search is not None:
+            accepted += context.pair_search.run(draw_cross_exchange, context.pairs(tours), tours, evaluator,
+                                                cross_exchange_metrics,
+                                                lambda move: context.routes_changed(tours, *move.routes), context.rng)
+            continue
+        for i in range(len(tours)):
+            for j in context.partners(i, tours):
+                tour1 = tours[i]
+                tour2 = tours[j]
+
+                if len(tour1) == 3 and len(tour2) == 3:
+                    continue
+
+                t_move = time.perf_counter()
+                cross_exchange_metrics.attempts += 1
+                move = draw_cross_exchange(tours, i, j, context.rng)
+                if move is None:
+                    logger.critical("Could not find valid subtours for %s and %s", tour1, tour2)
+                    cross_exchange_metrics.seconds += time.perf_counter() - t_move
+                    break
+
+                delta, feasible = evaluator.evaluate(move, tours)
+                if not feasible:
+                    # None: pruned by the lower bound, the move would not improve
+                    cross_exchange_metrics.pruned += feasible is None
+                    cross_exchange_metrics.seconds += time.perf_counter() - t_move
+                    continue
+                cross_exchange_metrics.feasible += 1
+
+                if delta < 0:
+                    logger.debug("LOCAL OPTIMUM FOUND VIA CROSS EXCHANGE")
+                    accepted += 1
+                    cross_exchange_metrics.accepted += 1
+                    cross_exchange_metrics.improvement -= delta
+                    evaluator.apply(move, tours)
+                    context.routes_changed(tours, i, j)
+                cross_exchange_metrics.seconds += time.perf_counter() - t_move
+    return accepted
+
+
+def two_lambda_round(tours: list[Tour], context: SearchContext, max_interchange_iterations: int) -> int:
+    two_lambda_metrics = context.metrics.operator(shaker.TWO_LAMBDA_INTERCHANGE.key)
+    evaluator = context.evaluator
+    accepted = 0
+    for n in range(max_interchange_iterations):
+        if context.pair_search is not None:
+            accepted += context.pair_search.run(draw_two_lambda, context.pairs(tours), tours, evaluator,
+                                                two_lambda_metrics,
+                                                lambda move: context.routes_changed(tours, *move.routes), context.rng)
+            continue
+        for i in range(len(tours)):
+            for j in context.partners(i, tours):
+                t_move = time.perf_counter()
+                two_lambda_metrics.attempts += 1
+
+                move = draw_two_lambda(tours, i, j, context.rng)
+                if move is None:
+                    two_lambda_metrics.seconds += time.perf_counter() - t_move
+                    continue
+
+                delta, feasible = evaluator.evaluate(move, tours)
+                if not feasible:
+                    # None: pruned by the lower bound, the move would not improve
+                    two_lambda_metrics.pruned += feasible is None
+                    two_lambda_metrics.seconds += time.perf_counter() - t_move
+                    continue
+                two_lambda_metrics.feasible += 1
+
+                if delta < 0:
+                    logger.debug("LOCAL OPTIMUM FOUND VIA TWO LAMBDA INTERCHANGE")
+                    accepted += 1
+                    two_lambda_metrics.accepted += 1
+                    two_lambda_metrics.improvement -= delta
+                    evaluator.apply(move, tours)
+                    context.routes_changed(tours, i, j)
+                two_lambda_metrics.seconds += time.perf_counter() - t_move
+    return accepted
+
+
+# One speculative step (see SpeculativeExploration). The kept outcome replaces the tours, returns the tours,
+# the operator whose outcome was kept (None if no operator improved) and its accepted moves.
+def speculative_round(tours: list[Tour], context: SearchContext, speculation: SpeculativeExploration,
+                      max_interchange_iterations: int) -> tuple[list[Tour], NeighborhoodOperators | None, int]:
+    result, operator, accepted, improvement = speculation.step(tours, context.metrics, max_interchange_iterations,
+                                                                 context.rng)
+    if result is None:
+        return tours, None, 0
+    for tour in tours:
+        context.evaluator.forget(tour)
+    if context.route_index is not None:
+        context.route_index = context.route_index.rebuild(result)
+    logger.debug("KEPT SPECULATIVE %s (-%.2f)", operator.name, improvement)
+    return result, operator, accepted
+
+
+# Runs one round of an improvement operator, returns the accepted moves and the cost improvement.
+# CPU time is accounted separately from wall-clock time, it is the cost measure of the adaptive selection.
+def run_operator(operator: NeighborhoodOperators, tours: list[Tour], context: SearchContext,
+                 max_interchange_iterations: int) -> tuple[int, float]:
+    operator_metrics = context.metrics.operator(operator.key)
+    improvement_before = operator_metrics.improvement
+    t_cpu = time.process_time()
+    if operator == shaker.TWO_OPT_MOVE:
+        accepted = two_opt_round(tours, context)
+    elif operator == shaker.CROSS_EXCHANGE:
+        accepted = cross_exchange_round(tours, context, max_interchange_iterations)
+    elif operator == shaker.TWO_LAMBDA_INTERCHANGE:
+        accepted = two_lambda_round(tours, context, max_interchange_iterations)
+    else:
+        raise ValueError(f'{operator.name} is not an improvement operator.')
+    operator_metrics.cpu_seconds += time.process_time() - t_cpu
+    return accepted, operator_metrics.improvement - improvement_before
+
+
+# By default the neighborhoods run in a fixed order (2-opt, insertion, cross exchange, two-lambda) until
+# the costs did not change for three iterations. With a selection, every iteration applies one operator
+# chosen by AdaptiveOperatorSelection instead, until the selection converged. time_budget (seconds)
+# bounds both modes. Candidate route costs are memoized in an LRU of memo_entries sequences (0 disables it).
+# With spatial_filter, exchanges and insertions only consider routes close to each other (RouteIndex).
+# A shadow verifier checks a sample of the fast cost evaluations against the reference implementation.
+# A pair search evaluates route-disjoint tour pairs of the exchange rounds concurrently (ParallelPairSearch),
+# a two-opt pool improves the tours of the two-opt round on worker processes (ParallelTwoOpt).
+# With a speculation, every iteration explores all improvement neighborhoods of the incumbent concurrently
+# on worker processes and keeps one outcome (SpeculativeExploration), until no operator improved for a while.
+# The speculation workers evaluate moves without the shadow verifier, so the two cannot be combined.
+# All random draws come from rng, the random module unless a run brings its own random.Random (e.g. concurrent
+# runs in one process); checkpoints store its state.
+def optimize_tours(
+        tourplan: dict[[any], TourPlan] | None,
+        model: CEVRPModel,
+        outliers,
+        max_interchange_iterations,
+        checkpoint_policy: CheckpointPolicy | None = None,
+        resume_state: OptimizerState | None = None,
+        history: RunHistory | None = None,
+        metrics: MetricsRegistry | None = None,
+        visualize: bool = True,
+        selection: AdaptiveOperatorSelection | None = None,
+        time_budget: float | None = None,
+        memo_entries: int = 100_000,
+        spatial_filter: bool = True,
+        shadow: ShadowVerifier | None = None,
+        pair_search: ParallelPairSearch | None = None,
+        two_opt_pool: ParallelTwoOpt | None = None,
+        speculation: SpeculativeExploration | None = None,
+        rng: random.Random | None = None,
+) -> TourPlan:
+    if shadow is not None and speculation is not None:
+        raise ValueError('A shadow verifier cannot check the evaluations of a speculation, pass only one of them.')
+    if rng is None:
+        rng = random
+    if history is None:
+        history = RunHistory(len(model.nodes))
+    if metrics is None:
+        metrics = MetricsRegistry()
+    operator_outcomes = {}
+
+    if resume_state is None:
+        previous_solutions = {}
+        it = 0
+
+        if outliers is None:
+            runner_clients = []
+        else:
+            runner_clients = outliers
 
-    if outliers is None:
-        runner_clients = []
+        # moves are applied in place, the caller's tours stay as they are
+        tours = [Tour(list(t.nodes)) for k, v in tourplan.items() if k != -1 for t in v.tours]
     else:
-        runner_clients = outliers
+        previous_solutions = resume_state.previous_solutions
+        it = resume_state.iteration
+        runner_clients = resume_state.runner_clients
+        tours = resume_state.tours
+        rng.setstate(resume_state.random_state)
+        logger.info("RESUMING AFTER ITERATION %d", it)
+
+    checkpointer = None if checkpoint_policy is None else Checkpointer(checkpoint_policy, it)
+    no_mutation = False
 
-    tours = [t for k, v in tourplan.items() if k != -1 for t in v.tours]
     vehicle = model.vehicles[0]
     battery_threshold = model.battery_threshold
+    feasible_edges = model.feasible_edges
+    memo = CostMemo(memo_entries) if memo_entries > 0 else None
+    evaluator = MoveEvaluator(vehicle, battery_threshold, feasible_edges, memo, verifier=shadow)
+    context = SearchContext(vehicle, battery_threshold, feasible_edges, evaluator, model.depot, metrics,
+                            RouteIndex(tours) if spatial_filter else None, pair_search, two_opt_pool, rng)
     t_total = time.time()
-    while not no_mutation and it < 100:
-        it += 1
+    deadline = None if time_budget is None else t_total + time_budget
+    max_iterations = 100 if selection is None and speculation is None else float('inf')
+    with metrics.phase('vns'):
+        while not no_mutation and it < max_iterations and (deadline is None or time.time() < deadline):
+            if checkpointer is not None:
+                checkpointer.maybe_save(OptimizerState(tours, runner_clients, previous_solutions, it, rng.getstate()))
 
-        logging.info(f"BEGIN ITERATION {it}")
-        logging.info(f"BEGIN TWO OPT MOVE ({it})")
+            history.record(it, tours, vehicle, battery_threshold, operator_outcomes,
+                           [evaluator.route_cost(t) for t in tours])
+            operator_outcomes = {operator.key: 0 for operator in NeighborhoodOperators}
 
-        local_optimum_found = False
+            it += 1
 
-        all_tour_plans.append((TourPlan([t.get_manual_copy() for t in tours]), it))
+            logger.info("BEGIN ITERATION %d", it)
 
-        for j in range(len(tours)):
-            tour2 = tours[j]
-            old_costs = get_total_costs2([tour2], vehicle, battery_threshold)
+            if speculation is not None:
+                if len(runner_clients) != 0:
+                    tours, runner_clients, inserted = insertion_round(tours, runner_clients, context)
+                    operator_outcomes[shaker.SEQUENTIAL_INSERTION.key] += inserted
 
-            tour2_candidate = shaker.TWO_OPT_MOVE(
-                tour2,
-                vehicle,
-                battery_threshold,
-                SavingsCalculator.get_savings,
-                100
-            )
-            new_costs = get_total_costs2([tour2_candidate], vehicle, battery_threshold)
+                tours, operator, accepted = speculative_round(tours, context, speculation, max_interchange_iterations)
+                if operator is not None:
+                    operator_outcomes[operator.key] += accepted
 
-            if is_invalid(tour2_candidate, vehicle, battery_threshold):
+                previous_solutions[it] = round(sum(evaluator.route_cost(t) for t in tours), 2)
+                no_mutation = speculation.converged
                 continue
 
-            if new_costs < old_costs:
-                local_optimum_found = True
-                logging.info("LOCAL OPTIMUM FOUND VIA TWO OPT MOVE")
-                tours[j] = tour2_candidate
+            if selection is not None:
+                if len(runner_clients) != 0:
+                    tours, runner_clients, inserted = insertion_round(tours, runner_clients, context)
+                    operator_outcomes[shaker.SEQUENTIAL_INSERTION.key] += inserted
 
-        if local_optimum_found:
-            local_optimum_found = False
-        else:
-            logging.warning(f"NO LOCAL OPTIMUM VIA TWO OPT MOVE AT ({it})")
-
-        if len(runner_clients) != 0:
-            logging.info(f"BEGIN SEQUENTIAL INSERTION ({it})")
-
-            # SEQUENTIAL INSERTION INCLUDES CHECKS FOR TOUR VALIDATION
-            copied_runner_clients = [rc for rc in runner_clients]
-            runner_clients, tp = NeighborhoodOperators.SEQUENTIAL_INSERTION(
-                copied_runner_clients,
-                TourPlan(tours),
-                vehicle,
-                battery_threshold
-            )
-
-            tours = tp.tours
-            logging.info(f"END SEQUENTIAL INSERTION ({it})")
-
-        logging.info(f"BEGIN CROSS EXCHANGE ({it})")
-
-        for n in range(max_interchange_iterations):
-            for i in range(len(tours)):
-                for j in range(len(tours)):
-                    if i == j:
-                        continue
-
-                    tour1 = tours[i]
-                    tour2 = tours[j]
-
-                    if len(tour1) == 3 and len(tour2) == 3:
-                        continue
-
-                    old_costs = get_total_costs(tour1, tour2, vehicle, battery_threshold)
-                    found_valid_subtours = False
-                    s1 = Tour([])
-                    s2 = Tour([])
-                    t_cross_exchange = time.time()
-                    while not found_valid_subtours and time.time() - t_cross_exchange < 2:
-                        r1 = random.randint(1, len(tour1)-2)
-                        r2 = random.randint(1, len(tour2)-2)
-                        s1 = NeighborhoodOperatorsImpl.get_random_tour_section(tour1, r1)
-                        s2 = NeighborhoodOperatorsImpl.get_random_tour_section(tour2, r2)
-                        if (s1.nodes.count(Node.create_depot()) == 0 and s2.nodes.count(Node.create_depot()) == 0) \
-                                and not (len(s1) == 1 and len(s2) == 1):
-                            found_valid_subtours = True
-
-                    if not found_valid_subtours:
-                        logging.critical(f"Could not find valid subtours for {tour1} and {tour2}")
-                        break
-
-                    data = NeighborhoodData(
-                        tour1,
-                        tour2,
-                        vehicle,
-                        battery_threshold,
-                        SavingsCalculator.get_savings,
-                        tour_1_section_nodes=s1.nodes,
-                        tour_2_section_nodes=s2.nodes,
-                    )
-
-                    tour1_candidate, tour2_candidate = shaker.CROSS_EXCHANGE(data)
-
-                    if is_invalid(tour1_candidate, vehicle, battery_threshold) or is_invalid(tour2_candidate, vehicle, battery_threshold):
-                        continue
-
-                    new_costs = get_total_costs(tour1_candidate, tour2_candidate, vehicle, battery_threshold)
-                    if new_costs < old_costs:
-                        local_optimum_found = True
-                        logging.info("LOCAL OPTIMUM FOUND VIA CROSS EXCHANGE")
-                        tours[i] = tour1_candidate
-                        tours[j] = tour2_candidate
-
-        if local_optimum_found:
-            continue
-        else:
-            logging.warning(f"NO LOCAL OPTIMUM VIA CROSS EXCHANGE AT ({it})")
+                operator = selection.select()
+                cpu_seconds = metrics.operator(operator.key).cpu_seconds
+                accepted, improvement = run_operator(operator, tours, context, max_interchange_iterations)
+                operator_outcomes[operator.key] += accepted
+                selection.update(operator, improvement, metrics.operator(operator.key).cpu_seconds - cpu_seconds)
 
-        logging.info(f"BEGIN TWO LAMBDA INTERCHANGE ({it})")
-
-        for n in range(max_interchange_iterations):
-            for i in range(len(tours)):
-                for j in range(len(tours)):
-                    if i == j:
-                        continue
-
-                    tour1 = tours[i]
-                    tour2 = tours[j]
-
-                    edges = [(e1, e2) for e1 in tour1.get_edges() for e2 in tour2.get_edges()]
-
-                    old_costs = get_total_costs(tour1, tour2, vehicle, battery_threshold)
-
-                    r = random.randint(0, len(edges) - 1)
-
-                    edge1, edge2 = edges[r]
-                    if edge1.count(Node.create_depot()) == 1 or edge2.count(Node.create_depot()) == 1:
-                        continue
-
-                    data = NeighborhoodData(
-                        tour1,
-                        tour2,
-                        vehicle,
-                        battery_threshold,
-                        SavingsCalculator.get_savings,
-                        tour_1_section_indices=[tour1.nodes.index(n) for n in tour1 if n in edge1],
-                        tour_2_section_indices=[tour2.nodes.index(n) for n in tour2 if n in edge2],
-                    )
-                    tour1_candidate, tour2_candidate = shaker.TWO_LAMBDA_INTERCHANGE(data)
-
-                    if is_invalid(tour1_candidate, vehicle, battery_threshold) or is_invalid(tour2_candidate, vehicle, battery_threshold):
-                        continue
-
-                    new_costs = get_total_costs(tour1_candidate, tour2_candidate, vehicle, battery_threshold)
-                    if new_costs < old_costs:
-                        local_optimum_found = True
-                        logging.info("LOCAL OPTIMUM FOUND VIA TWO LAMBDA INTERCHANGE")
-                        tours[i] = tour1
-                        tours[j] = tour2
-                        # edges = [(e1, e2) for e1 in tour1.get_edges() for e2 in tour2.get_edges()]
-
-        if local_optimum_found:
-            continue
-        else:
-            logging.warning(f"NO LOCAL OPTIMUM VIA TWO LAMBDA INTERCHANGE AT ({it})")
+                previous_solutions[it] = round(sum(evaluator.route_cost(t) for t in tours), 2)
+                no_mutation = selection.converged
+                continue
 
-        logging.critical(f"END OF LOOP {it} -> {round(time.time() - t_total, 2)} seconds")
+            logger.info("BEGIN TWO OPT MOVE (%d)", it)
 
-        previous_solutions[it] = round(get_total_costs2(tours, vehicle, battery_threshold), 2)
-        if it >= 5 and len(set([v for k, v in previous_solutions.items() if k > it-3])) == 1:
-            no_mutation = True
+            accepted, _ = run_operator(shaker.TWO_OPT_MOVE, tours, context, max_interchange_iterations)
+            operator_outcomes[shaker.TWO_OPT_MOVE.key] += accepted
+            if accepted == 0:
+                logger.warning("NO LOCAL OPTIMUM VIA TWO OPT MOVE AT (%d)", it)
 
-    CEVRPVisualizer(model).visualize_tour_plan(TourPlan(tours))
-    show_costs_progression(all_tour_plans, vehicle, battery_threshold, model)
-    print("END")
+            if len(runner_clients) != 0:
+                logger.info("BEGIN SEQUENTIAL INSERTION (%d)", it)
+                tours, runner_clients, inserted = insertion_round(tours, runner_clients, context)
+                operator_outcomes[shaker.SEQUENTIAL_INSERTION.key] += inserted
+                logger.info("END SEQUENTIAL INSERTION (%d)", it)
 
+            logger.info("BEGIN CROSS EXCHANGE (%d)", it)
 
-def show_costs_progression(tourplans_per_iteration: list[tuple[TourPlan, int]], vehicle, battery_threshold, model):
-    avg_costs = []
-    visited_ratio = []
-    for tp, i in tourplans_per_iteration:
-        avg_costs_per_tour = sum(t.get_costs_of_tour(vehicle, battery_threshold)[CostTypes.TOTAL] for t in tp) / len(tp)
-        avg_costs.append(avg_costs_per_tour)
+            accepted, _ = run_operator(shaker.CROSS_EXCHANGE, tours, context, max_interchange_iterations)
+            operator_outcomes[shaker.CROSS_EXCHANGE.key] += accepted
+            if accepted > 0:
+                continue
+            else:
+                logger.warning("NO LOCAL OPTIMUM VIA CROSS EXCHANGE AT (%d)", it)
 
-        visited_nodes = set(n for t in tp for n in t)
-        ratio = len(visited_nodes) / len(model.nodes)
-        visited_ratio.append(ratio * 100)
+            logger.info("BEGIN TWO LAMBDA INTERCHANGE (%d)", it)
 
-    tour_indices = range(1, len(avg_costs) + 1)
+            accepted, _ = run_operator(shaker.TWO_LAMBDA_INTERCHANGE, tours, context, max_interchange_iterations)
+            operator_outcomes[shaker.TWO_LAMBDA_INTERCHANGE.key] += accepted
+            if accepted > 0:
+                continue
+            else:
+                logger.warning("NO LOCAL OPTIMUM VIA TWO LAMBDA INTERCHANGE AT (%d)", it)
+
+            logger.info("END OF LOOP %d -> %.2f seconds", it, time.time() - t_total)
+
+            previous_solutions[it] = round(sum(evaluator.route_cost(t) for t in tours), 2)
+            if it >= 5 and len(set([v for k, v in previous_solutions.items() if k > it-3])) == 1:
+                no_mutation = True
+
+    history.record(it, tours, vehicle, battery_threshold, operator_outcomes, [evaluator.route_cost(t) for t in tours])
+    if selection is not None:
+        selection.report(metrics)
+    if memo is not None:
+        memo.report(metrics)
+    evaluator.report(metrics)
+    if shadow is not None:
+        shadow.report(metrics)
+    if visualize:
+        tour_plan = TourPlan(tours)
+        CEVRPVisualizer(model).visualize_tour_plan(
+            tour_plan, [evaluator.route_costs(t).by_cost_type() for t in tour_plan if len(t) > 1])
+        show_costs_progression(history)
+    logger.info("END")
+    return TourPlan(tours)
+
+
+def resume_optimize_tours(
+        checkpoint_path,
+        model: CEVRPModel,
+        max_interchange_iterations,
+        checkpoint_policy: CheckpointPolicy | None = None,
+        history: RunHistory | None = None,
+        metrics: MetricsRegistry | None = None,
+        visualize: bool = True,
+        selection: AdaptiveOperatorSelection | None = None,
+        time_budget: float | None = None,
+        memo_entries: int = 100_000,
+        spatial_filter: bool = True,
+        shadow: ShadowVerifier | None = None,
+        pair_search: ParallelPairSearch | None = None,
+        two_opt_pool: ParallelTwoOpt | None = None,
+        speculation: SpeculativeExploration | None = None,
+        rng: random.Random | None = None,
+) -> TourPlan:
+    state = Checkpointer.load(checkpoint_path, model.nodes)
+    return optimize_tours(
+        None,
+        model,
+        None,
+        max_interchange_iterations,
+        checkpoint_policy=checkpoint_policy,
+        resume_state=state,
+        history=history,
+        metrics=metrics,
+        visualize=visualize,
+        selection=selection,
+        time_budget=time_budget,
+        memo_entries=memo_entries,
+        spatial_filter=spatial_filter,
+        shadow=shadow,
+        pair_search=pair_search,
+        two_opt_pool=two_opt_pool,
+        speculation=speculation,
+        rng=rng,
+    )
+
+
+def show_costs_progression(history: RunHistory):
+    avg_costs = history.average_tour_costs
+    visited_ratio = history.visited_ratios
+
+    tour_indices = history.iterations
 
     fig, ax1 = plt.subplots()
 
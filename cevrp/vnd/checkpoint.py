@@ -0,0 +1,110 @@
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from cevrp.node import Node
+from cevrp.tour import Tour
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+@dataclass
+class CheckpointPolicy:
+    path: str | os.PathLike
+    every_iterations: int | None = None
+    every_seconds: float | None = None
+
+    def is_due(self, iterations_since_save: int, seconds_since_save: float) -> bool:
+        if self.every_iterations is None and self.every_seconds is None:
+            return iterations_since_save >= 1
+        if self.every_iterations is not None and iterations_since_save >= self.every_iterations:
+            return True
+        return self.every_seconds is not None and iterations_since_save >= 1 and seconds_since_save >= self.every_seconds
+
+
+@dataclass
+class OptimizerState:
+    tours: list[Tour]
+    runner_clients: list[Node]
+    previous_solutions: dict[int, float]
+    iteration: int
+    random_state: tuple
+
+
+class Checkpointer:
+    def __init__(self, policy: CheckpointPolicy, start_iteration: int = 0):
+        self.policy = policy
+        self.last_iteration = start_iteration
+        self.last_time = time.time()
+
+    def maybe_save(self, state: OptimizerState) -> bool:
+        if not self.policy.is_due(state.iteration - self.last_iteration, time.time() - self.last_time):
+            return False
+        Checkpointer.save(self.policy.path, state)
+        self.last_iteration = state.iteration
+        self.last_time = time.time()
+        return True
+
+    # tours are stored as one flat array of node ids plus offsets, nodes are re-attached to the
+    # model's nodes on load. The file is replaced atomically so a crash never leaves a torn checkpoint.
+    @staticmethod
+    def save(path: str | os.PathLike, state: OptimizerState):
+        path = os.fspath(path)
+        tour_lengths = [len(t) for t in state.tours]
+        version, mt_state, gauss_next = state.random_state
+
+        arrays = {
+            'format_version': np.array(CHECKPOINT_FORMAT_VERSION),
+            'iteration': np.array(state.iteration),
+            'tour_nodes': np.fromiter((n.node_id for t in state.tours for n in t), dtype=np.int64,
+                                      count=sum(tour_lengths)),
+            'tour_offsets': np.cumsum([0] + tour_lengths, dtype=np.int64),
+            'runner_clients': np.array([n.node_id for n in state.runner_clients], dtype=np.int64),
+            'solution_iterations': np.array(list(state.previous_solutions.keys()), dtype=np.int64),
+            'solution_costs': np.array(list(state.previous_solutions.values()), dtype=np.float64),
+            'random_version': np.array(version),
+            'random_mt_state': np.array(mt_state, dtype=np.uint32),
+            'random_gauss_next': np.array(np.nan if gauss_next is None else gauss_next),
+        }
+
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as file:
+            np.savez(file, **arrays)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def load(path: str | os.PathLike, nodes: list[Node]) -> OptimizerState:
+        with np.load(path) as checkpoint:
+            if int(checkpoint['format_version']) != CHECKPOINT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported checkpoint format {int(checkpoint['format_version'])} in {path}.")
+
+            nodes_by_id = {node.node_id: node for node in nodes}
+            nodes_by_id.setdefault(0, Node.create_depot())
+            try:
+                tour_nodes = [nodes_by_id[node_id] for node_id in checkpoint['tour_nodes'].tolist()]
+                runner_clients = [nodes_by_id[node_id] for node_id in checkpoint['runner_clients'].tolist()]
+            except KeyError as e:
+                raise ValueError(f'Checkpoint {path} references node {e.args[0]} which is not part of the model.')
+
+            offsets = checkpoint['tour_offsets'].tolist()
+            tours = [Tour(tour_nodes[start:end]) for start, end in zip(offsets[:-1], offsets[1:])]
+
+            gauss_next = float(checkpoint['random_gauss_next'])
+            random_state = (
+                int(checkpoint['random_version']),
+                tuple(checkpoint['random_mt_state'].tolist()),
+                None if np.isnan(gauss_next) else gauss_next,
+            )
+
+            return OptimizerState(
+                tours=tours,
+                runner_clients=runner_clients,
+                previous_solutions=dict(zip(checkpoint['solution_iterations'].tolist(),
+                                            checkpoint['solution_costs'].tolist())),
+                iteration=int(checkpoint['iteration']),
+                random_state=random_state,
+            )
@@ -0,0 +1,147 @@
+import random
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from cevrp.cost_types import CostTypes
+from cevrp.metrics import MetricsRegistry
+
+MERSENNE_61 = (1 << 61) - 1
+
+
+# Cost breakdown of a node sequence as computed by Tour.get_costs_of_tour plus the constraint verdict.
+@dataclass(frozen=True, slots=True)
+class RouteCosts:
+    distance: float
+    battery_recharging: float
+    service_time: float
+    demand: float
+    total: float
+    feasible: bool
+
+    def by_cost_type(self) -> dict[CostTypes, float]:
+        return {CostTypes.DISTANCE: self.distance, CostTypes.BATTERY_RECHARGING: self.battery_recharging,
+                CostTypes.SERVICE_TIME: self.service_time, CostTypes.DEMAND: self.demand,
+                CostTypes.TOTAL: self.total}
+
+
+# Polynomial hash over Zobrist-style random keys of the node ids: h = sum(z[n_k] * B^k) mod 2^61 - 1.
+# With the prefix hashes of a tour the hash of any piece of it is available in O(1), so the hash of a
+# candidate stitched together from pieces of existing tours is computed in O(pieces), without touching
+# its nodes. The keys come from a generator of their own and do not disturb the global random state.
+# Keys and powers are only ever added, under a lock, so the hasher can be shared between threads.
+class SequenceHasher:
+    def __init__(self, seed: int = 0):
+        generator = random.Random(seed)
+        self._generator = generator
+        self._lock = threading.Lock()
+        self._keys: dict[int, int] = {}
+        self.base = generator.randrange(1 << 20, MERSENNE_61 - 1)
+        self._inverse_base = pow(self.base, -1, MERSENNE_61)
+        self._powers = [1]
+        self._inverse_powers = [1]
+
+    def key(self, node_id: int) -> int:
+        key = self._keys.get(node_id)
+        if key is None:
+            with self._lock:
+                key = self._keys.get(node_id)
+                if key is None:
+                    key = self._keys[node_id] = self._generator.randrange(1, MERSENNE_61)
+        return key
+
+    def _extend(self, length: int):
+        powers, inverse_powers = self._powers, self._inverse_powers
+        if len(powers) > length:
+            return
+        with self._lock:
+            # inverse powers first, readers check the length of powers
+            while len(powers) <= length:
+                inverse_powers.append(inverse_powers[-1] * self._inverse_base % MERSENNE_61)
+                powers.append(powers[-1] * self.base % MERSENNE_61)
+
+    def prefix_hashes(self, nodes) -> list[int]:
+        self._extend(len(nodes))
+        powers = self._powers
+        prefix = [0]
+        for position, node in enumerate(nodes):
+            prefix.append((prefix[-1] + self.key(node.node_id) * powers[position]) % MERSENNE_61)
+        return prefix
+
+    # hash of nodes[start:stop] as if it started at position 0
+    def piece_hash(self, prefix: list[int], start: int, stop: int) -> int:
+        return (prefix[stop] - prefix[start]) * self._inverse_powers[start] % MERSENNE_61
+
+    # hash of a sequence made of pieces given as (piece hash, piece length)
+    def combine(self, pieces) -> tuple[int, int]:
+        powers = self._powers
+        value, length = 0, 0
+        for piece_hash, piece_length in pieces:
+            if length >= len(powers):
+                # a candidate can be longer than every tour hashed so far
+                self._extend(length)
+            value = (value + piece_hash * powers[length]) % MERSENNE_61
+            length += piece_length
+        return value, length
+
+
+# LRU memo of RouteCosts keyed by (sequence hash, length). With 61-bit hashes a collision between the
+# few million sequences of a run is practically impossible. Lookups and insertions are locked, the
+# memo is shared by the evaluators of all threads.
+class CostMemo:
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[int, int], RouteCosts] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple[int, int]) -> RouteCosts | None:
+        with self._lock:
+            costs = self._entries.get(key)
+            if costs is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return costs
+
+    def put(self, key: tuple[int, int], costs: RouteCosts):
+        with self._lock:
+            self._entries[key] = costs
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    # estimate from one entry: key tuple with its two ints, the RouteCosts with its floats, the
+    # OrderedDict slot and link
+    @property
+    def nbytes(self) -> int:
+        if not self._entries:
+            return sys.getsizeof(self._entries)
+        key, costs = next(iter(self._entries.items()))
+        entry = sys.getsizeof(key) + sum(sys.getsizeof(k) for k in key) + sys.getsizeof(costs) \
+            + 4 * sys.getsizeof(costs.total) + 3 * 8 + 56
+        return sys.getsizeof(self._entries) + entry * len(self._entries)
+
+    def report(self, metrics: MetricsRegistry, prefix: str = 'cost_memo'):
+        metrics.set_gauge(f'{prefix}_hit_rate', self.hit_rate)
+        metrics.set_gauge(f'{prefix}_bytes', self.nbytes)
+        metrics.set_gauge(f'{prefix}_entries', len(self))
+        metrics.increment(f'{prefix}_hits', self.hits)
+        metrics.increment(f'{prefix}_misses', self.misses)
+
+    def to_dict(self) -> dict:
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'hit_rate': self.hit_rate, 'bytes': self.nbytes}
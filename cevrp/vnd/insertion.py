@@ -0,0 +1,161 @@
+import numpy as np
+
+from cevrp.distance_providers import pairwise_distances
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.route_index import RouteIndex
+
+# stands in for "no feasible position" when computing regrets, so that customers with
+# few remaining options are inserted first
+_NO_OPTION_PENALTY = 1e12
+
+
+# Regret-k insertion of unrouted customers into existing tours.
+# For every (customer, route) pair the cheapest feasible insertion position and its estimated cost
+# are kept in a table. After an insertion only the column of the modified route is recomputed.
+# Feasibility is exact and O(1) per position: the constraints are additive in demand and distance,
+# and the battery constraint only concerns the two new edges.
+# The cost of an insertion is estimated as the detour plus the energy it consumes, which is what
+# has to be recharged eventually.
+# With a RouteIndex only routes near a customer are considered for it. Customers without a feasible
+# position in any nearby route fall back to all routes.
+class RegretInsertion:
+    def __init__(self, tours: list[Tour], vehicle: Vehicle, battery_threshold: float, k: int = 2,
+                 route_index: RouteIndex | None = None):
+        self.tours = list(tours)
+        self.route_index = route_index
+        self.vehicle = vehicle
+        self.battery_threshold = battery_threshold
+        self.k = k
+        self.cost_per_distance = 1 + vehicle.battery.consumption_rate / vehicle.battery.charging_rate
+        self.demands = np.array([t.get_total_demand() for t in self.tours], dtype=np.float64)
+        self.distances = np.array([t.get_total_distance() for t in self.tours], dtype=np.float64)
+        self.modified = set()
+
+        self.customers: list[Node] = []
+        self.active = np.empty(0, dtype=bool)
+        self._coordinates = np.empty((0, 2))
+        self._demands = np.empty(0)
+        self.costs = np.empty((0, len(self.tours)))
+        self.positions = np.empty((0, len(self.tours)), dtype=np.int64)
+        self._everywhere = np.empty(0, dtype=bool)
+
+    # rows of the given customers that route is considered for
+    def _candidate_rows(self, rows: np.ndarray, route: int) -> np.ndarray:
+        if self.route_index is None:
+            return rows
+        near = self.route_index.near(route, self._coordinates[rows])
+        return rows[near | self._everywhere[rows]]
+
+    def _fill_column(self, rows: np.ndarray, route: int):
+        candidates = self._candidate_rows(rows, route)
+        self.costs[rows, route] = np.inf
+        self.positions[rows, route] = 0
+        self.costs[candidates, route], self.positions[candidates, route] = self.insertion_table(candidates, route)
+
+    # active customers without any feasible position among their nearby routes consider all routes
+    def _widen_stranded(self) -> bool:
+        if self.route_index is None:
+            return False
+        stranded = np.flatnonzero(self.active & ~self._everywhere & ~np.isfinite(self.costs.min(axis=1)))
+        if len(stranded) == 0:
+            return False
+        self._everywhere[stranded] = True
+        for route in range(len(self.tours)):
+            self._fill_column(stranded, route)
+        return True
+
+    def _distances(self, nodes: list[Node], rows: np.ndarray, outgoing: bool) -> np.ndarray:
+        # distances between the given route nodes and the customers in rows, shape (len(rows), len(nodes))
+        calculator = nodes[0].distance_calculator
+        if calculator == Node.calculate_distance:
+            route_coordinates = np.array([(n.x, n.y) for n in nodes], dtype=np.float64)
+            difference = self._coordinates[rows][:, None, :] - route_coordinates[None, :, :]
+            return np.sqrt((difference ** 2).sum(axis=2))
+        customers = [self.customers[i] for i in rows.tolist()]
+        if outgoing:
+            return pairwise_distances(customers, nodes)
+        return pairwise_distances(nodes, customers).T
+
+    def insertion_table(self, rows: np.ndarray, route: int) -> tuple[np.ndarray, np.ndarray]:
+        tour = self.tours[route]
+        nodes = tour.nodes
+        vehicle = self.vehicle
+        if len(rows) == 0 or len(nodes) < 2:
+            return np.full(len(rows), np.inf), np.zeros(len(rows), dtype=np.int64)
+
+        distance_in = self._distances(nodes[:-1], rows, outgoing=False)
+        distance_out = self._distances(nodes[1:], rows, outgoing=True)
+        edges = np.array([a - b for a, b in zip(nodes[:-1], nodes[1:])], dtype=np.float64)
+        detour = distance_in + distance_out - edges[None, :]
+
+        customer_demands = self._demands[rows]
+        rate = vehicle.battery.consumption_rate
+        feasible = (distance_in * rate <= self.battery_threshold) \
+            & (distance_out * rate <= self.battery_threshold) \
+            & (self.distances[route] + detour <= vehicle.distance_threshold) \
+            & (self.demands[route] + customer_demands <= vehicle.commodity_capacity)[:, None]
+
+        costs = np.where(feasible, detour * self.cost_per_distance, np.inf)
+        best = costs.argmin(axis=1)
+        return costs[np.arange(len(rows)), best], best + 1
+
+    def _regrets(self, rows: np.ndarray) -> np.ndarray:
+        costs = np.where(np.isinf(self.costs[rows]), _NO_OPTION_PENALTY, self.costs[rows])
+        k = min(self.k, costs.shape[1])
+        if k < 2:
+            return -costs.min(axis=1)
+        best_k = np.sort(np.partition(costs, k - 1, axis=1)[:, :k], axis=1)
+        return (best_k[:, 1:] - best_k[:, :1]).sum(axis=1)
+
+    def insert(self, customers: list[Node]) -> list[Node]:
+        self.customers = list(customers)
+        if len(self.tours) == 0 or len(self.customers) == 0:
+            return self.customers
+
+        self._coordinates = np.array([(c.x, c.y) for c in self.customers], dtype=np.float64)
+        self._demands = np.array([c.demand for c in self.customers], dtype=np.float64)
+        self.active = np.ones(len(self.customers), dtype=bool)
+        self.costs = np.empty((len(self.customers), len(self.tours)))
+        self.positions = np.empty((len(self.customers), len(self.tours)), dtype=np.int64)
+        self._everywhere = np.zeros(len(self.customers), dtype=bool)
+        rows = np.arange(len(self.customers))
+        for route in range(len(self.tours)):
+            self._fill_column(rows, route)
+
+        self._widen_stranded()
+
+        while self.active.any():
+            best_costs = self.costs.min(axis=1)
+            candidates = np.flatnonzero(np.isfinite(best_costs))
+            if len(candidates) == 0:
+                if self._widen_stranded():
+                    continue
+                break
+
+            regrets = self._regrets(candidates)
+            # highest regret first, cheapest insertion breaks ties
+            chosen = int(candidates[np.lexsort((best_costs[candidates], -regrets))[0]])
+            route = int(self.costs[chosen].argmin())
+            self._apply(chosen, route, int(self.positions[chosen, route]))
+
+        return [c for c, active in zip(self.customers, self.active) if active]
+
+    def _apply(self, customer_index: int, route: int, position: int):
+        customer = self.customers[customer_index]
+        self.active[customer_index] = False
+        self.costs[customer_index, :] = np.inf
+
+        nodes = list(self.tours[route].nodes)
+        nodes.insert(position, customer)
+        self.tours[route] = Tour(nodes)
+        self.demands[route] += customer.demand
+        self.distances[route] = self.tours[route].get_total_distance()
+        self.modified.add(route)
+        if self.route_index is not None:
+            self.route_index.update(route, self.tours[route])
+
+        remaining = np.flatnonzero(self.active)
+        if len(remaining) > 0:
+            self._fill_column(remaining, route)
@@ -0,0 +1,335 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Iterable, Iterator
+
+from cevrp.metrics import MetricsRegistry
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cost_memo import CostMemo, RouteCosts, SequenceHasher
+from cevrp.vnd.shadow_verification import ShadowVerifier
+
+
+# Same costs as Tour.get_costs_of_tour (summed in the same order, so the results are identical) and
+# the constraints of ConstraintValidationStrategy, computed in a single pass over any node sequence.
+# The sequence can be a lazy view on a modified tour, so candidates are never materialized.
+def evaluate_route_costs(nodes: Iterable[Node], vehicle: Vehicle, battery_threshold: float) -> RouteCosts:
+    battery = vehicle.battery
+    capacity = battery.capacity
+    consumption_rate = battery.consumption_rate
+    charging_rate = battery.charging_rate
+
+    iterator = iter(nodes)
+    previous = next(iterator, None)
+    if previous is None:
+        return RouteCosts(0, 0, 0, 0, 0, True)
+
+    battery_level = capacity
+    distance = 0
+    recharging = 0
+    service_time = previous.service_time
+    demand = previous.demand
+    edges_feasible = True
+    for node in iterator:
+        edge_distance = previous - node
+        distance += abs(edge_distance)
+        charge = edge_distance * consumption_rate
+        edges_feasible = edges_feasible and charge <= battery_threshold
+        battery_level -= charge
+        if battery_level < battery_threshold:
+            recharging += (capacity - battery_level) / charging_rate
+            battery_level = capacity
+        service_time += node.service_time
+        demand += node.demand
+        previous = node
+
+    feasible = edges_feasible and demand <= vehicle.commodity_capacity and distance <= vehicle.distance_threshold
+    return RouteCosts(distance, recharging, service_time, demand, distance + recharging + service_time + demand,
+                      feasible)
+
+
+def evaluate_route(nodes: Iterable[Node], vehicle: Vehicle, battery_threshold: float) -> tuple[float, bool]:
+    costs = evaluate_route_costs(nodes, vehicle, battery_threshold)
+    return costs.total, costs.feasible
+
+
+# A move only describes a modification: operator, routes (indices into a list of tours) and positions.
+# pieces() describes every modified route as pieces (route, start, stop) of the current routes,
+# sequences() yields lazy views on them. edge_changes() yields the edges every modified route gains
+# and loses (edges inside moved segments keep their orientation and cancel out).
+# apply() performs the modification in place and is only called once a move has been accepted.
+class Move(ABC):
+    routes: tuple[int, ...] = ()
+
+    @abstractmethod
+    def pieces(self, tours: list[Tour]) -> Iterator[tuple[int, tuple[tuple[int, int, int], ...]]]:
+        pass
+
+    def sequences(self, tours: list[Tour]) -> Iterator[tuple[int, Iterable[Node]]]:
+        for route, pieces in self.pieces(tours):
+            yield route, chain.from_iterable(islice(tours[r].nodes, start, stop) for r, start, stop in pieces)
+
+    @abstractmethod
+    def edge_changes(self, tours: list[Tour]) -> Iterator[tuple[int, tuple, tuple]]:
+        pass
+
+    def new_edges(self, tours: list[Tour]) -> Iterator[tuple[Node, Node]]:
+        for _, added, _ in self.edge_changes(tours):
+            yield from added
+
+    @abstractmethod
+    def apply(self, tours: list[Tour]):
+        pass
+
+
+# Exchanges the customers at positions i < j of one route. This is what two_opt_move does when it
+# swaps the inner nodes of two 2-node sections (a1 b1 ... a2 b2 -> a1 a2 ... b1 b2).
+@dataclass(slots=True)
+class SwapMove(Move):
+    route: int
+    i: int
+    j: int
+
+    @property
+    def routes(self):
+        return self.route,
+
+    def pieces(self, tours):
+        route, i, j = self.route, self.i, self.j
+        yield route, ((route, 0, i), (route, j, j + 1), (route, i + 1, j), (route, i, i + 1),
+                      (route, j + 1, len(tours[route])))
+
+    def edge_changes(self, tours):
+        nodes = tours[self.route].nodes
+        i, j = self.i, self.j
+        if j == i + 1:
+            yield self.route, ((nodes[i - 1], nodes[j]), (nodes[j], nodes[i]), (nodes[i], nodes[j + 1])), \
+                ((nodes[i - 1], nodes[i]), (nodes[i], nodes[j]), (nodes[j], nodes[j + 1]))
+        else:
+            yield self.route, ((nodes[i - 1], nodes[j]), (nodes[j], nodes[i + 1]),
+                               (nodes[j - 1], nodes[i]), (nodes[i], nodes[j + 1])), \
+                ((nodes[i - 1], nodes[i]), (nodes[i], nodes[i + 1]), (nodes[j - 1], nodes[j]), (nodes[j], nodes[j + 1]))
+
+    def apply(self, tours):
+        tour = tours[self.route]
+        tour.nodes[self.i], tour.nodes[self.j] = tour.nodes[self.j], tour.nodes[self.i]
+
+
+# Exchanges the segments [start_1, stop_1) of route_1 and [start_2, stop_2) of route_2.
+@dataclass(slots=True)
+class CrossExchangeMove(Move):
+    route_1: int
+    start_1: int
+    stop_1: int
+    route_2: int
+    start_2: int
+    stop_2: int
+
+    @property
+    def routes(self):
+        return self.route_1, self.route_2
+
+    def pieces(self, tours):
+        route_1, route_2 = self.route_1, self.route_2
+        yield route_1, ((route_1, 0, self.start_1), (route_2, self.start_2, self.stop_2),
+                        (route_1, self.stop_1, len(tours[route_1])))
+        yield route_2, ((route_2, 0, self.start_2), (route_1, self.start_1, self.stop_1),
+                        (route_2, self.stop_2, len(tours[route_2])))
+
+    def edge_changes(self, tours):
+        nodes_1, nodes_2 = tours[self.route_1].nodes, tours[self.route_2].nodes
+        start_1, stop_1, start_2, stop_2 = self.start_1, self.stop_1, self.start_2, self.stop_2
+        yield self.route_1, ((nodes_1[start_1 - 1], nodes_2[start_2]), (nodes_2[stop_2 - 1], nodes_1[stop_1])), \
+            ((nodes_1[start_1 - 1], nodes_1[start_1]), (nodes_1[stop_1 - 1], nodes_1[stop_1]))
+        yield self.route_2, ((nodes_2[start_2 - 1], nodes_1[start_1]), (nodes_1[stop_1 - 1], nodes_2[stop_2])), \
+            ((nodes_2[start_2 - 1], nodes_2[start_2]), (nodes_2[stop_2 - 1], nodes_2[stop_2]))
+
+    def apply(self, tours):
+        nodes_1, nodes_2 = tours[self.route_1].nodes, tours[self.route_2].nodes
+        nodes_1[self.start_1:self.stop_1], nodes_2[self.start_2:self.stop_2] = \
+            nodes_2[self.start_2:self.stop_2], nodes_1[self.start_1:self.stop_1]
+
+
+# Exchanges the customer at position_1 of route_1 with the one at position_2 of route_2, which is
+# the effect of two_lambda_interchange on the edges (a1, b1) and (a2, b2): b1 and a2 change places.
+@dataclass(slots=True)
+class TwoLambdaMove(Move):
+    route_1: int
+    position_1: int
+    route_2: int
+    position_2: int
+
+    @property
+    def routes(self):
+        return self.route_1, self.route_2
+
+    def pieces(self, tours):
+        route_1, route_2 = self.route_1, self.route_2
+        p1, p2 = self.position_1, self.position_2
+        yield route_1, ((route_1, 0, p1), (route_2, p2, p2 + 1), (route_1, p1 + 1, len(tours[route_1])))
+        yield route_2, ((route_2, 0, p2), (route_1, p1, p1 + 1), (route_2, p2 + 1, len(tours[route_2])))
+
+    def edge_changes(self, tours):
+        nodes_1, nodes_2 = tours[self.route_1].nodes, tours[self.route_2].nodes
+        p1, p2 = self.position_1, self.position_2
+        yield self.route_1, ((nodes_1[p1 - 1], nodes_2[p2]), (nodes_2[p2], nodes_1[p1 + 1])), \
+            ((nodes_1[p1 - 1], nodes_1[p1]), (nodes_1[p1], nodes_1[p1 + 1]))
+        yield self.route_2, ((nodes_2[p2 - 1], nodes_1[p1]), (nodes_1[p1], nodes_2[p2 + 1])), \
+            ((nodes_2[p2 - 1], nodes_2[p2]), (nodes_2[p2], nodes_2[p2 + 1]))
+
+    def apply(self, tours):
+        nodes_1, nodes_2 = tours[self.route_1].nodes, tours[self.route_2].nodes
+        p1, p2 = self.position_1, self.position_2
+        nodes_1[p1], nodes_2[p2] = nodes_2[p2], nodes_1[p1]
+
+
+# Evaluates moves as cost delta against cached route costs. Moves creating a battery-infeasible
+# edge are rejected by a feasible-edge lookup before the routes are traversed. With a memo, the
+# candidate routes are hashed from the prefix hashes of the current routes and only sequences that
+# were never costed before are traversed.
+# With prune, moves whose lower bound on the cost change (see lower_bound) cannot be negative are
+# rejected without simulating the battery. They are reported with the bound as delta and None as
+# feasibility: such a move does not improve, whether it is feasible is unknown.
+# With a verifier, a sample of cached route costs, memo hits and move evaluations is recomputed with
+# the reference implementation (see ShadowVerifier).
+class MoveEvaluator:
+    def __init__(self, vehicle: Vehicle, battery_threshold: float, feasible_edges=None,
+                 memo: CostMemo | None = None, hasher: SequenceHasher | None = None, prune: bool = True,
+                 verifier: ShadowVerifier | None = None):
+        self.vehicle = vehicle
+        self.battery_threshold = battery_threshold
+        self.feasible_edges = feasible_edges
+        self.memo = memo
+        self.hasher = hasher if hasher is not None or memo is None else SequenceHasher()
+        self.prune = prune
+        self.verifier = verifier
+        self.evaluations = 0
+        self.pruned = 0
+        self._route_costs: dict[Tour, RouteCosts] = {}
+        self._prefix_hashes: dict[Tour, list[int]] = {}
+
+        battery = vehicle.battery
+        # energy that can be consumed after the last recharge without going below the threshold
+        self._reserve = max(0, battery.capacity - battery_threshold)
+        self._consumption_rate = battery.consumption_rate
+        self._charging_rate = battery.charging_rate
+
+    def route_costs(self, tour: Tour) -> RouteCosts:
+        costs = self._route_costs.get(tour)
+        if costs is None:
+            costs = self._route_costs[tour] = evaluate_route_costs(tour.nodes, self.vehicle, self.battery_threshold)
+        elif self.verifier is not None and self.verifier.sample():
+            self.verifier.check_route('route_cache', tour.nodes, costs, self.vehicle, self.battery_threshold)
+        return costs
+
+    def route_cost(self, tour: Tour) -> float:
+        return self.route_costs(tour).total
+
+    def _prefix(self, tour: Tour) -> list[int]:
+        prefix = self._prefix_hashes.get(tour)
+        if prefix is None:
+            prefix = self._prefix_hashes[tour] = self.hasher.prefix_hashes(tour.nodes)
+        return prefix
+
+    def candidate_costs(self, tours: list[Tour], pieces) -> RouteCosts:
+        if self.memo is None:
+            sequence = chain.from_iterable(islice(tours[r].nodes, start, stop) for r, start, stop in pieces)
+            return evaluate_route_costs(sequence, self.vehicle, self.battery_threshold)
+
+        hasher = self.hasher
+        key = hasher.combine((hasher.piece_hash(self._prefix(tours[r]), start, stop), stop - start)
+                             for r, start, stop in pieces)
+        costs = self.memo.get(key)
+        if costs is None:
+            sequence = chain.from_iterable(islice(tours[r].nodes, start, stop) for r, start, stop in pieces)
+            costs = evaluate_route_costs(sequence, self.vehicle, self.battery_threshold)
+            self.memo.put(key, costs)
+        elif self.verifier is not None and self.verifier.sample():
+            sequence = chain.from_iterable(islice(tours[r].nodes, start, stop) for r, start, stop in pieces)
+            self.verifier.check_route('memo', sequence, costs, self.vehicle, self.battery_threshold,
+                                      {'key': key, 'pieces': pieces})
+        return costs
+
+    # Service times and demands only move between the routes of a move, so their sum does not change.
+    # The new distance of a route follows from the edges it gains and loses. After the last recharge the
+    # battery ends at or above the threshold, so at least distance * consumption_rate - reserve energy is
+    # recharged on a route, which bounds the recharging costs from below.
+    def lower_bound(self, move: Move, tours: list[Tour]) -> float:
+        consumption_rate, charging_rate, reserve = self._consumption_rate, self._charging_rate, self._reserve
+        bound = 0
+        for route, added, removed in move.edge_changes(tours):
+            current = self.route_costs(tours[route])
+            distance = current.distance
+            for a, b in added:
+                distance += a - b
+            for a, b in removed:
+                distance -= a - b
+            recharging = max(0, distance * consumption_rate - reserve) / charging_rate
+            bound += distance + recharging - current.distance - current.battery_recharging
+        return bound
+
+    def evaluate(self, move: Move, tours: list[Tour]) -> tuple[float, bool | None]:
+        verifier = self.verifier
+        if verifier is None:
+            return self._evaluate(move, tours)[:2]
+        delta, feasible, kind = self._evaluate(move, tours)
+        if verifier.sample():
+            verifier.check_move(kind, move, tours, delta, feasible, self.vehicle, self.battery_threshold)
+        return delta, feasible
+
+    # delta, feasible and the path that decided: edges, bound or delta
+    def _evaluate(self, move: Move, tours: list[Tour]) -> tuple[float, bool | None, str]:
+        feasible_edges = self.feasible_edges
+        if feasible_edges is not None and not all(feasible_edges.is_feasible(a, b) for a, b in move.new_edges(tours)):
+            return float('inf'), False, 'edges'
+
+        if self.prune:
+            bound = self.lower_bound(move, tours)
+            # the bound is summed in a different order than the costs, leave room for rounding
+            if bound > 1e-9 * (1 + abs(bound)):
+                self.pruned += 1
+                return bound, None, 'bound'
+
+        self.evaluations += 1
+        delta = 0
+        feasible = True
+        for route, pieces in move.pieces(tours):
+            costs = self.candidate_costs(tours, pieces)
+            delta += costs.total - self.route_cost(tours[route])
+            feasible = feasible and costs.feasible
+        return delta, feasible, 'delta'
+
+    # Evaluator for another thread. It shares configuration, memo and verifier and starts with a copy of
+    # the route caches, so threads never write to the same cache.
+    def fork(self) -> 'MoveEvaluator':
+        fork = MoveEvaluator(self.vehicle, self.battery_threshold, self.feasible_edges, self.memo, self.hasher,
+                             self.prune, self.verifier)
+        fork._route_costs = dict(self._route_costs)
+        fork._prefix_hashes = dict(self._prefix_hashes)
+        return fork
+
+    # takes over counters and caches of a fork, the tours must not have changed since fork()
+    def join(self, fork: 'MoveEvaluator'):
+        self.evaluations += fork.evaluations
+        self.pruned += fork.pruned
+        self._route_costs.update(fork._route_costs)
+        self._prefix_hashes.update(fork._prefix_hashes)
+
+    def apply(self, move: Move, tours: list[Tour]):
+        move.apply(tours)
+        for route in move.routes:
+            tour = tours[route]
+            tour.total_demand = tour.get_total_demand()
+            self.forget(tour)
+
+    # drops the cached costs of a tour that was modified or replaced
+    def forget(self, tour: Tour):
+        self._route_costs.pop(tour, None)
+        self._prefix_hashes.pop(tour, None)
+
+    def report(self, metrics: MetricsRegistry):
+        metrics.increment('move_evaluations', self.evaluations)
+        metrics.increment('lower_bound_pruned', self.pruned)
+        examined = self.evaluations + self.pruned
+        metrics.set_gauge('lower_bound_prune_rate', self.pruned / examined if examined > 0 else 0.0)
@@ -16,7 +16,8 @@ class NeighborhoodData:
             tour_1_section_indices=None,
             tour_2_section_indices=None,
             tour_1_section_nodes=None,
-            tour_2_section_nodes=None
+            tour_2_section_nodes=None,
+            feasible_edges=None,
     ):
         self.tour_1 = tour1
         self.tour_2 = tour2
@@ -34,34 +35,7 @@ class NeighborhoodData:
         self.vehicle = vehicle
         self.battery_threshold = battery_threshold
         self.savings_calc = savings_calc
+        self.feasible_edges = feasible_edges
 
     def calculate_savings(self, old_tour: Tour, modified_tour: Tour):
         return self.savings_calc(old_tour, modified_tour, self.vehicle, self.battery_threshold)
-
-    def apply_and_swap_on_savings(
-            self,
-            slice_1: slice | tuple,
-            slice_2: slice | tuple,
-            tour_1_modification,
-            tour_2_modification
-    ):
-        tour_1_modified = self.tour_1.get_manual_copy()
-        tour_2_modified = self.tour_2.get_manual_copy()
-
-        if isinstance(slice_1, slice):
-            tour_1_modified.slice_replace(slice_1, tour_1_modification)
-        else:
-            tour_1_modified.list_replace(slice_1, tour_1_modification)
-
-        if isinstance(slice_2, slice):
-            tour_2_modified.slice_replace(slice_2, tour_2_modification)
-        else:
-            tour_2_modified.list_replace(slice_2, tour_2_modification)
-
-        savings_1 = self.calculate_savings(self.tour_1, tour_1_modified)
-        savings_2 = self.calculate_savings(self.tour_2, tour_2_modified)
-        if savings_1 + savings_2 > 0:
-            self.tour_1 = tour_1_modified
-            self.tour_2 = tour_2_modified
-
-        return self.tour_1, self.tour_2
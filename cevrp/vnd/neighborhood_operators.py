@@ -1,15 +1,17 @@
-from enum import Enum
-from typing import Callable
+from enum import Enum, member
 import time
 import random
 
-from cevrp.constraints import Constraints, ConstraintValidationStrategy
-from cevrp.cost_types import CostTypes
+from cevrp.metrics import OperatorMetrics
+from cevrp.node import Node
 from cevrp.tour import Tour
 from cevrp.tour_plan import TourPlan
 from cevrp.vehicle import Vehicle
 
+from cevrp.vnd.insertion import RegretInsertion
+from cevrp.vnd.moves import CrossExchangeMove, Move, MoveEvaluator, SwapMove, TwoLambdaMove
 from cevrp.vnd.neighborhood_data import NeighborhoodData
+from cevrp.vnd.route_index import RouteIndex
 
 
 def time_convert(sec):
@@ -20,117 +22,90 @@ def time_convert(sec):
     return "{0}:{1}:{2}".format(int(hours), int(minutes), sec)
 
 
-def exchange_and_apply_on_savings_different_cardinalities(tour_1, tour_2, sub_2, subtour_1_index_slice,
-                                                          subtour_2_index_slice, calc_savings, skip_savings=False):
-    tour_1_modified = tour_1.get_manual_copy()
-    tour_2_modified = tour_2.get_manual_copy()
-
-    overridden = tour_1_modified[subtour_1_index_slice]
-    tour_1_modified.slice_replace(subtour_1_index_slice, sub_2)
-    tour_1_modified.remove(overridden[len(sub_2):])
-    tour_2_modified.slice_replace(subtour_2_index_slice, overridden)
-    rest = len(overridden) - subtour_2_index_slice.stop + subtour_2_index_slice.start
-    overridden = overridden[len(overridden) - rest:]
-    for r in range(rest):
-        tour_2_modified.nodes.insert(subtour_2_index_slice.stop + r, overridden[r])
-
-    savings_1 = calc_savings(tour_1, tour_1_modified)
-    savings_2 = calc_savings(tour_2, tour_2_modified)
-
-    if savings_1 + savings_2 > 0 or skip_savings:
-        tour_1 = tour_1_modified
-        tour_2 = tour_2_modified
-
-    return tour_1, tour_2
-
-
 class NeighborhoodOperatorsImpl:
     # INTER-ROUTE-EXCHANGE
+    # The operators build a move descriptor, evaluate it without copying the tours and only apply
+    # it (in place) if it saves costs.
     @staticmethod
     def cross_exchange(data: NeighborhoodData, skip_savings=False):
-        subtour_2_index_slice = data.tour_2.get_index_slice_of_node_chain(Tour(data.tour_2_section_nodes))
+        if len(data.tour_1_section_nodes) == 1 and len(data.tour_2_section_nodes) == 1:
+            raise ValueError('Subtours MUST NOT both have cardinality one.')
         subtour_1_index_slice = data.tour_1.get_index_slice_of_node_chain(Tour(data.tour_1_section_nodes))
+        subtour_2_index_slice = data.tour_2.get_index_slice_of_node_chain(Tour(data.tour_2_section_nodes))
 
-        if len(data.tour_1_section_nodes) > len(data.tour_2_section_nodes):
-            return exchange_and_apply_on_savings_different_cardinalities(
-                data.tour_1,
-                data.tour_2,
-                data.tour_2_section_nodes,
-                subtour_1_index_slice,
-                subtour_2_index_slice,
-                data.calculate_savings,
-                skip_savings
-            )
-        if len(data.tour_2_section_nodes) > len(data.tour_1_section_nodes):
-            return exchange_and_apply_on_savings_different_cardinalities(
-                data.tour_2,
-                data.tour_1,
-                data.tour_1_section_nodes,
-                subtour_2_index_slice,
-                subtour_1_index_slice,
-                data.calculate_savings,
-                skip_savings
-            )
-        else:
-            return data.apply_and_swap_on_savings(
-                subtour_1_index_slice,
-                subtour_2_index_slice,
-                data.tour_2_section_nodes,
-                data.tour_1_section_nodes,
-            )
+        tours = [data.tour_1, data.tour_2]
+        move = CrossExchangeMove(0, subtour_1_index_slice.start, subtour_1_index_slice.stop,
+                                 1, subtour_2_index_slice.start, subtour_2_index_slice.stop)
+        return NeighborhoodOperatorsImpl._apply_on_savings(data, move, tours, skip_savings)
 
     @staticmethod
     def two_lambda_interchange(data: NeighborhoodData) -> tuple[Tour, Tour]:
         tour_1_edge_indices: tuple = data.tour_1_section_indices
         tour_2_edge_indices: tuple = data.tour_2_section_indices
-        tour_1 = data.tour_1
-        tour_2 = data.tour_2
         if len(tour_1_edge_indices + tour_2_edge_indices) != 4:
             raise ValueError('Subtour MUST only coincide with two nodes.')
 
-        return data.apply_and_swap_on_savings(
-            tour_1_edge_indices,
-            tour_2_edge_indices,
-            (tour_1[tour_1_edge_indices[0]], tour_2[tour_2_edge_indices[0]]),
-            (tour_1[tour_1_edge_indices[1]], tour_2[tour_2_edge_indices[1]])
-        )
+        # (a1, b1), (a2, b2) -> (a1, a2), (b1, b2): b1 and a2 change places
+        tours = [data.tour_1, data.tour_2]
+        move = TwoLambdaMove(0, tour_1_edge_indices[1], 1, tour_2_edge_indices[0])
+        return NeighborhoodOperatorsImpl._apply_on_savings(data, move, tours)
+
+    @staticmethod
+    def _apply_on_savings(data: NeighborhoodData, move: Move, tours: list[Tour], skip_savings=False):
+        evaluator = MoveEvaluator(data.vehicle, data.battery_threshold, data.feasible_edges)
+        delta, feasible = evaluator.evaluate(move, tours)
+        if skip_savings or (feasible and delta < 0):
+            evaluator.apply(move, tours)
+        return data.tour_1, data.tour_2
 
     # INTRA-ROUTE-EXCHANGE
+    # swaps the inner nodes of two random 2-node sections (a1 b1 ... a2 b2 -> a1 a2 ... b1 b2), i.e. the
+    # customers at two random positions, and applies the first improving feasible swap in place
     @staticmethod
     def two_opt_move(
             tour: Tour,
             reference_vehicle: Vehicle,
             battery_threshold: float,
-            savings_calc: Callable[[Tour, Tour, Vehicle, float], float | int],
-            iterations: int = 5):
-        altered_tour = Tour([])
+            iterations: int = 5,
+            feasible_edges=None,
+            evaluator: MoveEvaluator | None = None,
+            operator_metrics: OperatorMetrics | None = None,
+            rng=random):
+        # every evaluated swap is an attempt, applied swaps are accepted, swaps rejected by the lower bound are pruned
+        # at least two customers are needed for a swap
+        if len(tour) < 4:
+            return tour
+        if evaluator is None:
+            evaluator = MoveEvaluator(reference_vehicle, battery_threshold, feasible_edges)
+
+        tours = [tour]
+        last_section = len(tour) - 2
+        max_samples = len(tour) ** 2
         for _ in range(iterations):
             better_solution_found = False
             timeout = time.time() + 1
-            while not better_solution_found and time.time() <= timeout:
-                sub_tour_1, sub_tour_2 = NeighborhoodOperatorsImpl.get_random_tour_sections(tour, 2)
-                indices_1, indices_2 = tour.get_indices_of(sub_tour_1), tour.get_indices_of(sub_tour_2)
-
-                # swap nodes of sub_tour_1 (a1, b1) and sub_tour_2 (a2, b2)
-                # so that they result in new_sub_1 (a1,a2) and new_sub_2 (b1, b2)
-                new_sub_1, new_sub_2 = sub_tour_1.get_manual_copy(), sub_tour_2.get_manual_copy()
-                if sum(indices_1) < sum(indices_2):
-                    new_sub_1.slice_replace(slice(0, 2), (sub_tour_1[0], sub_tour_2[0]))
-                    new_sub_2.slice_replace(slice(0, 2), (sub_tour_1[1], sub_tour_2[1]))
-                else:
-                    new_sub_1.slice_replace(slice(0, 2), (sub_tour_2[1], sub_tour_1[1]))
-                    new_sub_2.slice_replace(slice(0, 2), (sub_tour_2[0], sub_tour_1[0]))
-
-                altered_tour = tour.get_manual_copy()
-                altered_tour.list_replace_with_tour(indices_1, new_sub_1)
-                altered_tour.list_replace_with_tour(indices_2, new_sub_2)
-
-                saving = savings_calc(tour, altered_tour, reference_vehicle, battery_threshold)
-                if saving > 0:
+            samples = 0
+            while not better_solution_found and samples < max_samples and time.time() <= timeout:
+                samples += 1
+                r1 = rng.randint(0, last_section)
+                r2 = rng.randint(0, last_section)
+                if abs(r1 - r2) < 2:
+                    # same or overlapping sections, the swap would not change the tour
+                    continue
+
+                move = SwapMove(0, min(r1, r2) + 1, max(r1, r2))
+                delta, feasible = evaluator.evaluate(move, tours)
+                if operator_metrics is not None:
+                    operator_metrics.attempts += 1
+                    operator_metrics.feasible += feasible is True
+                    operator_metrics.pruned += feasible is None
+                if feasible and delta < 0:
+                    evaluator.apply(move, tours)
                     better_solution_found = True
+                    if operator_metrics is not None:
+                        operator_metrics.accepted += 1
             if not better_solution_found:  # ==> ABORTED via time-out
                 break
-            tour = altered_tour
         return tour
 
     @staticmethod
@@ -145,38 +120,17 @@ class NeighborhoodOperatorsImpl:
         return tour_1_section, tour_2_section
 
     @staticmethod
-    def sequential_insertion(runner_client_nodes: list[Tour], tours: TourPlan | list[Tour], vehicle, battery_threshold):
-        tours_copied = tours.get_manual_copy()
-
-        for tour in tours_copied:
-            if len(runner_client_nodes) == 0:
-                return runner_client_nodes, tours_copied
-            runner_to_node_tours: list[Tour] = []
-
-            for node in tour[1:-1]:
-                runner_to_node_tours = [
-                    Tour([runner, node])
-                    for runner
-                    in runner_client_nodes
-                ]
-            runner_to_node_tours.sort(key=lambda x: x.get_costs_of_tour(vehicle, battery_threshold)[CostTypes.TOTAL])
-
-            for runner_to_node in runner_to_node_tours:
-
-                copied = tour.get_manual_copy()
-                copied.nodes.insert(copied.nodes.index(runner_to_node[1]), runner_to_node[0])
-
-                if all(ConstraintValidationStrategy(
-                    constraint.value,
-                    copied,
-                    vehicle,
-                    battery_threshold
-                ).is_valid() for constraint in Constraints):
-                    tours_copied[tour] = copied
-                    tour = copied
-                    runner_client_nodes.remove(runner_to_node[0])
-
-        return runner_client_nodes, tours_copied
+    def sequential_insertion(
+            runner_client_nodes: list[Node],
+            tours: TourPlan | list[Tour],
+            vehicle,
+            battery_threshold,
+            regret_k: int = 2,
+            route_index: RouteIndex | None = None,
+    ):
+        engine = RegretInsertion(list(tours), vehicle, battery_threshold, regret_k, route_index)
+        remaining_runner_clients = engine.insert(runner_client_nodes)
+        return remaining_runner_clients, TourPlan(engine.tours)
 
     @classmethod
     def get_random_tour_section(cls, tour, subtour_length):
@@ -187,10 +141,15 @@ class NeighborhoodOperatorsImpl:
 
 
 class NeighborhoodOperators(Enum):
-    TWO_OPT_MOVE = NeighborhoodOperatorsImpl.two_opt_move
-    CROSS_EXCHANGE = NeighborhoodOperatorsImpl.cross_exchange
-    TWO_LAMBDA_INTERCHANGE = NeighborhoodOperatorsImpl.two_lambda_interchange
-    SEQUENTIAL_INSERTION = NeighborhoodOperatorsImpl.sequential_insertion
+    # functions are wrapped in member() as they would otherwise become methods instead of enum members
+    TWO_OPT_MOVE = member(NeighborhoodOperatorsImpl.two_opt_move)
+    CROSS_EXCHANGE = member(NeighborhoodOperatorsImpl.cross_exchange)
+    TWO_LAMBDA_INTERCHANGE = member(NeighborhoodOperatorsImpl.two_lambda_interchange)
+    SEQUENTIAL_INSERTION = member(NeighborhoodOperatorsImpl.sequential_insertion)
 
     def __call__(self, *args, **kwargs):
-        self.value(*args, **kwargs)
+        return self.value(*args, **kwargs)
+
+    @property
+    def key(self) -> str:
+        return self.name.lower()
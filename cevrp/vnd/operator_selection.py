@@ -0,0 +1,96 @@
+import random
+
+from cevrp.metrics import MetricsRegistry
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+
+
+# ALNS-style roulette wheel over the NeighborhoodOperators registry. Selection is organized in segments
+# of segment_length applications. At the end of a segment the weight of every operator used in it moves
+# towards its score, the improvement it achieved per CPU second normalized by the best score of the
+# segment: w = (1 - reaction) * w + reaction * score. Weights never drop below min_weight, so operators
+# that stopped paying off still get tried now and then. The selection has its own random generator,
+# a fixed seed makes the sequence of selected operators reproducible.
+class AdaptiveOperatorSelection:
+    # sequential insertion is a repair step for unassigned customers, not an improvement operator
+    DEFAULT_OPERATORS = (
+        NeighborhoodOperators.TWO_OPT_MOVE,
+        NeighborhoodOperators.CROSS_EXCHANGE,
+        NeighborhoodOperators.TWO_LAMBDA_INTERCHANGE,
+    )
+
+    def __init__(
+            self,
+            operators: list[NeighborhoodOperators] | None = None,
+            reaction: float = 0.3,
+            segment_length: int = 10,
+            min_weight: float = 0.05,
+            max_idle: int = 30,
+            seed: int | None = None,
+    ):
+        if not 0 < reaction <= 1:
+            raise ValueError('reaction MUST be in (0, 1].')
+        self.operators = list(operators or AdaptiveOperatorSelection.DEFAULT_OPERATORS)
+        self.reaction = reaction
+        self.segment_length = segment_length
+        self.min_weight = min_weight
+        # applications in a row without improvement after which the search counts as converged
+        self.max_idle = max_idle
+        self.random = random.Random(seed)
+
+        self.weights = {operator: 1.0 for operator in self.operators}
+        self.selections = {operator: 0 for operator in self.operators}
+        self.improvement = {operator: 0.0 for operator in self.operators}
+        self.cpu_seconds = {operator: 0.0 for operator in self.operators}
+        self.idle = 0
+        self._segment = {}
+        self._segment_applications = 0
+
+    def select(self) -> NeighborhoodOperators:
+        operator = self.random.choices(self.operators, weights=[self.weights[o] for o in self.operators])[0]
+        self.selections[operator] += 1
+        return operator
+
+    def update(self, operator: NeighborhoodOperators, improvement: float, cpu_seconds: float):
+        self.improvement[operator] += improvement
+        self.cpu_seconds[operator] += cpu_seconds
+        self.idle = 0 if improvement > 0 else self.idle + 1
+
+        segment_improvement, segment_seconds = self._segment.get(operator, (0.0, 0.0))
+        self._segment[operator] = (segment_improvement + improvement, segment_seconds + cpu_seconds)
+        self._segment_applications += 1
+        if self._segment_applications >= self.segment_length:
+            self._end_segment()
+
+    def _end_segment(self):
+        # a process_time tick is coarse, zero durations count as one microsecond
+        scores = {operator: max(improvement, 0.0) / max(seconds, 1e-6)
+                  for operator, (improvement, seconds) in self._segment.items()}
+        best = max(scores.values(), default=0.0)
+        for operator, score in scores.items():
+            normalized = score / best if best > 0 else 0.0
+            weight = (1 - self.reaction) * self.weights[operator] + self.reaction * normalized
+            self.weights[operator] = max(self.min_weight, weight)
+        self._segment = {}
+        self._segment_applications = 0
+
+    @property
+    def converged(self) -> bool:
+        return self.idle >= self.max_idle
+
+    def report(self, metrics: MetricsRegistry):
+        for operator in self.operators:
+            metrics.set_gauge(f'selection_weight_{operator.key}', self.weights[operator])
+            metrics.set_gauge(f'selections_{operator.key}', self.selections[operator])
+
+    def to_dict(self) -> dict:
+        return {
+            operator.key: {
+                'weight': self.weights[operator],
+                'selections': self.selections[operator],
+                'improvement': self.improvement[operator],
+                'cpu_seconds': self.cpu_seconds[operator],
+                'improvement_per_cpu_second': self.improvement[operator] / self.cpu_seconds[operator]
+                if self.cpu_seconds[operator] > 0 else 0.0,
+            }
+            for operator in self.operators
+        }
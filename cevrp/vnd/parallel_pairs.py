@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from cevrp.metrics import OperatorMetrics
+from cevrp.tour import Tour
+from cevrp.vnd.moves import Move, MoveEvaluator
+
+# draws a move for the tour pair (i, j) from the given generator, None if there is none
+MoveDraw = Callable[[list[Tour], int, int, random.Random], Move | None]
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+# Splits ordered route pairs into batches in which every route occurs at most once (a greedy edge
+# coloring). Moves of one batch touch disjoint routes, so all their improvements can be applied.
+# Every pair goes to the first batch both routes are free in; the batches a route is in are kept as
+# bits of an int, the first free one is the lowest bit not set in either route.
+def disjoint_batches(pairs: list[tuple[int, int]]) -> list[list[tuple[int, int]]]:
+    batches: list[list[tuple[int, int]]] = []
+    used: dict[int, int] = {}
+    for i, j in pairs:
+        taken = used.get(i, 0) | used.get(j, 0)
+        free = (taken + 1) & ~taken
+        index = free.bit_length() - 1
+        if index == len(batches):
+            batches.append([])
+        batches[index].append((i, j))
+        used[i] = used.get(i, 0) | free
+        used[j] = used.get(j, 0) | free
+    return batches
+
+
+# Evaluates the tour pairs of a neighborhood round concurrently on a thread pool.
+# The pairs of a round are fixed up front and split into route-disjoint batches. A batch is cut into
+# chunks of chunk_size pairs; every chunk draws its moves from a random.Random seeded from rng (the global
+# generator by default) and evaluates them on a fork of the evaluator, so a round is reproducible under random.seed
+# whatever the number of workers and the thread schedule. Improving moves of a batch are applied by
+# the calling thread in pair order before the next batch is evaluated.
+# Workers only read the tours and write to their own fork; the memo, hasher and verifier they share are
+# locked. This lets the evaluation scale on free-threaded CPython (3.13t). With the GIL, threads do not
+# run the pure-Python evaluation in parallel; without an explicit number of workers the chunks then run
+# in the calling thread, which keeps the overhead to the batching.
+class ParallelPairSearch:
+    def __init__(self, workers: int | None = None, chunk_size: int = 16):
+        if workers is None:
+            workers = 1 if gil_enabled() else os.cpu_count() or 1
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='cevrp-pairs') if workers > 1 else None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _evaluate_chunk(draw: MoveDraw, pairs: list[tuple[int, int]], tours: list[Tour],
+                        evaluator: MoveEvaluator, seed: int) -> list[tuple[Move | None, float, bool | None, float]]:
+        generator = random.Random(seed)
+        outcomes = []
+        for i, j in pairs:
+            t_move = time.perf_counter()
+            move = draw(tours, i, j, generator)
+            if move is None:
+                outcomes.append((None, 0.0, False, time.perf_counter() - t_move))
+                continue
+            delta, feasible = evaluator.evaluate(move, tours)
+            outcomes.append((move, delta, feasible, time.perf_counter() - t_move))
+        return outcomes
+
+    # evaluates all pairs once and applies the improving moves, returns the number of accepted moves
+    def run(self, draw: MoveDraw, pairs: list[tuple[int, int]], tours: list[Tour], evaluator: MoveEvaluator,
+            operator_metrics: OperatorMetrics, on_applied: Callable[[Move], None] | None = None, rng=random) -> int:
+        accepted = 0
+        for batch in disjoint_batches(pairs):
+            chunks = [batch[k:k + self.chunk_size] for k in range(0, len(batch), self.chunk_size)]
+            seeds = [rng.getrandbits(64) for _ in chunks]
+            forks = [evaluator.fork() for _ in chunks]
+            if self._executor is None:
+                results = [ParallelPairSearch._evaluate_chunk(draw, chunk, tours, fork, seed)
+                           for chunk, fork, seed in zip(chunks, forks, seeds)]
+            else:
+                results = list(self._executor.map(ParallelPairSearch._evaluate_chunk,
+                                                  [draw] * len(chunks), chunks, [tours] * len(chunks), forks, seeds))
+            for fork in forks:
+                evaluator.join(fork)
+
+            for outcomes in results:
+                for move, delta, feasible, seconds in outcomes:
+                    operator_metrics.attempts += 1
+                    operator_metrics.seconds += seconds
+                    if not feasible:
+                        # None: pruned by the lower bound
+                        operator_metrics.pruned += feasible is None
+                        continue
+                    operator_metrics.feasible += 1
+                    if delta < 0:
+                        accepted += 1
+                        operator_metrics.accepted += 1
+                        operator_metrics.improvement -= delta
+                        evaluator.apply(move, tours)
+                        if on_applied is not None:
+                            on_applied(move)
+        return accepted
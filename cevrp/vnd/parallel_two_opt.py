@@ -0,0 +1,114 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.metrics import OperatorMetrics
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vnd.cost_memo import CostMemo
+from cevrp.vnd.moves import MoveEvaluator
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+from cevrp.vnd.worker_state import decode_tour, encode_tour, initialize_worker, node_positions, worker_state
+
+
+# Runs two_opt_move on every tour of the chunk. Returns per tour the improved sequence as positions
+# (None if unchanged) and the swap counts and CPU seconds spent on it.
+def _improve_tours(jobs: list[tuple[np.ndarray, int]], iterations: int) \
+        -> list[tuple[np.ndarray | None, OperatorMetrics]]:
+    state = worker_state()
+    vehicle, battery_threshold = state.vehicle, state.battery_threshold
+    results = []
+    for sequence, seed in jobs:
+        t_cpu = time.process_time()
+        tour = Tour(decode_tour(sequence, state.nodes))
+        tour_metrics = OperatorMetrics()
+        NeighborhoodOperators.TWO_OPT_MOVE(tour, vehicle, battery_threshold, iterations,
+                                           evaluator=MoveEvaluator(vehicle, battery_threshold,
+                                                                   state.feasible_edges, state.memo),
+                                           operator_metrics=tour_metrics, rng=random.Random(seed))
+        improved = encode_tour(tour.nodes, state.positions)
+        tour_metrics.cpu_seconds = time.process_time() - t_cpu
+        results.append((None if np.array_equal(improved, sequence) else improved, tour_metrics))
+    return results
+
+
+# Two-opt over all tours of a plan on a process pool. The workers receive the model's nodes, vehicle,
+# battery threshold and feasible edges once, when they start, and keep a cost memo of memo_entries
+# sequences each (0 disables it). Tours travel as int32 arrays of node positions, the
+# improved sequences come back the same way. Every tour is improved with a seed drawn from rng (the
+# global generator by default), so the result does not depend on the number of workers (as long as no tour runs into the
+# one-second timeout of two_opt_move). Tours are sent in chunks of about
+# len(tours) / (workers * chunks_per_worker) to amortize the inter-process round trips.
+# Tours with nodes the pool does not know (e.g. customers added after it was started) are improved
+# in the calling process.
+class ParallelTwoOpt:
+    def __init__(self, model: CEVRPModel, workers: int | None = None, chunks_per_worker: int = 4,
+                 memo_entries: int = 100_000):
+        self.nodes = list(model.nodes)
+        self.positions = node_positions(self.nodes)
+        self.vehicle = model.vehicles[0]
+        self.battery_threshold = model.battery_threshold
+        self.feasible_edges = model.feasible_edges
+        self.memo = CostMemo(memo_entries) if memo_entries > 0 else None
+        self.workers = workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+        self._executor = ProcessPoolExecutor(self.workers, initializer=initialize_worker,
+                                             initargs=(self.nodes, self.vehicle, self.battery_threshold,
+                                                       self.feasible_edges, True, memo_entries))
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _sequence(self, tour: Tour) -> np.ndarray | None:
+        if not all(node.node_id in self.positions for node in tour.nodes):
+            return None
+        return encode_tour(tour.nodes, self.positions)
+
+    # improved node lists (None for tours that did not change) and the swap counts and CPU seconds the
+    # workers spent on them, in the order of tours
+    def improve(self, tours: list[Tour], iterations: int = 100, rng=random) \
+            -> list[tuple[list[Node] | None, OperatorMetrics]]:
+        results: list[tuple[list[Node] | None, OperatorMetrics]] = [(None, OperatorMetrics()) for _ in tours]
+        jobs, routes = [], []
+        for route, tour in enumerate(tours):
+            seed = rng.getrandbits(32)
+            # at least two customers are needed for a swap
+            if len(tour) < 4:
+                continue
+            sequence = self._sequence(tour)
+            if sequence is None:
+                results[route] = self._improve_locally(tour, iterations, seed)
+                continue
+            jobs.append((sequence, seed))
+            routes.append(route)
+
+        chunk_size = max(1, math.ceil(len(jobs) / (self.workers * self.chunks_per_worker)))
+        chunks = [jobs[k:k + chunk_size] for k in range(0, len(jobs), chunk_size)]
+        outcomes = (outcome for chunk in self._executor.map(_improve_tours, chunks, repeat(iterations))
+                    for outcome in chunk)
+        for route, (sequence, tour_metrics) in zip(routes, outcomes):
+            results[route] = (None if sequence is None else decode_tour(sequence, self.nodes), tour_metrics)
+        return results
+
+    # CPU time of the calling process is not reported, callers measure it themselves
+    def _improve_locally(self, tour: Tour, iterations: int, seed: int) -> tuple[list[Node] | None, OperatorMetrics]:
+        improved = Tour(list(tour.nodes))
+        tour_metrics = OperatorMetrics()
+        NeighborhoodOperators.TWO_OPT_MOVE(improved, self.vehicle, self.battery_threshold, iterations,
+                                           evaluator=MoveEvaluator(self.vehicle, self.battery_threshold,
+                                                                   self.feasible_edges, self.memo),
+                                           operator_metrics=tour_metrics, rng=random.Random(seed))
+        changed = [n.node_id for n in improved] != [n.node_id for n in tour]
+        return (improved.nodes if changed else None), tour_metrics
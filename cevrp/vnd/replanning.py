@@ -0,0 +1,203 @@
+import time
+from dataclasses import dataclass, field
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.cost_types import CostTypes
+from cevrp.metrics import MetricsRegistry
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.tour_plan import TourPlan
+from cevrp.vnd.cevrp_optimizer import is_invalid
+from cevrp.vnd.insertion import RegretInsertion
+
+
+@dataclass
+class ReplanResult:
+    tour_plan: TourPlan
+    # customers for which not even a dedicated tour is feasible
+    unassigned: list[Node] = field(default_factory=list)
+    # customers taken out of their tour to repair a constraint violation and inserted again
+    ejected: list[Node] = field(default_factory=list)
+    affected_tours: int = 0
+    seconds: float = 0.0
+
+
+# Incremental re-planning for customers that are added to or removed from an existing plan.
+# Instead of re-clustering and re-running CWS and optimize_tours on a rebuilt model:
+#   1. removed customers are cut out of their tours,
+#   2. tours violating a constraint are repaired by ejecting customers,
+#   3. new and ejected customers are placed by cheapest feasible insertion, opening tours if needed,
+#   4. a time-bounded VNS (two-opt, relocate) runs on the tours touched by steps 1-3 only.
+def replan_tours(
+        tour_plan: TourPlan | list[Tour],
+        model: CEVRPModel,
+        added: list[Node] | None = None,
+        removed: list[Node | int] | None = None,
+        time_budget: float = 0.2,
+        metrics: MetricsRegistry | None = None,
+) -> ReplanResult:
+    if metrics is None:
+        metrics = MetricsRegistry()
+
+    with metrics.phase('replan'):
+        start = time.perf_counter()
+        deadline = start + time_budget
+        added = [] if added is None else list(added)
+        removed_ids = {n.node_id if isinstance(n, Node) else n for n in ([] if removed is None else removed)}
+
+        planned_ids = {n.node_id for t in tour_plan for n in t}
+        duplicates = [n.node_id for n in added if n.node_id in planned_ids - removed_ids]
+        if len(duplicates) > 0:
+            raise ValueError(f'Customers {duplicates} are already part of the tour plan.')
+
+        model.remove_customers(removed_ids)
+        model.add_customers(added)
+        vehicle = model.vehicles[0]
+        battery_threshold = model.battery_threshold
+        feasible_edges = model.feasible_edges
+        depot = model.depot
+
+        tours = []
+        affected = set()
+        for tour in tour_plan:
+            nodes = [n for n in tour if n.node_id not in removed_ids]
+            if len(nodes) <= 2:
+                continue
+            if len(nodes) < len(tour):
+                affected.add(len(tours))
+                tours.append(Tour(nodes))
+            else:
+                tours.append(tour)
+
+        ejected = []
+        for index, tour in enumerate(tours):
+            if is_invalid(tour, vehicle, battery_threshold, feasible_edges):
+                tours[index], tour_ejected = repair_tour(tour, vehicle, battery_threshold, feasible_edges)
+                ejected.extend(tour_ejected)
+                affected.add(index)
+        metrics.increment('replan_ejected', len(ejected))
+
+        engine = RegretInsertion(tours, vehicle, battery_threshold, k=1)
+        remaining = engine.insert(added + ejected)
+        tours = engine.tours
+        affected |= engine.modified
+
+        unassigned = []
+        while len(remaining) > 0:
+            tour = Tour([depot, remaining.pop(0), depot])
+            if is_invalid(tour, vehicle, battery_threshold, feasible_edges):
+                unassigned.append(tour[1])
+                continue
+            engine = RegretInsertion([tour], vehicle, battery_threshold, k=1)
+            remaining = engine.insert(remaining)
+            affected.add(len(tours))
+            tours.append(engine.tours[0])
+
+        affected = sorted(affected)
+        improved = local_search([tours[i] for i in affected], vehicle, battery_threshold, deadline, metrics,
+                                feasible_edges)
+        for index, tour in zip(affected, improved):
+            tours[index] = tour
+        tours = [t for t in tours if len(t) > 2]
+
+    return ReplanResult(TourPlan(tours), unassigned, ejected, len(affected), time.perf_counter() - start)
+
+
+def _removal_saving(nodes: list[Node], index: int) -> float:
+    return (nodes[index - 1] - nodes[index]) + (nodes[index] - nodes[index + 1]) - (nodes[index - 1] - nodes[index + 1])
+
+
+# Ejects the customer with the largest detour until the tour satisfies all constraints.
+# An empty tour (depot - depot) is always feasible, so the loop terminates.
+def repair_tour(tour: Tour, vehicle, battery_threshold, feasible_edges=None) -> tuple[Tour, list[Node]]:
+    nodes = list(tour.nodes)
+    ejected = []
+    while len(nodes) > 2 and is_invalid(Tour(nodes), vehicle, battery_threshold, feasible_edges):
+        index = max(range(1, len(nodes) - 1), key=lambda i: _removal_saving(nodes, i))
+        ejected.append(nodes.pop(index))
+    return Tour(nodes), ejected
+
+
+def _tour_cost(tour: Tour, vehicle, battery_threshold) -> float:
+    return tour.get_costs_of_tour(+vehicle, battery_threshold)[CostTypes.TOTAL]
+
+
+# First-improvement 2-opt: segment reversals are pre-filtered by their distance change and
+# accepted if the full tour costs (including recharging) decrease and the tour stays feasible.
+def two_opt_pass(tour: Tour, vehicle, battery_threshold, deadline: float, feasible_edges=None) -> Tour | None:
+    nodes = tour.nodes
+    cost = _tour_cost(tour, vehicle, battery_threshold)
+    for i in range(1, len(nodes) - 2):
+        for j in range(i + 1, len(nodes) - 1):
+            delta = (nodes[i - 1] - nodes[j]) + (nodes[i] - nodes[j + 1]) \
+                - (nodes[i - 1] - nodes[i]) - (nodes[j] - nodes[j + 1])
+            if delta >= -1e-9:
+                continue
+            if feasible_edges is not None and not (feasible_edges.is_feasible(nodes[i - 1], nodes[j])
+                                                   and feasible_edges.is_feasible(nodes[i], nodes[j + 1])):
+                continue
+            candidate = Tour(nodes[:i] + nodes[i:j + 1][::-1] + nodes[j + 1:])
+            if _tour_cost(candidate, vehicle, battery_threshold) < cost \
+                    and not is_invalid(candidate, vehicle, battery_threshold, feasible_edges):
+                return candidate
+        if time.perf_counter() > deadline:
+            break
+    return None
+
+
+# Moves one customer to its cheapest feasible position in another of the given tours.
+def relocate_pass(tours: list[Tour], vehicle, battery_threshold, deadline: float) -> bool:
+    for source in range(len(tours)):
+        for position in range(1, len(tours[source]) - 1):
+            if time.perf_counter() > deadline:
+                return False
+            nodes = tours[source].nodes
+            customer = nodes[position]
+            shortened = Tour(nodes[:position] + nodes[position + 1:])
+            targets = [t for i, t in enumerate(tours) if i != source]
+            engine = RegretInsertion(targets, vehicle, battery_threshold, k=1)
+            if len(engine.insert([customer])) > 0:
+                continue
+
+            target = engine.modified.pop()
+            target_index = target if target < source else target + 1
+            old_costs = _tour_cost(tours[source], vehicle, battery_threshold) \
+                + _tour_cost(tours[target_index], vehicle, battery_threshold)
+            new_costs = _tour_cost(shortened, vehicle, battery_threshold) \
+                + _tour_cost(engine.tours[target], vehicle, battery_threshold)
+            if new_costs < old_costs:
+                tours[source] = shortened
+                tours[target_index] = engine.tours[target]
+                return True
+    return False
+
+
+def local_search(tours: list[Tour], vehicle, battery_threshold, deadline: float,
+                 metrics: MetricsRegistry | None = None, feasible_edges=None) -> list[Tour]:
+    if metrics is None:
+        metrics = MetricsRegistry()
+    tours = list(tours)
+    two_opt_metrics = metrics.operator('replan_two_opt')
+    relocate_metrics = metrics.operator('replan_relocate')
+
+    neighborhood = 0
+    while neighborhood < 2 and time.perf_counter() < deadline:
+        t_move = time.perf_counter()
+        if neighborhood == 0:
+            improved = False
+            for index, tour in enumerate(tours):
+                two_opt_metrics.attempts += 1
+                candidate = two_opt_pass(tour, vehicle, battery_threshold, deadline, feasible_edges)
+                if candidate is not None:
+                    two_opt_metrics.accepted += 1
+                    tours[index] = candidate
+                    improved = True
+            two_opt_metrics.seconds += time.perf_counter() - t_move
+        else:
+            relocate_metrics.attempts += 1
+            improved = len(tours) > 1 and relocate_pass(tours, vehicle, battery_threshold, deadline)
+            relocate_metrics.accepted += int(improved)
+            relocate_metrics.seconds += time.perf_counter() - t_move
+
+        neighborhood = 0 if improved else neighborhood + 1
+    return tours
@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+import numpy as np
+
+from cevrp.tour import Tour
+
+
+# Uniform grid over the bounding boxes of the routes' customers (the depot is part of every route and
+# left out, otherwise all boxes would overlap). A route is registered in every cell its box, grown by
+# margin, touches. Two routes are partners if their boxes are at most margin apart, a customer is near
+# a route if it lies within margin of the route's box. Only routes sharing a cell are compared, which
+# keeps the pair enumeration near-linear in the number of routes for spatially spread routes.
+# Boxes only change for routes that are updated after a modification.
+class RouteIndex:
+    def __init__(self, tours: list[Tour], margin: float | None = None, cell_size: float | None = None):
+        self.boxes = np.full((len(tours), 4), np.nan)
+        for route, tour in enumerate(tours):
+            self.boxes[route] = RouteIndex.box(tour)
+
+        valid = self.boxes[~np.isnan(self.boxes[:, 0])]
+        extents = np.maximum(valid[:, 2] - valid[:, 0], valid[:, 3] - valid[:, 1]) if len(valid) else np.zeros(1)
+        typical_extent = float(np.median(extents)) if len(extents) else 0.0
+        self.margin = 0.5 * typical_extent if margin is None else margin
+        self.cell_size = cell_size or max(typical_extent + 2 * self.margin, 1e-9)
+
+        self._cells: dict[tuple[int, int], set[int]] = defaultdict(set)
+        self._route_cells: list[list[tuple[int, int]]] = [[] for _ in tours]
+        for route in range(len(tours)):
+            self._register(route)
+
+    @staticmethod
+    def box(tour: Tour) -> tuple[float, float, float, float]:
+        coordinates = [(n.x, n.y) for n in tour if n.node_id != 0]
+        if len(coordinates) == 0:
+            return np.nan, np.nan, np.nan, np.nan
+        xs, ys = zip(*coordinates)
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _register(self, route: int):
+        for cell in self._route_cells[route]:
+            self._cells[cell].discard(route)
+        min_x, min_y, max_x, max_y = self.boxes[route]
+        if np.isnan(min_x):
+            self._route_cells[route] = []
+            return
+        size, margin = self.cell_size, self.margin
+        x_cells = range(int(np.floor((min_x - margin) / size)), int(np.floor((max_x + margin) / size)) + 1)
+        y_cells = range(int(np.floor((min_y - margin) / size)), int(np.floor((max_y + margin) / size)) + 1)
+        cells = [(x, y) for x in x_cells for y in y_cells]
+        for cell in cells:
+            self._cells[cell].add(route)
+        self._route_cells[route] = cells
+
+    def update(self, route: int, tour: Tour):
+        self.boxes[route] = RouteIndex.box(tour)
+        self._register(route)
+
+    # same margin and cells for a new list of tours, e.g. after an insertion replaced tours
+    def rebuild(self, tours: list[Tour]) -> 'RouteIndex':
+        return RouteIndex(tours, self.margin, self.cell_size)
+
+    def _close(self, route_1: int, route_2: int) -> bool:
+        box_1, box_2 = self.boxes[route_1], self.boxes[route_2]
+        gap_x = max(box_1[0] - box_2[2], box_2[0] - box_1[2], 0)
+        gap_y = max(box_1[1] - box_2[3], box_2[1] - box_1[3], 0)
+        return gap_x <= self.margin and gap_y <= self.margin
+
+    def partners(self, route: int) -> list[int]:
+        candidates = set()
+        for cell in self._route_cells[route]:
+            candidates |= self._cells[cell]
+        candidates.discard(route)
+        return sorted(other for other in candidates if self._close(route, other))
+
+    def pairs(self) -> list[tuple[int, int]]:
+        return [(route, other) for route in range(len(self)) for other in self.partners(route)]
+
+    # customers (rows of coordinates) within margin of the route's box
+    def near(self, route: int, coordinates: np.ndarray) -> np.ndarray:
+        min_x, min_y, max_x, max_y = self.boxes[route]
+        if np.isnan(min_x):
+            return np.zeros(len(coordinates), dtype=bool)
+        margin = self.margin
+        return (coordinates[:, 0] >= min_x - margin) & (coordinates[:, 0] <= max_x + margin) \
+            & (coordinates[:, 1] >= min_y - margin) & (coordinates[:, 1] <= max_y + margin)
@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable
+
+import numpy as np
+
+from cevrp.cost_types import CostTypes
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+
+
+class SnapshotMode(Enum):
+    NONE = 'none'
+    FULL = 'full'
+    DELTA = 'delta'
+
+
+@dataclass
+class IterationRecord:
+    iteration: int
+    total_cost: float
+    average_tour_cost: float
+    visited_ratio: float
+    num_tours: int
+    operator_outcomes: dict[str, int] = field(default_factory=dict)
+
+
+# Streams per-iteration aggregates of a VNS run. Record k describes the tour plan after k iterations
+# and the outcomes of the operators in iteration k. Snapshots are node-id arrays, never Node copies.
+# Callers that already know the total costs of the tours (e.g. from a MoveEvaluator) pass them as
+# tour_costs, otherwise they are computed here.
+class RunHistory:
+    def __init__(
+            self,
+            num_nodes: int,
+            snapshot_mode: SnapshotMode = SnapshotMode.NONE,
+            on_record: Callable[[IterationRecord], None] | None = None,
+    ):
+        self.num_nodes = num_nodes
+        self.snapshot_mode = snapshot_mode
+        self.on_record = on_record
+        self.records: list[IterationRecord] = []
+        self.snapshots: dict[int, dict[int, np.ndarray]] = {}
+        self.tour_counts: dict[int, int] = {}
+        self._last_snapshot: list[np.ndarray] = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        yield from self.records
+
+    def record(
+            self,
+            iteration: int,
+            tours: list[Tour],
+            vehicle: Vehicle,
+            battery_threshold: float,
+            operator_outcomes: dict[str, int] | None = None,
+            tour_costs: list[float] | None = None,
+    ) -> IterationRecord:
+        if tour_costs is None:
+            tour_costs = [t.get_costs_of_tour(vehicle, battery_threshold)[CostTypes.TOTAL] for t in tours]
+        total_cost = sum(tour_costs)
+        visited_nodes = set(n.node_id for t in tours for n in t)
+
+        record = IterationRecord(
+            iteration=iteration,
+            total_cost=total_cost,
+            average_tour_cost=total_cost / len(tours) if len(tours) > 0 else 0.0,
+            visited_ratio=len(visited_nodes) / self.num_nodes * 100,
+            num_tours=len(tours),
+            operator_outcomes=dict(operator_outcomes or {}),
+        )
+        self.records.append(record)
+
+        if self.snapshot_mode != SnapshotMode.NONE:
+            self._store_snapshot(iteration, tours)
+        if self.on_record is not None:
+            self.on_record(record)
+        return record
+
+    def _store_snapshot(self, iteration: int, tours: list[Tour]):
+        snapshot = [np.fromiter((n.node_id for n in t), dtype=np.int32, count=len(t)) for t in tours]
+        if self.snapshot_mode == SnapshotMode.FULL:
+            self.snapshots[iteration] = dict(enumerate(snapshot))
+        else:
+            last = self._last_snapshot
+            self.snapshots[iteration] = {
+                position: ids
+                for position, ids in enumerate(snapshot)
+                if position >= len(last) or not np.array_equal(last[position], ids)
+            }
+        self.tour_counts[iteration] = len(snapshot)
+        self._last_snapshot = snapshot
+
+    def get_snapshot(self, iteration: int) -> list[np.ndarray]:
+        if iteration not in self.snapshots:
+            raise KeyError(f'No snapshot stored for iteration {iteration} (mode {self.snapshot_mode.value}).')
+        if self.snapshot_mode == SnapshotMode.FULL:
+            return list(self.snapshots[iteration].values())
+
+        tours: list[np.ndarray] = []
+        for it in sorted(i for i in self.snapshots if i <= iteration):
+            tours = tours[:self.tour_counts[it]] + [None] * max(0, self.tour_counts[it] - len(tours))
+            for position, ids in self.snapshots[it].items():
+                tours[position] = ids
+        return tours
+
+    @property
+    def iterations(self) -> list[int]:
+        return [r.iteration for r in self.records]
+
+    @property
+    def total_costs(self) -> list[float]:
+        return [r.total_cost for r in self.records]
+
+    @property
+    def average_tour_costs(self) -> list[float]:
+        return [r.average_tour_cost for r in self.records]
+
+    @property
+    def visited_ratios(self) -> list[float]:
+        return [r.visited_ratio for r in self.records]
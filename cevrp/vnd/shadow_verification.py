@@ -0,0 +1,140 @@
+import logging
+import random
+import threading
+from dataclasses import dataclass, asdict
+from typing import Iterable
+
+from cevrp.constraints import Constraints, ConstraintValidationStrategy
+from cevrp.cost_types import CostTypes
+from cevrp.metrics import MetricsRegistry
+from cevrp.node import Node
+from cevrp.tour import Tour
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cost_memo import RouteCosts
+
+logger = logging.getLogger(__name__)
+
+_COST_FIELDS = ('distance', 'battery_recharging', 'service_time', 'demand', 'total')
+
+
+# Costs of a node sequence through the reference implementation: Tour.get_costs_of_tour and the
+# constraint checks of ConstraintValidationStrategy on a materialized tour.
+def reference_costs(nodes: Iterable[Node], vehicle: Vehicle, battery_threshold: float) -> RouteCosts:
+    tour = Tour(list(nodes))
+    costs = tour.get_costs_of_tour(vehicle, battery_threshold)
+    feasible = all(ConstraintValidationStrategy(constraint.value, tour, vehicle, battery_threshold).is_valid()
+                   for constraint in Constraints)
+    return RouteCosts(costs[CostTypes.DISTANCE], costs[CostTypes.BATTERY_RECHARGING],
+                      costs[CostTypes.SERVICE_TIME], costs[CostTypes.DEMAND], costs[CostTypes.TOTAL], feasible)
+
+
+@dataclass
+class ShadowMismatch:
+    # fast path that disagreed: route_cache, memo, delta, bound or edges
+    kind: str
+    expected: dict
+    actual: dict
+    context: dict
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# Recomputes a random sample of the fast evaluations with the reference implementation:
+#   route_cache  cached costs of a current route
+#   memo         memoized costs of a candidate route
+#   delta        cost change and feasibility of an evaluated move
+#   bound        a move rejected by its lower bound must not improve the costs
+#   edges        a move rejected by the feasible-edge lookup must be infeasible
+# Every evaluation is checked with probability rate, drawn from a generator of its own so that
+# verification does not change the search. A reference check materializes the routes involved and
+# costs O(route length), so rates around 1% keep the overhead low enough for production-like runs.
+# Mismatches are counted per kind and logged with the move and the node ids of the routes; the first
+# max_records are kept for inspection. Counting is locked, a verifier can be shared between threads
+# (the sample then depends on the thread schedule).
+class ShadowVerifier:
+    KINDS = ('route_cache', 'memo', 'delta', 'bound', 'edges')
+
+    def __init__(self, rate: float = 0.01, seed: int | None = None, tolerance: float = 1e-9,
+                 max_records: int = 100):
+        self.rate = rate
+        self.tolerance = tolerance
+        self.max_records = max_records
+        self._generator = random.Random(seed)
+        self._lock = threading.Lock()
+        self.checks = dict.fromkeys(ShadowVerifier.KINDS, 0)
+        self.mismatches = dict.fromkeys(ShadowVerifier.KINDS, 0)
+        self.records: list[ShadowMismatch] = []
+
+    def sample(self) -> bool:
+        return self._generator.random() < self.rate
+
+    @property
+    def total_mismatches(self) -> int:
+        return sum(self.mismatches.values())
+
+    def _close(self, expected: float, actual: float) -> bool:
+        return abs(expected - actual) <= self.tolerance * (1 + abs(expected))
+
+    def _count(self, kind: str):
+        with self._lock:
+            self.checks[kind] += 1
+
+    def _record(self, kind: str, expected: dict, actual: dict, context: dict):
+        logger.warning("SHADOW MISMATCH (%s): expected %s, got %s, context %s", kind, expected, actual, context)
+        with self._lock:
+            self.mismatches[kind] += 1
+            if len(self.records) < self.max_records:
+                self.records.append(ShadowMismatch(kind, expected, actual, context))
+
+    def check_route(self, kind: str, nodes: Iterable[Node], actual: RouteCosts, vehicle: Vehicle,
+                    battery_threshold: float, context: dict | None = None) -> bool:
+        nodes = list(nodes)
+        expected = reference_costs(nodes, vehicle, battery_threshold)
+        self._count(kind)
+        matches = expected.feasible == actual.feasible \
+            and all(self._close(getattr(expected, name), getattr(actual, name)) for name in _COST_FIELDS)
+        if not matches:
+            self._record(kind, asdict(expected), asdict(actual),
+                         dict(context or {}, nodes=[n.node_id for n in nodes]))
+        return matches
+
+    # delta and feasible are what the evaluator returned for the move on the given kind of path
+    def check_move(self, kind: str, move, tours: list[Tour], delta: float, feasible: bool, vehicle: Vehicle,
+                   battery_threshold: float) -> bool:
+        candidates = {route: list(sequence) for route, sequence in move.sequences(tours)}
+        expected_delta = 0
+        expected_feasible = True
+        for route, nodes in candidates.items():
+            candidate = reference_costs(nodes, vehicle, battery_threshold)
+            expected_delta += candidate.total - reference_costs(tours[route].nodes, vehicle, battery_threshold).total
+            expected_feasible = expected_feasible and candidate.feasible
+
+        self._count(kind)
+        if kind == 'edges':
+            matches = not expected_feasible
+        elif kind == 'bound':
+            # the bound may not exceed the actual change
+            matches = expected_delta >= delta or self._close(expected_delta, delta)
+        else:
+            matches = expected_feasible == feasible and self._close(expected_delta, delta)
+        if not matches:
+            context = {
+                'move': repr(move),
+                'routes': {route: [n.node_id for n in tours[route]] for route in candidates},
+                'candidates': {route: [n.node_id for n in nodes] for route, nodes in candidates.items()},
+            }
+            self._record(kind, {'delta': expected_delta, 'feasible': expected_feasible},
+                         {'delta': delta, 'feasible': feasible}, context)
+        return matches
+
+    def report(self, metrics: MetricsRegistry):
+        for kind in ShadowVerifier.KINDS:
+            if self.checks[kind] > 0:
+                metrics.increment(f'shadow_checks_{kind}', self.checks[kind])
+                metrics.increment(f'shadow_mismatches_{kind}', self.mismatches[kind])
+        metrics.set_gauge('shadow_mismatches', self.total_mismatches)
+
+    def to_dict(self) -> dict:
+        return {'rate': self.rate, 'checks': dict(self.checks), 'mismatches': dict(self.mismatches),
+                'records': [record.to_dict() for record in self.records]}
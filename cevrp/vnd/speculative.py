@@ -0,0 +1,114 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+
+import numpy as np
+
+from cevrp.cevrp_model import CEVRPModel
+from cevrp.metrics import MetricsRegistry
+from cevrp.tour import Tour
+from cevrp.vnd.moves import MoveEvaluator
+from cevrp.vnd.neighborhood_operators import NeighborhoodOperators
+from cevrp.vnd.route_index import RouteIndex
+from cevrp.vnd.worker_state import decode_tour, encode_tour, initialize_worker, node_positions, worker_state
+
+POLICIES = ('best', 'first')
+
+
+# Runs one round of the operator on a copy of the incumbent. Returns the resulting tours as positions
+# (None if no move was accepted), the accepted moves, the improvement and the operator metrics.
+def _explore(operator_name: str, sequences: list[np.ndarray], seed: int, max_interchange_iterations: int) \
+        -> tuple[list[np.ndarray] | None, int, float, dict]:
+    # imported here, the optimizer imports this module
+    from cevrp.vnd import cevrp_optimizer
+
+    state = worker_state()
+    tours = [Tour(decode_tour(sequence, state.nodes)) for sequence in sequences]
+    evaluator = MoveEvaluator(state.vehicle, state.battery_threshold, state.feasible_edges, state.memo)
+    context = cevrp_optimizer.SearchContext(state.vehicle, state.battery_threshold, state.feasible_edges, evaluator,
+                                            state.nodes[state.positions[0]], MetricsRegistry(),
+                                            RouteIndex(tours) if state.spatial_filter else None,
+                                            rng=random.Random(seed))
+    operator = NeighborhoodOperators[operator_name]
+    accepted, improvement = cevrp_optimizer.run_operator(operator, tours, context, max_interchange_iterations)
+    result = None
+    if accepted > 0:
+        result = [encode_tour(tour.nodes, state.positions) for tour in tours]
+    return result, accepted, improvement, asdict(context.metrics.operator(operator.key))
+
+
+# Explores several neighborhoods of the same incumbent at once, one worker process per operator.
+# Every operator runs a full round on its own copy of the tours, seeded from rng (the global generator by default),
+# and the calling process keeps one outcome:
+#   best   the largest improvement, after all operators finished
+#   first  the first improving operator in the order of operators; rounds that did not start yet are
+#          dropped, rounds already running cannot be interrupted and are waited for, so that the next
+#          step never queues behind them (first only saves work with fewer workers than operators)
+# The other outcomes are discarded. Which outcome is kept only depends on the seeds and the order of
+# operators, never on which worker finishes first, so runs are reproducible under random.seed (as long
+# as no round runs into the one-second timeout of two_opt_move or the two-second timeout of
+# draw_cross_exchange). Operator metrics of all rounds that ran are merged into the caller's metrics.
+# The workers know the model's nodes as of construction; tours with other nodes raise a KeyError.
+class SpeculativeExploration:
+    def __init__(self, model: CEVRPModel, operators: list[NeighborhoodOperators] | None = None,
+                 workers: int | None = None, policy: str = 'best', max_idle: int = 3, spatial_filter: bool = True,
+                 memo_entries: int = 100_000):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown policy {policy}, expected one of {POLICIES}.')
+        self.operators = operators or [NeighborhoodOperators.TWO_OPT_MOVE, NeighborhoodOperators.CROSS_EXCHANGE,
+                                       NeighborhoodOperators.TWO_LAMBDA_INTERCHANGE]
+        self.policy = policy
+        self.max_idle = max_idle
+        self.idle = 0
+        self.nodes = list(model.nodes)
+        self.positions = node_positions(self.nodes)
+        workers = workers or min(len(self.operators), os.cpu_count() or 1)
+        self._executor = ProcessPoolExecutor(
+            workers, initializer=initialize_worker,
+            initargs=(self.nodes, model.vehicles[0], model.battery_threshold, model.feasible_edges, spatial_filter,
+                      memo_entries))
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # no improvement in the last max_idle steps
+    @property
+    def converged(self) -> bool:
+        return self.idle >= self.max_idle
+
+    # Returns the kept tours (None if no operator improved), its operator, accepted moves and improvement.
+    def step(self, tours: list[Tour], metrics: MetricsRegistry, max_interchange_iterations: int, rng=random) \
+            -> tuple[list[Tour] | None, NeighborhoodOperators | None, int, float]:
+        sequences = [encode_tour(tour.nodes, self.positions) for tour in tours]
+        seeds = [rng.getrandbits(32) for _ in self.operators]
+        futures = [self._executor.submit(_explore, operator.name, sequences, seed, max_interchange_iterations)
+                   for operator, seed in zip(self.operators, seeds)]
+
+        kept = None
+        decided = False
+        for operator, future in zip(self.operators, futures):
+            if decided and future.cancel():
+                continue
+            result, accepted, improvement, operator_metrics = future.result()
+            own = metrics.operator(operator.key)
+            for key, value in operator_metrics.items():
+                setattr(own, key, getattr(own, key) + value)
+            if decided:
+                continue
+            if result is not None and improvement > 0 and (kept is None or improvement > kept[3]):
+                kept = result, operator, accepted, improvement
+                decided = self.policy == 'first'
+
+        if kept is None:
+            self.idle += 1
+            return None, None, 0, 0.0
+        self.idle = 0
+        result, operator, accepted, improvement = kept
+        return [Tour(decode_tour(sequence, self.nodes)) for sequence in result], operator, accepted, improvement
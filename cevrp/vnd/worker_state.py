@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from cevrp.feasible_edges import FeasibleEdges
+from cevrp.node import Node
+from cevrp.vehicle import Vehicle
+from cevrp.vnd.cost_memo import CostMemo
+
+
+# Model data a worker process receives once, when it starts (see initialize_worker). Tours travel
+# between the processes as int32 arrays of positions in nodes, which pickle much smaller than nodes.
+@dataclass
+class WorkerState:
+    nodes: list[Node]
+    positions: dict[int, int]
+    vehicle: Vehicle
+    battery_threshold: float
+    feasible_edges: FeasibleEdges | None = None
+    spatial_filter: bool = True
+    memo: CostMemo | None = None
+
+
+_worker_state: WorkerState | None = None
+
+
+def node_positions(nodes: list[Node]) -> dict[int, int]:
+    return {node.node_id: position for position, node in enumerate(nodes)}
+
+
+# raises a KeyError for nodes that are not in positions
+def encode_tour(nodes: list[Node], positions: dict[int, int]) -> np.ndarray:
+    return np.fromiter((positions[n.node_id] for n in nodes), dtype=np.int32, count=len(nodes))
+
+
+def decode_tour(sequence: np.ndarray, nodes: list[Node]) -> list[Node]:
+    return [nodes[p] for p in sequence.tolist()]
+
+
+# Initializer of the worker processes of ParallelTwoOpt and SpeculativeExploration. The cost memo is
+# created in the worker (memo_entries 0 disables it), it is shared by all tasks of the process.
+def initialize_worker(nodes: list[Node], vehicle: Vehicle, battery_threshold: float,
+                      feasible_edges: FeasibleEdges | None = None, spatial_filter: bool = True, memo_entries: int = 0):
+    global _worker_state
+    _worker_state = WorkerState(nodes, node_positions(nodes), vehicle, battery_threshold, feasible_edges,
+                                spatial_filter, CostMemo(memo_entries) if memo_entries > 0 else None)
+
+
+def worker_state() -> WorkerState:
+    if _worker_state is None:
+        raise RuntimeError('Not a worker process, initialize_worker was not called.')
+    return _worker_state